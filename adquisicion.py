@@ -0,0 +1,597 @@
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import fixtures
+from cache import CacheSWR
+from cola import PRIORIDAD_INTERACTIVA, PRIORIDAD_LOTE, ColaTrabajos, cola_activada
+from dividendos import analizar_dividendos, cierre_sin_ajustar, serie_dividendos
+from divisas import convertir_historial, moneda_principal, tipo_actual
+from estados import CACHE_CALENDARIO, CACHE_ESTADOS, descargar_calendario, descargar_estados, obtener_estados
+from precios import CACHE_HISTORIAL_PRECIOS, descargar_historial, obtener_historial, ultimos_anos
+from puntuacion import calcular_puntuaciones_vectorizado
+from simbolos import marcar_invalido
+
+if fixtures.ACTIVADO:
+    # Proveedor offline (ANALIZADOR_FIXTURES=1): datos sintéticos en lugar de Yahoo, antes de cualquier descarga.
+    fixtures.activar()
+
+# --- CAPA DE FUNDAMENTALES ---
+# Todo lo que procede de los estados financieros y de `info`. Los múltiplos se
+# calculan al precio de referencia de `info` y la capa de precio los reescala.
+def obtener_fundamentales(ticker):
+    stock = yf.Ticker(ticker)
+    info = stock.info
+    if not info or info.get('longName') is None:
+        return None
+    
+    # Los estados no caducan con `info`: vienen de su propia caché (estados.py).
+    financials, balance_sheet, cashflow = obtener_estados(ticker)
+    
+    ebit = financials.loc['EBIT'].iloc[0] if 'EBIT' in financials.index and not financials.loc['EBIT'].empty else None
+    interest_expense = financials.loc['Interest Expense'].iloc[0] if 'Interest Expense' in financials.index and not financials.loc['Interest Expense'].empty else None
+    
+    interest_coverage = None
+    if ebit is not None and interest_expense is not None and interest_expense != 0:
+        interest_coverage = ebit / abs(interest_expense)
+    
+    deuda_ebitda = None
+    total_debt = balance_sheet.loc['Total Debt'].iloc[0] if 'Total Debt' in balance_sheet.index and not balance_sheet.loc['Total Debt'].empty else info.get('totalDebt')
+    cash = balance_sheet.loc['Cash And Cash Equivalents'].iloc[0] if 'Cash And Cash Equivalents' in balance_sheet.index and not balance_sheet.loc['Cash And Cash Equivalents'].empty else info.get('totalCash')
+    ebitda = info.get('ebitda')
+
+    if total_debt is not None and cash is not None and ebitda is not None and ebitda > 0:
+        net_debt = total_debt - cash
+        deuda_ebitda = net_debt / ebitda
+    
+    roe = info.get('returnOnEquity', 0) * 100
+    
+    # --- CÁLCULO DEL ROIC (con fallback de 3 niveles) ---
+    roic = None
+    roic_is_approx = False # Flag para saber si usamos ROA
+
+    # Intento 1: Método NOPAT (más preciso)
+    try:
+        pretax_income = financials.loc['Pretax Income'].iloc[0] if 'Pretax Income' in financials.index else None
+        tax_provision = financials.loc['Tax Provision'].iloc[0] if 'Tax Provision' in financials.index else None
+        total_equity = balance_sheet.loc['Total Stockholder Equity'].iloc[0] if 'Total Stockholder Equity' in balance_sheet.index else None
+
+        if ebit and pretax_income and tax_provision and total_debt and total_equity and pretax_income > 0:
+            effective_tax_rate = tax_provision / pretax_income
+            nopat = ebit * (1 - effective_tax_rate)
+            invested_capital = total_debt + total_equity
+            if invested_capital > 0:
+                roic = (nopat / invested_capital) * 100
+    except (TypeError, KeyError, IndexError, ZeroDivisionError):
+        roic = None
+
+    # Intento 2: Método Beneficio Neto + Intereses (robusto)
+    if roic is None:
+        try:
+            net_income = financials.loc['Net Income'].iloc[0] if 'Net Income' in financials.index else None
+            total_equity = balance_sheet.loc['Total Stockholder Equity'].iloc[0] if 'Total Stockholder Equity' in balance_sheet.index else None
+
+            if net_income and interest_expense and total_debt and total_equity:
+                numerator = net_income + abs(interest_expense)
+                invested_capital = total_debt + total_equity
+                if invested_capital > 0:
+                    roic = (numerator / invested_capital) * 100
+        except (TypeError, KeyError, IndexError, ZeroDivisionError):
+            roic = None
+
+    # Intento 3: Red de Seguridad - ROA (Return on Assets)
+    if roic is None:
+        try:
+            total_assets = balance_sheet.loc['Total Assets'].iloc[0] if 'Total Assets' in balance_sheet.index else None
+            if ebit and total_assets and total_assets > 0:
+                roic = (ebit / total_assets) * 100
+                roic_is_approx = True
+        except (TypeError, KeyError, IndexError, ZeroDivisionError):
+            roic = None
+
+    net_buybacks_pct = None
+    try:
+        shares_key = 'Basic Average Shares' if 'Basic Average Shares' in financials.index else 'Diluted Average Shares'
+        if shares_key in financials.index and len(financials.columns) >= 2:
+            shares_series = financials.loc[shares_key].dropna().loc[lambda x: x > 0]
+            if len(shares_series) >= 2:
+                shares_final = shares_series.iloc[0]
+                shares_initial = shares_series.iloc[1]
+                if shares_initial > 0:
+                    net_buybacks_pct = ((shares_initial - shares_final) / shares_initial) * 100
+    except Exception:
+        net_buybacks_pct = None
+
+    payout = info.get('payoutRatio')
+    dividend_rate = info.get('dividendRate')
+    precio = info.get('currentPrice')
+    div_yield = (dividend_rate / precio) * 100 if dividend_rate and precio and precio > 0 else 0
+    
+    if payout is not None and (payout > 1.5 or payout < 0):
+        trailing_eps = info.get('trailingEps')
+        if trailing_eps and dividend_rate and trailing_eps > 0:
+            payout = dividend_rate / trailing_eps
+        else:
+            payout = None
+
+    # --- LÓGICA ESPECIAL PARA REITS ---
+    if info.get('sector') == 'Real Estate':
+        try:
+            net_income = financials.loc['Net Income From Continuing Operations'].iloc[0]
+            depreciation = cashflow.loc['Depreciation And Amortization'].iloc[0]
+            ffo = net_income + depreciation
+            dividends_paid = abs(cashflow.loc['Cash Dividends Paid'].iloc[0])
+            if ffo > 0:
+                payout = dividends_paid / ffo
+        except (KeyError, IndexError):
+            payout = info.get('payoutRatio') # Fallback al payout normal si no hay datos de FFO
+    
+    free_cash_flow = info.get('freeCashflow')
+    market_cap = info.get('marketCap')
+    # El FCF viene en la moneda de los estados y la capitalización en la de cotización (ADRs, cotizaciones extranjeras).
+    moneda = info.get('currency') or info.get('financialCurrency', 'USD')
+    moneda_financiera = info.get('financialCurrency') or moneda
+    tipo_cambio_financiero = tipo_actual(moneda_financiera, moneda_principal(moneda))
+    fcf_en_moneda_cotizacion = free_cash_flow * tipo_cambio_financiero if free_cash_flow and tipo_cambio_financiero else None
+    p_fcf = (market_cap / fcf_en_moneda_cotizacion) if market_cap and fcf_en_moneda_cotizacion and fcf_en_moneda_cotizacion > 0 else None
+    avisos_divisas = []
+    if free_cash_flow and tipo_cambio_financiero is None:
+        avisos_divisas.append(f"🟡 **Sin tipo de cambio {moneda_financiera}→{moneda_principal(moneda)}:** Los estados financieros van en {moneda_financiera} "
+                              f"y la cotización en {moneda}; sin el tipo de cambio no se puede calcular el P/FCF.")
+
+    payout_fcf_ratio = None
+    dividends_paid = cashflow.loc['Cash Dividends Paid'].iloc[0] if 'Cash Dividends Paid' in cashflow.index and not cashflow.loc['Cash Dividends Paid'].empty else None
+    if dividends_paid is not None and free_cash_flow is not None and free_cash_flow > 0:
+        payout_fcf_ratio = abs(dividends_paid) / free_cash_flow
+
+    descripcion_completa = info.get('longBusinessSummary', 'No disponible.')
+    descripcion_corta = 'No disponible.'
+    if descripcion_completa and descripcion_completa != 'No disponible.':
+        first_period = descripcion_completa.find('.')
+        if first_period != -1:
+            second_period = descripcion_completa.find('.', first_period + 1)
+            if second_period != -1:
+                descripcion_corta = descripcion_completa[:second_period + 1].strip()
+            else:
+                descripcion_corta = descripcion_completa.strip()
+    
+    return {
+        "nombre": info.get('longName', 'N/A'), "sector": info.get('sector', 'N/A'),
+        "pais": info.get('country', 'N/A'), "industria": info.get('industry', 'N/A'), "bolsa": info.get('exchange'),
+        "descripcion": descripcion_corta,
+        "roe": roe,
+        "roic": roic,
+        "roic_is_approx": roic_is_approx,
+        "margen_operativo": info.get('operatingMargins', 0) * 100 if info.get('operatingMargins') is not None else 0,
+        "margen_beneficio": info.get('profitMargins', 0) * 100 if info.get('profitMargins') is not None else 0,
+        "ratio_corriente": info.get('currentRatio'),
+        "per": info.get('trailingPE'), "per_adelantado": info.get('forwardPE'),
+        "p_fcf": p_fcf,
+        "avisos_divisas": avisos_divisas,
+        "raw_fcf": free_cash_flow,
+        "p_b": info.get('priceToBook'),
+        "yield_dividendo": div_yield,
+        "payout_ratio": payout * 100 if payout is not None else 0,
+        "payout_fcf_ratio": payout_fcf_ratio * 100 if payout_fcf_ratio is not None else None,
+        "recomendacion_analistas": info.get('recommendationKey', 'N/A'),
+        "precio_objetivo": info.get('targetMeanPrice'), "precio_actual": info.get('currentPrice'),
+        "bpa": info.get('trailingEps'),
+        "bpa_growth_yoy": info.get('earningsGrowth'),
+        "deuda_ebitda": deuda_ebitda,
+        "interest_coverage": interest_coverage,
+        "beta": info.get('beta', 'N/A'),
+        "net_buybacks_pct": net_buybacks_pct,
+        "financial_currency": moneda_financiera,
+        "moneda": moneda,
+        "tipo_cambio_financiero": tipo_cambio_financiero,
+        "market_cap": market_cap,
+        "precio_referencia": precio,
+        "dividend_rate": dividend_rate
+    }
+
+# --- HISTÓRICOS Y TÉCNICOS ---
+def calculate_cagr(end_value, start_value, years):
+    if start_value is None or end_value is None or start_value == 0 or years <= 0:
+        return None
+    if start_value < 0:
+        return None
+    try:
+        sign = -1 if end_value < 0 else 1
+        return ((((abs(end_value) + 1e-9) / start_value) ** (1 / years)) - 1) * 100 * sign
+    except (ZeroDivisionError, ValueError, TypeError):
+        return None
+
+# --- HISTÓRICO DE PUNTUACIONES ---
+# Las reglas de puntuación aplicadas a cada ejercicio fiscal con los estados de
+# ese año y el precio medio del año (el mismo que usa la valoración histórica).
+# Todos los años se puntúan en una sola pasada de calcular_puntuaciones_vectorizado.
+# No hay precio objetivo ni PER adelantado históricos: esos componentes cuentan
+# como ausentes. El PER y el yield "históricos" de cada año son la media de los
+# años anteriores, para no usar información posterior.
+COLUMNAS_HISTORIAL_PUNTUACIONES = ['calidad', 'valoracion', 'salud', 'dividendos', 'nota_final']
+
+def _por_ano(estado):
+    if estado is None or estado.empty:
+        return pd.DataFrame()
+    anual = estado.T.sort_index(ascending=True)
+    anual.index = pd.DatetimeIndex(anual.index).year
+    return anual[~anual.index.duplicated(keep='last')].apply(pd.to_numeric, errors='coerce')
+
+def _partida(anual, *claves):
+    for clave in claves:
+        if clave in anual.columns:
+            return anual[clave].astype(float)
+    return pd.Series(np.nan, index=anual.index)
+
+def _cagr_movil(serie, anos):
+    """calculate_cagr(serie[t], serie[t - anos], anos) para todos los t a la vez."""
+    inicio = serie.shift(anos)
+    signo = np.where(serie < 0, -1, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr = (((serie.abs() + 1e-9) / inicio) ** (1 / anos) - 1) * 100 * signo
+    return cagr.where(inicio > 0)
+
+def calcular_historial_puntuaciones(financials_raw, balance_sheet_raw, cashflow_raw, precios, dividendos, sector, pais):
+    """DataFrame indexado por 'Year' con las notas por bloque y la nota final de cada ejercicio."""
+    fin = _por_ano(financials_raw)
+    if fin.empty or precios is None or precios.empty:
+        return None
+    bal = _por_ano(balance_sheet_raw).reindex(fin.index)
+    cf = _por_ano(cashflow_raw).reindex(fin.index)
+    precio = precios['Close'].groupby(precios.index.year).mean().reindex(fin.index)
+
+    ingresos = _partida(fin, 'Total Revenue')
+    beneficio = _partida(fin, 'Net Income')
+    acciones = _partida(fin, 'Basic Average Shares', 'Diluted Average Shares').where(lambda s: s > 0)
+    ebit = _partida(fin, 'EBIT')
+    ebitda = _partida(fin, 'EBITDA')
+    intereses = _partida(fin, 'Interest Expense').abs()
+    antes_impuestos = _partida(fin, 'Pretax Income')
+    patrimonio = _partida(bal, 'Total Stockholder Equity', 'Stockholders Equity')
+    deuda = _partida(bal, 'Total Debt')
+    fcf = _partida(cf, 'Free Cash Flow')
+    if fcf.isna().all():
+        fcf = _partida(cf, 'Total Cash From Operating Activities', 'Operating Cash Flow') + _partida(cf, 'Capital Expenditure', 'Capital Expenditures')
+
+    if dividendos is not None and not dividendos.empty:
+        dividendos_ano = dividendos.groupby(dividendos.index.year).sum().reindex(fin.index).fillna(0.0)
+    else:
+        dividendos_ano = pd.Series(0.0, index=fin.index)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bpa = beneficio / acciones
+        per = (precio / bpa).where(bpa > 0)
+        p_b = (precio / (patrimonio / acciones)).where(patrimonio > 0)
+        capital_invertido = deuda + patrimonio
+        tasa_impositiva = (_partida(fin, 'Tax Provision') / antes_impuestos).where(antes_impuestos > 0)
+        yield_dividendo = dividendos_ano / precio * 100
+        columnas = {
+            'roe': (beneficio / patrimonio * 100).where(patrimonio > 0),
+            'roic': (ebit * (1 - tasa_impositiva) / capital_invertido * 100).where(capital_invertido > 0),
+            'margen_operativo': (_partida(fin, 'Operating Income') / ingresos * 100).where(ingresos > 0),
+            'margen_beneficio': (beneficio / ingresos * 100).where(ingresos > 0),
+            'bpa_cagr': _cagr_movil(bpa, 2),
+            'bpa_growth_yoy': (bpa / bpa.shift(1) - 1).where(bpa.shift(1) > 0),
+            'deuda_ebitda': ((deuda - _partida(bal, 'Cash And Cash Equivalents')) / ebitda).where(ebitda > 0),
+            'interest_coverage': (ebit / intereses).where(intereses > 0),
+            'ratio_corriente': (_partida(bal, 'Current Assets') / _partida(bal, 'Current Liabilities')).where(lambda s: np.isfinite(s)),
+            'cagr_fcf': _cagr_movil(fcf, 2),
+            'raw_fcf': fcf,
+            # Mismos filtros de valores absurdos que la valoración histórica.
+            'per': per.where((per > 0) & (per < 200)),
+            'p_fcf': (precio * acciones / fcf).where(fcf > 0),
+            'p_b': p_b.where((p_b > 0) & (p_b < 50)),
+            'yield_dividendo': yield_dividendo,
+            'payout_ratio': (_partida(cf, 'Cash Dividends Paid').abs() / beneficio * 100).where(beneficio > 0).fillna(0.0),
+            'net_buybacks_pct': (acciones.shift(1) - acciones) / acciones.shift(1) * 100,
+            'precio_actual': precio,
+        }
+    columnas['per_hist'] = columnas['per'].expanding().mean().shift(1)
+    columnas['yield_hist'] = yield_dividendo.expanding().mean().shift(1)
+
+    con_precio = precio.notna().to_numpy()
+    if not con_precio.any():
+        return None
+    n = int(con_precio.sum())
+    res = calcular_puntuaciones_vectorizado({campo: serie.to_numpy(dtype=float)[con_precio] for campo, serie in columnas.items()},
+                                            [sector] * n, [pais] * n)
+    return pd.DataFrame({c: res[c] for c in COLUMNAS_HISTORIAL_PUNTUACIONES},
+                        index=pd.Index(fin.index[con_precio], name='Year'))
+
+def obtener_datos_historicos_y_tecnicos(ticker):
+    stock = yf.Ticker(ticker)
+    info = stock.info
+
+    if not isinstance(info, dict) or not info:
+        return {}
+
+    financials_raw, balance_sheet_raw, cashflow_raw = obtener_estados(ticker)
+
+    # Un único historial máximo (compartido con las descargas en bloque de precios.py);
+    # 10y y los dividendos se derivan de él, sin volver a pedir stock.dividends.
+    hist_max = obtener_historial(ticker)
+    dividendos = serie_dividendos(hist_max)
+    analisis_dividendos = analizar_dividendos(hist_max)
+
+    financials_for_charts, dividends_for_charts = None, None
+    cagr_fcf, bpa_cagr, fcf_cagr_period, bpa_cagr_period = None, None, None, None
+
+    if not financials_raw.empty:
+        financials_annual = financials_raw.T.sort_index(ascending=True)
+        net_income = financials_annual.get('Net Income', pd.Series(dtype=float))
+        shares_key = 'Basic Average Shares' if 'Basic Average Shares' in financials_annual.columns else 'Diluted Average Shares'
+        shares = financials_annual.get(shares_key, pd.Series(dtype=float))
+
+        if not net_income.empty and not shares.empty:
+            eps_series = (net_income / shares).dropna()
+            if len(eps_series) >= 5:
+                start_eps = eps_series.iloc[-5]
+                end_eps = eps_series.iloc[-1]
+                bpa_cagr = calculate_cagr(end_eps, start_eps, 4)
+                if bpa_cagr is not None: bpa_cagr_period = "5A"
+
+            if bpa_cagr is None and len(eps_series) >= 3:
+                start_eps = eps_series.iloc[-3]
+                end_eps = eps_series.iloc[-1]
+                bpa_cagr = calculate_cagr(end_eps, start_eps, 2)
+                if bpa_cagr is not None: bpa_cagr_period = "3A"
+
+    if not cashflow_raw.empty:
+        cashflow_annual = cashflow_raw.T.sort_index(ascending=True)
+        fcf_series = None
+
+        # Attempt 1: Direct 'Free Cash Flow'
+        if 'Free Cash Flow' in cashflow_annual.columns:
+            fcf_series = cashflow_annual['Free Cash Flow']
+
+        # Attempt 2: Manual Calculation (Operating Cashflow - Capex)
+        elif 'Total Cash From Operating Activities' in cashflow_annual.columns and ('Capital Expenditure' in cashflow_annual.columns or 'Capital Expenditures' in cashflow_annual.columns):
+            op_cash = cashflow_annual['Total Cash From Operating Activities']
+            capex_key = 'Capital Expenditure' if 'Capital Expenditure' in cashflow_annual.columns else 'Capital Expenditures'
+            capex = cashflow_annual[capex_key]
+            fcf_series = op_cash + capex # Capex is negative, so we add
+
+        # Attempt 3: Proxy
+        elif 'Net Cash Flow From Continuing Investing Activities' in cashflow_annual.columns:
+             fcf_series = cashflow_annual['Net Cash Flow From Continuing Investing Activities']
+
+        if fcf_series is not None and not fcf_series.empty:
+            fcf_series = fcf_series.dropna()
+            if len(fcf_series) >= 5:
+                years_cf = 4
+                start_fcf = fcf_series.iloc[-5]
+                end_fcf = fcf_series.iloc[-1]
+                cagr_fcf = calculate_cagr(end_fcf, start_fcf, years_cf)
+                if cagr_fcf is not None: fcf_cagr_period = "5A"
+
+            if cagr_fcf is None and len(fcf_series) >= 3:
+                years_cf = 2
+                start_fcf = fcf_series.iloc[-3]
+                end_fcf = fcf_series.iloc[-1]
+                cagr_fcf = calculate_cagr(end_fcf, start_fcf, years_cf)
+                if cagr_fcf is not None: fcf_cagr_period = "3A"
+
+    if not financials_raw.empty and not balance_sheet_raw.empty and not cashflow_raw.empty:
+        financials = financials_raw.T.sort_index(ascending=True).tail(4)
+        balance_sheet = balance_sheet_raw.T.sort_index(ascending=True).tail(4)
+        cashflow = cashflow_raw.T.sort_index(ascending=True).tail(4)
+        dividends_chart_data = dividendos.resample('YE').sum().tail(5)
+
+        financials['Operating Margin'] = financials.get('Operating Income', 0) / financials.get('Total Revenue', 1)
+        financials['Total Debt'] = balance_sheet.get('Total Debt', 0)
+        financials['ROE'] = financials.get('Net Income', 0) / balance_sheet.get('Total Stockholder Equity', 1)
+
+        if 'Free Cash Flow' not in cashflow.columns:
+            capex = cashflow.get('Capital Expenditure', cashflow.get('Capital Expenditures', 0))
+            op_cash = cashflow.get('Total Cash From Operating Activities', 0)
+            cashflow['Free Cash Flow'] = op_cash + capex
+
+        financials['Free Cash Flow'] = cashflow['Free Cash Flow']
+        financials_for_charts, dividends_for_charts = financials, dividends_chart_data
+
+    hist_10y = ultimos_anos(hist_max, 10)
+    ath_price = None
+    if not hist_max.empty:
+        ath_price = hist_max['Close'].max()
+
+    ath_10y = hist_10y['Close'].max() if not hist_10y.empty else None
+
+    if hist_10y.empty:
+        return {"financials_charts": financials_for_charts, "dividends_charts": dividends_for_charts, "per_hist": None, "yield_hist": None, "tech_data": None, "cagr_fcf": cagr_fcf, "fcf_cagr_period": fcf_cagr_period, "bpa_cagr": bpa_cagr, "bpa_cagr_period": bpa_cagr_period, "ath_price": ath_price, "ath_10y": ath_10y, "valuation_history": None, "score_history": None, "dividend_analysis": analisis_dividendos}
+
+    # Los múltiplos históricos se calculan con el precio cotizado, no con el cierre ajustado por dividendos.
+    cierre_10y = cierre_sin_ajustar(hist_10y)
+    # Y en la moneda de los estados: cada sesión (y cada dividendo) a su tipo de cambio de ese día.
+    moneda = info.get('currency') or info.get('financialCurrency', 'USD')
+    moneda_financiera = info.get('financialCurrency') or moneda
+    cierre_financiero = convertir_historial(cierre_10y.to_frame(), moneda, moneda_financiera)['Close']
+    dividendos_financieros = convertir_historial(dividendos.to_frame('Dividends'), moneda, moneda_financiera)['Dividends']
+    avisos_divisas = []
+    if cierre_financiero.isna().all() and not cierre_10y.isna().all():
+        avisos_divisas.append(f"🟡 **Sin tipo de cambio histórico {moneda}→{moneda_financiera}:** Los estados financieros van en {moneda_financiera} "
+                              f"y la cotización en {moneda}; sin el historial del tipo de cambio no se pueden calcular la valoración histórica ni la nota por ejercicio.")
+
+    # --- NEW: Historical Valuation Data ---
+    valuation_history_data = []
+    if not financials_raw.empty and not balance_sheet_raw.empty:
+        net_income_key = 'Net Income'
+        share_key = 'Basic Average Shares' if 'Basic Average Shares' in financials_raw.index else 'Diluted Average Shares'
+        book_value_key = 'Total Stockholder Equity'
+
+        for col_date in financials_raw.columns:
+            year = col_date.year
+            price_data_year = cierre_financiero[cierre_financiero.index.year == year]
+            if price_data_year.empty: continue
+
+            avg_price = price_data_year.mean()
+
+            # P/E Calculation
+            net_income = financials_raw.loc[net_income_key, col_date] if net_income_key in financials_raw.index else None
+            shares = financials_raw.loc[share_key, col_date] if share_key in financials_raw.index else None
+            pe_ratio = None
+            if net_income and shares and shares > 0 and net_income > 0:
+                eps = net_income / shares
+                pe_ratio = avg_price / eps
+                if not (0 < pe_ratio < 200): pe_ratio = None
+
+            # P/B Calculation
+            book_value = balance_sheet_raw.loc[book_value_key, col_date] if book_value_key in balance_sheet_raw.index else None
+            pb_ratio = None
+            if book_value and shares and shares > 0 and book_value > 0:
+                bvps = book_value / shares
+                pb_ratio = avg_price / bvps
+                if not (0 < pb_ratio < 50): pb_ratio = None
+
+            valuation_history_data.append({'Year': year, 'P/E': pe_ratio, 'P/B': pb_ratio})
+
+    # --- CORRECCIÓN: Cálculo de PER histórico robusto ---
+    valuation_history = pd.DataFrame(valuation_history_data).set_index('Year')
+    per_historico = None
+    if not valuation_history.empty and 'P/E' in valuation_history.columns:
+        pers = valuation_history['P/E'].dropna().tolist()
+        if pers:
+            per_historico = np.mean(pers)
+
+    annual_yields = []
+    divs_10y = dividendos
+    if not divs_10y.empty:
+        annual_dividends = divs_10y.resample('YE').sum()
+        annual_prices = cierre_10y.resample('YE').mean()
+        df_yield = pd.concat([annual_dividends, annual_prices], axis=1).dropna()
+        df_yield.columns = ['Dividends', 'Price']
+        if not df_yield.empty and 'Price' in df_yield and 'Dividends' in df_yield:
+            annual_yields = ((df_yield['Dividends'] / df_yield['Price']) * 100).tolist()
+    yield_historico = np.mean(annual_yields) if annual_yields else None
+
+    score_history = calcular_historial_puntuaciones(financials_raw, balance_sheet_raw, cashflow_raw, cierre_financiero.to_frame(), dividendos_financieros,
+                                                    info.get('sector', 'N/A'), info.get('country', 'N/A'))
+
+    tech_data = None
+    if not hist_10y.empty:
+        end_date_1y = hist_10y.index.max()
+        start_date_1y = end_date_1y - pd.DateOffset(days=365)
+        tech_data = hist_10y[hist_10y.index >= start_date_1y].copy()
+
+        if not tech_data.empty:
+            tech_data['SMA50'] = tech_data['Close'].rolling(window=50).mean()
+            tech_data['SMA200'] = tech_data['Close'].rolling(window=200).mean()
+            delta = tech_data['Close'].diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+            rs = gain / (loss + 1e-10)
+            tech_data['RSI'] = 100 - (100 / (1 + rs))
+
+    return {
+        "financials_charts": financials_for_charts, "dividends_charts": dividends_for_charts,
+        "per_hist": per_historico, "yield_hist": yield_historico,
+        "tech_data": tech_data,
+        "cagr_fcf": cagr_fcf, "fcf_cagr_period": fcf_cagr_period,
+        "bpa_cagr": bpa_cagr, "bpa_cagr_period": bpa_cagr_period,
+        "ath_price": ath_price,
+        "ath_10y": ath_10y,
+        "valuation_history": valuation_history,
+        "score_history": score_history,
+        "dividend_analysis": analisis_dividendos,
+        "avisos_divisas": avisos_divisas
+    }
+
+# --- CAPA DE PRECIO ---
+# PER, PER adelantado, P/FCF, P/B y la capitalización son proporcionales al precio;
+# el yield es dividendo / precio. El resto de `datos` no depende del precio.
+CAMPOS_PROPORCIONALES_AL_PRECIO = ['per', 'per_adelantado', 'p_fcf', 'p_b', 'market_cap']
+
+def obtener_precio_actual(ticker):
+    try:
+        precio = yf.Ticker(ticker).fast_info['lastPrice']
+    except Exception:
+        return None
+    return float(precio) if precio and precio > 0 else None
+
+def aplicar_precio(fundamentales, precio):
+    datos = dict(fundamentales)
+    referencia = fundamentales.get('precio_referencia')
+    if precio is None or not referencia or precio <= 0:
+        return datos
+    factor = precio / referencia
+    for campo in CAMPOS_PROPORCIONALES_AL_PRECIO:
+        if isinstance(datos.get(campo), (int, float)):
+            datos[campo] = datos[campo] * factor
+    dividend_rate = fundamentales.get('dividend_rate')
+    datos['yield_dividendo'] = (dividend_rate / precio) * 100 if dividend_rate else 0
+    datos['precio_actual'] = precio
+    # Los campos ya están a `precio`: volver a aplicar otro precio parte de aquí y no del de la descarga.
+    datos['precio_referencia'] = precio
+    return datos
+
+# --- DATASETS CACHEADOS (stale-while-revalidate, compartidos entre sesiones) ---
+# Cada dataset con su política de frescura: `info` (fundamentales) e históricos
+# con TTL corto, el precio casi en tiempo real y los estados financieros hasta
+# la próxima fecha de resultados (estados.py).
+CACHE_FUNDAMENTALES = CacheSWR('fundamentales', ttl=900)
+CACHE_HISTORICOS = CacheSWR('historicos', ttl=3600)
+CACHE_PRECIOS = CacheSWR('precio', ttl=60)
+
+DATASETS = {
+    'fundamentales': (CACHE_FUNDAMENTALES, obtener_fundamentales),
+    'historicos': (CACHE_HISTORICOS, obtener_datos_historicos_y_tecnicos),
+    'precio': (CACHE_PRECIOS, obtener_precio_actual),
+    'historial_precios': (CACHE_HISTORIAL_PRECIOS, descargar_historial),
+    'estados': (CACHE_ESTADOS, descargar_estados),
+    'calendario': (CACHE_CALENDARIO, descargar_calendario),
+}
+
+def refrescar_dataset(ticker, dataset):
+    cache, funcion = DATASETS[dataset]
+    return cache.refrescar(ticker, funcion, ticker)
+
+# --- MODO COLA: la descarga la hacen los procesos de trabajador.py ---
+ESPERA_COLA = 10
+_cola = None
+
+def _obtener_cola():
+    global _cola
+    if _cola is None and cola_activada():
+        _cola = ColaTrabajos()
+    return _cola
+
+def _preparar_via_cola(ticker, datasets, timeout=ESPERA_COLA):
+    """Encola con prioridad interactiva los datasets sin copia utilizable y espera a los trabajadores."""
+    cola = _obtener_cola()
+    if cola is None or not cola.trabajadores_vivos():
+        # Sin trabajadores en marcha nadie atendería la cola: se descarga en línea.
+        return
+    faltan = [d for d in datasets if not DATASETS[d][0].entrada_utilizable(ticker)]
+    if faltan:
+        ids = [cola.encolar(ticker, d, PRIORIDAD_INTERACTIVA) for d in faltan]
+        cola.esperar(ids, timeout=timeout)
+    # Lo que no hayan resuelto los trabajadores se descarga en línea al consultar la caché.
+
+def _encolar_refresco(dataset):
+    def encolar(ticker):
+        cola = _obtener_cola()
+        if not cola.trabajadores_vivos():
+            # CacheSWR refresca entonces con su propio hilo de fondo.
+            raise RuntimeError("No hay trabajadores de la cola en marcha.")
+        cola.encolar(ticker, dataset, PRIORIDAD_LOTE)
+    return encolar
+
+if cola_activada():
+    # Las copias caducadas también se refrescan vía cola, no con hilos en el proceso de la UI.
+    for _dataset, (_cache, _) in DATASETS.items():
+        _cache.refresco_externo = _encolar_refresco(_dataset)
+
+def obtener_datos_completos_swr(ticker):
+    _preparar_via_cola(ticker, ['fundamentales', 'precio'])
+    fundamentales, frescura = CACHE_FUNDAMENTALES.obtener(ticker, obtener_fundamentales, ticker)
+    if not fundamentales:
+        marcar_invalido(ticker)
+        return None, frescura
+    try:
+        precio, _ = CACHE_PRECIOS.obtener(ticker, obtener_precio_actual, ticker)
+    except Exception:
+        precio = None
+    return aplicar_precio(fundamentales, precio), frescura
+
+def obtener_historicos_swr(ticker):
+    _preparar_via_cola(ticker, ['historicos'])
+    return CACHE_HISTORICOS.obtener(ticker, obtener_datos_historicos_y_tecnicos, ticker)
@@ -0,0 +1,210 @@
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from adquisicion import CACHE_FUNDAMENTALES, CACHE_PRECIOS, obtener_datos_completos_swr, obtener_historicos_swr
+from cache import FRESCO, CircuitoAbierto
+from puntuacion import analizar_banderas_rojas, calcular_nota_final, calcular_puntuaciones_y_justificaciones
+from simbolos import INVALIDO, IndiceSimbolos
+
+# --- API HTTP (JSON) ---
+# Para herramientas internas que necesitan las notas sin pasar por la página de
+# Streamlit. Usa las mismas capas que la app (adquisición con sus cachés SWR,
+# puntuación y banderas), así que una petición sobre datos en caché no toca Yahoo.
+#   GET /analysis/{ticker}          análisis completo de un ticker
+#   GET /scores?tickers=A,B,C       notas de varios tickers en una petición
+#   POST /scores  {"tickers": [...]} lo mismo, para listas largas
+#   GET /health
+# Cada respuesta lleva un ETag (hash del cuerpo; If-None-Match → 304) y un
+# Cache-Control cuyo max-age es lo que le queda de vida al dato más perecedero.
+# Con Accept-Encoding: gzip los cuerpos grandes van comprimidos.
+# Para pruebas de carga sin red: ANALIZADOR_FIXTURES=1 (ver fixtures.py).
+
+PUERTO = 8502
+MAX_TICKERS_LOTE = 200
+HILOS_LOTE = 8
+MIN_BYTES_GZIP = 1024
+
+def _a_json(valor):
+    """Convierte tipos de NumPy/pandas y NaN a algo serializable (NaN/inf → null)."""
+    if isinstance(valor, dict):
+        return {str(k): _a_json(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_a_json(v) for v in valor]
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    if isinstance(valor, (float, np.floating)):
+        return float(valor) if math.isfinite(valor) else None
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    return valor if valor is None or isinstance(valor, str) else str(valor)
+
+def _escalares(origen):
+    return {k: v for k, v in (origen or {}).items() if v is None or isinstance(v, (bool, int, float, str, np.integer, np.floating))}
+
+def max_age(frescura):
+    """Segundos que la respuesta sigue siendo válida: lo que le queda al dato de `info` y nunca más que el precio."""
+    if frescura is None or frescura['estado'] != FRESCO:
+        return 0
+    return int(max(0, min(CACHE_FUNDAMENTALES.ttl - frescura['edad'], CACHE_PRECIOS.ttl)))
+
+class ServicioAnalisis:
+    def __init__(self, indice_simbolos=None):
+        self.indice_simbolos = indice_simbolos if indice_simbolos is not None else IndiceSimbolos.cargar()
+        self._ejecutor = ThreadPoolExecutor(max_workers=HILOS_LOTE, thread_name_prefix='api-lote')
+
+    def rechazado(self, ticker):
+        return self.indice_simbolos.validar(ticker) == INVALIDO
+
+    def analizar(self, ticker):
+        """(cuerpo, frescura) del análisis completo, o (None, None) si el ticker no existe."""
+        if self.rechazado(ticker):
+            return None, None
+        datos, frescura = obtener_datos_completos_swr(ticker)
+        if not datos:
+            return None, None
+        hist_data, _ = obtener_historicos_swr(ticker)
+        puntuaciones, justificaciones, _ = calcular_puntuaciones_y_justificaciones(datos, hist_data or {})
+        banderas, avisos = analizar_banderas_rojas(datos, (hist_data or {}).get('financials_charts'))
+        avisos += (hist_data or {}).get('avisos_divisas') or []
+        cuerpo = {
+            'ticker': ticker, 'nombre': datos.get('nombre'),
+            'nota_final': calcular_nota_final(puntuaciones), 'puntuaciones': puntuaciones, 'justificaciones': justificaciones,
+            'banderas': banderas, 'avisos': avisos,
+            'datos': _escalares(datos), 'historicos': _escalares(hist_data),
+            # Momento de la descarga y no la edad, que cambiaría el cuerpo (y el ETag) en cada petición.
+            'frescura': {'estado': frescura['estado'], 'actualizado': pd.Timestamp(round(time.time() - frescura['edad']), unit='s')},
+        }
+        return cuerpo, frescura
+
+    def resumen(self, ticker):
+        try:
+            cuerpo, frescura = self.analizar(ticker)
+        except Exception as e:
+            return {'ticker': ticker, 'error': str(e)}, None
+        if cuerpo is None:
+            return {'ticker': ticker, 'error': 'no_encontrado'}, None
+        return {'ticker': ticker, 'nombre': cuerpo['nombre'], 'nota_final': cuerpo['nota_final'],
+                **{bloque: cuerpo['puntuaciones'].get(bloque) for bloque in ('calidad', 'valoracion', 'salud', 'dividendos')},
+                'banderas': len(cuerpo['banderas']), 'estado': cuerpo['frescura']['estado']}, frescura
+
+    def puntuar_lote(self, tickers):
+        """Resúmenes de varios tickers en paralelo (los que fallan llevan 'error') y el max-age común."""
+        resultados = list(self._ejecutor.map(self.resumen, tickers))
+        edades = [max_age(f) for _, f in resultados if f is not None]
+        return [r for r, _ in resultados], min(edades) if edades else 0
+
+def _lista_tickers(texto):
+    return list(dict.fromkeys(t.strip().upper() for t in texto.split(',') if t.strip()))
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    servicio = None
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AnalizadorAPI/1.0'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, estado, cuerpo, max_age_s=0):
+        datos = json.dumps(_a_json(cuerpo), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = '"' + hashlib.sha1(datos).hexdigest()[:20] + '"'
+        cabeceras = {'ETag': etag, 'Cache-Control': f'max-age={max_age_s}' if max_age_s else 'no-cache', 'Vary': 'Accept-Encoding'}
+        if estado == 200 and etag in [e.strip() for e in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            for nombre, valor in cabeceras.items():
+                self.send_header(nombre, valor)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if len(datos) >= MIN_BYTES_GZIP and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            datos = gzip.compress(datos, compresslevel=5)
+            cabeceras['Content-Encoding'] = 'gzip'
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        for nombre, valor in cabeceras.items():
+            self.send_header(nombre, valor)
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _error(self, estado, mensaje):
+        self._responder(estado, {'error': mensaje})
+
+    def _lote(self, tickers):
+        if not tickers:
+            return self._error(400, "Indica al menos un ticker.")
+        if len(tickers) > MAX_TICKERS_LOTE:
+            return self._error(400, f"Como máximo {MAX_TICKERS_LOTE} tickers por petición.")
+        resultados, edad = self.servicio.puntuar_lote(tickers)
+        self._responder(200, {'resultados': resultados}, edad)
+
+    def do_GET(self):
+        partes = urlsplit(self.path)
+        ruta = partes.path.rstrip('/')
+        try:
+            if ruta == '/health':
+                return self._responder(200, {'estado': 'ok'})
+            if ruta.startswith('/analysis/'):
+                ticker = ruta[len('/analysis/'):].strip().upper()
+                cuerpo, frescura = self.servicio.analizar(ticker)
+                if cuerpo is None:
+                    return self._error(404, f"Ticker '{ticker}' no encontrado.")
+                return self._responder(200, cuerpo, max_age(frescura))
+            if ruta == '/scores':
+                return self._lote(_lista_tickers(','.join(parse_qs(partes.query).get('tickers', []))))
+            self._error(404, "Ruta no encontrada.")
+        except CircuitoAbierto as e:
+            self._error(503, str(e))
+        except Exception as e:
+            self._error(502, f"Error al obtener los datos: {e}")
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip('/') != '/scores':
+            return self._error(404, "Ruta no encontrada.")
+        try:
+            longitud = int(self.headers.get('Content-Length', 0))
+            peticion = json.loads(self.rfile.read(longitud) or b'{}')
+            tickers = peticion.get('tickers', [])
+            if not isinstance(tickers, list):
+                raise ValueError
+        except (ValueError, AttributeError):
+            return self._error(400, 'El cuerpo debe ser JSON: {"tickers": [...]}.')
+        self._lote(_lista_tickers(','.join(str(t) for t in tickers)))
+
+def crear_servidor(host='127.0.0.1', puerto=PUERTO, servicio=None):
+    manejador = type('Manejador', (ManejadorAPI,), {'servicio': servicio or ServicioAnalisis()})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    return servidor
+
+def arrancar_en_segundo_plano(host='127.0.0.1', puerto=0, servicio=None):
+    """Servidor en un hilo (puerto 0 = uno libre). Devuelve el servidor; su puerto está en server_address."""
+    servidor = crear_servidor(host, puerto, servicio)
+    threading.Thread(target=servidor.serve_forever, daemon=True, name='api-http').start()
+    return servidor
+
+# python api.py --puerto 8502
+# ANALIZADOR_FIXTURES=1 ANALIZADOR_DIR_CACHE=/tmp/cache_fixtures python api.py
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="API HTTP JSON con los análisis y las notas.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    args = parser.parse_args()
+    servidor = crear_servidor(args.host, args.puerto)
+    print(f"Sirviendo en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
@@ -0,0 +1,442 @@
+import hashlib
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin coordinación entre procesos
+    fcntl = None
+
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError:
+    YFRateLimitError = None
+
+# --- CACHÉ STALE-WHILE-REVALIDATE ---
+# Una entrada caducada (edad > ttl) se sirve al instante mientras un hilo de fondo
+# la refresca. Solo se bloquea al usuario si no hay entrada o si supera la
+# obsolescencia máxima. Si Yahoo falla o limita peticiones, se sirve la última
+# copia buena y un cortacircuitos deja de insistir durante un tiempo.
+# En memoria se guardan como mucho max_entradas por dataset (LRU); lo que ya
+# no se serviría nunca se purga cada hora de la memoria y del disco.
+
+MAX_OBSOLESCENCIA = float(os.environ.get('ANALIZADOR_MAX_OBSOLESCENCIA', 24 * 3600))
+UMBRAL_FALLOS = int(os.environ.get('ANALIZADOR_UMBRAL_FALLOS', 3))
+ENFRIAMIENTO_CIRCUITO = float(os.environ.get('ANALIZADOR_ENFRIAMIENTO_CIRCUITO', 120))
+DIR_CACHE = os.environ.get('ANALIZADOR_DIR_CACHE', '.cache_analizador')
+MAX_ENTRADAS = int(os.environ.get('ANALIZADOR_MAX_ENTRADAS_CACHE', 512))
+INTERVALO_PURGA = 3600
+
+FRESCO, OBSOLETO, SIN_CONEXION = 'fresco', 'obsoleto', 'sin_conexion'
+
+# Errores que delatan un origen caído o que limita peticiones. Red, timeouts y HTTP
+# son OSError (también los de requests y curl_cffi); el resto (un KeyError al
+# interpretar un ticker raro) es un fallo de ese ticker y no abre el circuito.
+ERRORES_ORIGEN = (OSError,) + ((YFRateLimitError,) if YFRateLimitError is not None else ())
+
+_ejecutor_refresco = ThreadPoolExecutor(max_workers=4, thread_name_prefix='refresco-cache')
+
+class CircuitoAbierto(Exception):
+    pass
+
+class Cortacircuitos:
+    def __init__(self, umbral=UMBRAL_FALLOS, enfriamiento=ENFRIAMIENTO_CIRCUITO, errores=ERRORES_ORIGEN):
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self.errores = errores
+        self._fallos = 0
+        self._abierto_desde = None
+        self._lock = threading.Lock()
+
+    def permite(self):
+        with self._lock:
+            if self._abierto_desde is None:
+                return True
+            # Semiabierto: pasado el enfriamiento se deja pasar una petición de prueba.
+            if time.time() - self._abierto_desde >= self.enfriamiento:
+                self._abierto_desde = time.time()
+                return True
+            return False
+
+    def exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_desde = None
+
+    def cuenta(self, error):
+        """Si `error` es del origen (y debe sumar para abrir el circuito)."""
+        return isinstance(error, self.errores)
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._fallos >= self.umbral:
+                self._abierto_desde = time.time()
+
+    @property
+    def abierto(self):
+        return self._abierto_desde is not None
+
+# Yahoo es un único origen: todos los datasets comparten el mismo cortacircuitos.
+CORTACIRCUITOS_YAHOO = Cortacircuitos()
+
+# --- ALMACÉN EN DISCO Y COALESCENCIA (single-flight) ---
+# Varias sesiones que piden el mismo ticker a la vez esperan a una sola descarga:
+# dentro del proceso con un registro de vuelos en curso, y entre procesos del
+# mismo host con un cerrojo de fichero por clave. Quien espera el cerrojo
+# encuentra al entrar la copia que acaba de escribir el otro proceso.
+class AlmacenDisco:
+    def __init__(self, directorio=DIR_CACHE):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, nombre, clave, extension):
+        resumen = hashlib.sha1(repr(clave).encode()).hexdigest()[:20]
+        return os.path.join(self.directorio, f'{nombre}-{resumen}.{extension}')
+
+    def leer(self, nombre, clave):
+        try:
+            with open(self._ruta(nombre, clave, 'pkl'), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    @staticmethod
+    def _ruta_temporal(ruta):
+        # Propia de cada proceso e hilo; purgar() reconoce el mismo formato.
+        return f'{ruta}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    def escribir(self, nombre, clave, entrada):
+        ruta = self._ruta(nombre, clave, 'pkl')
+        tmp = self._ruta_temporal(ruta)
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(entrada, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, ruta)
+        except (OSError, pickle.PicklingError):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def edad(self, nombre, clave):
+        """Segundos desde que se escribió la copia, sin leerla (None si no hay)."""
+        try:
+            return time.time() - os.path.getmtime(self._ruta(nombre, clave, 'pkl'))
+        except OSError:
+            return None
+
+    def borrar(self, nombre, clave):
+        try:
+            os.remove(self._ruta(nombre, clave, 'pkl'))
+        except OSError:
+            pass
+
+    def purgar(self, nombre, antiguedad):
+        """Borra las copias de `nombre` escritas hace más de `antiguedad` segundos, con sus cerrojos. Devuelve cuántas."""
+        limite = time.time() - antiguedad
+        # <nombre>-<resumen>.pkl, .lock y los temporales de escribir(): .pkl.<pid>.<hilo>.tmp
+        patron = re.compile(rf'{re.escape(nombre)}-([0-9a-f]{{20}})\.(pkl|lock|pkl\.\d+\.\d+\.tmp)')
+        try:
+            ficheros = [(m.group(1), m.group(2), os.path.join(self.directorio, f))
+                        for f in os.listdir(self.directorio) for m in [patron.fullmatch(f)] if m]
+        except OSError:
+            return 0
+        borradas, vigentes = 0, set()
+        for resumen, extension, ruta in ficheros:
+            if extension == 'lock':
+                continue
+            try:
+                if os.path.getmtime(ruta) >= limite:
+                    vigentes.add(resumen)
+                    continue
+                os.remove(ruta)
+                borradas += extension == 'pkl'
+            except OSError:
+                pass
+        for resumen, extension, ruta in ficheros:
+            if extension == 'lock' and resumen not in vigentes:
+                self._borrar_cerrojo(ruta)
+        return borradas
+
+    def _borrar_cerrojo(self, ruta):
+        # Solo si nadie lo tiene tomado en este momento.
+        try:
+            with open(ruta, 'a') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.remove(ruta)
+        except OSError:
+            pass
+
+    @contextmanager
+    def cerrojo(self, nombre, clave):
+        if fcntl is None:
+            yield
+            return
+        with open(self._ruta(nombre, clave, 'lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class _Vuelo:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.error = None
+
+_almacen_compartido = None
+
+def almacen_compartido():
+    global _almacen_compartido
+    if _almacen_compartido is None:
+        try:
+            _almacen_compartido = AlmacenDisco()
+        except OSError:
+            return None
+    return _almacen_compartido
+
+_caches = []
+
+class CacheSWR:
+    def __init__(self, nombre, ttl, max_obsolescencia=MAX_OBSOLESCENCIA, ttl_vacio=60, cortacircuitos=CORTACIRCUITOS_YAHOO, almacen=None,
+                 vigencia=None, max_entradas=MAX_ENTRADAS):
+        self.nombre = nombre
+        # Política de frescura propia del dataset: vigencia(valor, creado) → segundos de validez, o None para usar ttl.
+        self.vigencia = vigencia
+        # Si se define (p. ej. para encolar en cola.py), sustituye al hilo de refresco de fondo.
+        self.refresco_externo = None
+        self.ttl = ttl
+        self.max_obsolescencia = max_obsolescencia
+        self.ttl_vacio = ttl_vacio
+        self.cortacircuitos = cortacircuitos
+        self.almacen = almacen if almacen is not None else almacen_compartido()
+        # LRU en memoria: el almacén en disco conserva lo que se expulse de aquí.
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._ultima_purga = 0.0
+        self._errores = {}
+        self._refrescando = set()
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self.metricas = {'peticiones': 0, 'descargas': 0, 'coalescidas_hilos': 0, 'coalescidas_procesos': 0}
+        _caches.append(self)
+
+    def _contar(self, metrica):
+        with self._lock:
+            self.metricas[metrica] += 1
+
+    def _ttl(self, valor, creado):
+        if not valor:
+            return self.ttl_vacio
+        if self.vigencia is not None:
+            segundos = self.vigencia(valor, creado)
+            if segundos is not None:
+                return segundos
+        return self.ttl
+
+    def _horizonte(self):
+        """Edad a partir de la cual una entrada ya no se sirve nunca."""
+        return max(self.max_obsolescencia, self.ttl, self.ttl_vacio)
+
+    def _recordar(self, clave, entrada):
+        # Se llama con self._lock tomado.
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            expulsada, _ = self._entradas.popitem(last=False)
+            self._errores.pop(expulsada, None)
+
+    def _leer(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+        if self.almacen is not None and (entrada is None or time.time() - entrada[1] > self._ttl(*entrada)):
+            # Otro proceso (o un trabajador de fondo) puede haber dejado una copia más reciente.
+            en_disco = self.almacen.leer(self.nombre, clave)
+            if en_disco is not None and (entrada is None or en_disco[1] > entrada[1]):
+                with self._lock:
+                    self._recordar(clave, en_disco)
+                entrada = en_disco
+        return entrada
+
+    def _escribir(self, clave, valor):
+        entrada = (valor, time.time())
+        with self._lock:
+            self._recordar(clave, entrada)
+            toca_purgar = entrada[1] - self._ultima_purga >= INTERVALO_PURGA
+            if toca_purgar:
+                self._ultima_purga = entrada[1]
+        if self.almacen is not None:
+            self.almacen.escribir(self.nombre, clave, entrada)
+        if toca_purgar:
+            _ejecutor_refresco.submit(self.purgar)
+
+    def _descargar(self, clave, funcion, args):
+        """Single-flight: solo un hilo por clave descarga; el resto espera su resultado."""
+        with self._lock:
+            vuelo = self._en_vuelo.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._en_vuelo[clave] = _Vuelo()
+        if not lider:
+            self._contar('coalescidas_hilos')
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.valor
+        try:
+            vuelo.valor = self._descargar_entre_procesos(clave, funcion, args)
+            return vuelo.valor
+        except Exception as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+            vuelo.evento.set()
+
+    def _descargar_entre_procesos(self, clave, funcion, args):
+        if self.almacen is None:
+            return self._descargar_del_origen(clave, funcion, args)
+        with self.almacen.cerrojo(self.nombre, clave):
+            en_disco = self.almacen.leer(self.nombre, clave)
+            if en_disco is not None and time.time() - en_disco[1] <= self._ttl(*en_disco):
+                self._contar('coalescidas_procesos')
+                with self._lock:
+                    self._recordar(clave, en_disco)
+                return en_disco[0]
+            return self._descargar_del_origen(clave, funcion, args)
+
+    def _descargar_del_origen(self, clave, funcion, args):
+        """Llama al origen. Un resultado vacío con una copia buena previa se trata como fallo (throttling)."""
+        if not self.cortacircuitos.permite():
+            raise CircuitoAbierto(f"Origen no disponible temporalmente ({self.nombre}).")
+        self._contar('descargas')
+        try:
+            valor = funcion(*args)
+        except Exception as e:
+            if self.cortacircuitos.cuenta(e):
+                self.cortacircuitos.fallo()
+            raise
+        anterior = self._leer(clave)
+        if not valor and anterior is not None and anterior[0]:
+            self.cortacircuitos.fallo()
+            raise ValueError(f"El origen devolvió datos vacíos para {clave} ({self.nombre}).")
+        self.cortacircuitos.exito()
+        self._escribir(clave, valor)
+        return valor
+
+    def _refrescar_en_segundo_plano(self, clave, funcion, args):
+        if self.refresco_externo is not None:
+            try:
+                self.refresco_externo(clave)
+                return
+            except Exception:
+                pass
+        with self._lock:
+            if clave in self._refrescando:
+                return
+            self._refrescando.add(clave)
+
+        def tarea():
+            try:
+                self._descargar(clave, funcion, args)
+                self._errores.pop(clave, None)
+            except Exception as e:
+                self._errores[clave] = str(e)
+            finally:
+                with self._lock:
+                    self._refrescando.discard(clave)
+
+        _ejecutor_refresco.submit(tarea)
+
+    def obtener(self, clave, funcion, *args):
+        """Devuelve (valor, frescura) con frescura = {'estado', 'edad', 'error'}."""
+        self._contar('peticiones')
+        entrada = self._leer(clave)
+        if entrada is not None:
+            valor, creado = entrada
+            edad = time.time() - creado
+            if edad <= self._ttl(valor, creado):
+                return valor, {'estado': FRESCO, 'edad': edad, 'error': None}
+            if valor and edad <= self.max_obsolescencia:
+                self._refrescar_en_segundo_plano(clave, funcion, args)
+                error = self._errores.get(clave)
+                if error is None and self.cortacircuitos.abierto:
+                    error = "Circuito abierto tras fallos repetidos del origen."
+                return valor, {'estado': SIN_CONEXION if error else OBSOLETO, 'edad': edad, 'error': error}
+        # Sin entrada utilizable (o más antigua que la obsolescencia máxima): descarga bloqueante.
+        valor = self._descargar(clave, funcion, args)
+        self._errores.pop(clave, None)
+        return valor, {'estado': FRESCO, 'edad': 0.0, 'error': None}
+
+    def entrada_utilizable(self, clave):
+        entrada = self._leer(clave)
+        return entrada is not None and time.time() - entrada[1] <= (self.max_obsolescencia if entrada[0] else self.ttl_vacio)
+
+    def tiene_copia(self, clave):
+        """Aproximación barata de entrada_utilizable: del disco solo mira la fecha del fichero, sin deserializarlo."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+        if entrada is not None and time.time() - entrada[1] <= (self.max_obsolescencia if entrada[0] else self.ttl_vacio):
+            return True
+        edad = self.almacen.edad(self.nombre, clave) if self.almacen is not None else None
+        return edad is not None and edad <= self.max_obsolescencia
+
+    def es_fresca(self, clave):
+        entrada = self._leer(clave)
+        return entrada is not None and time.time() - entrada[1] <= self._ttl(*entrada)
+
+    def guardar(self, clave, valor):
+        """Siembra un valor obtenido por otra vía (p. ej. una descarga en bloque)."""
+        self._escribir(clave, valor)
+        self._errores.pop(clave, None)
+
+    def refrescar(self, clave, funcion, *args):
+        """Descarga forzada (coalescida) que deja el resultado en memoria y en el almacén compartido."""
+        valor = self._descargar(clave, funcion, args)
+        self._errores.pop(clave, None)
+        return valor
+
+    def purgar(self):
+        """Olvida, en memoria y en disco, las entradas más antiguas de lo que se serviría nunca."""
+        limite = time.time() - self._horizonte()
+        with self._lock:
+            for clave in [c for c, (_, creado) in self._entradas.items() if creado < limite]:
+                del self._entradas[clave]
+                self._errores.pop(clave, None)
+        return self.almacen.purgar(self.nombre, self._horizonte()) if self.almacen is not None else 0
+
+    def invalidar(self, clave=None):
+        with self._lock:
+            claves = list(self._entradas) if clave is None else [clave]
+            for c in claves:
+                self._entradas.pop(c, None)
+        if self.almacen is not None:
+            for c in claves:
+                self.almacen.borrar(self.nombre, c)
+
+def metricas_coalescencia():
+    return {cache.nombre: dict(cache.metricas) for cache in _caches}
+
+def describir_frescura(frescura):
+    edad = frescura['edad']
+    if edad < 90:
+        hace = f"{edad:.0f} s"
+    elif edad < 5400:
+        hace = f"{edad / 60:.0f} min"
+    else:
+        hace = f"{edad / 3600:.1f} h"
+    if frescura['estado'] == FRESCO:
+        return f"🟢 Datos actualizados (hace {hace})."
+    if frescura['estado'] == OBSOLETO:
+        return f"🟠 Datos de hace {hace}; actualizando en segundo plano."
+    return f"🔴 Yahoo Finance no responde. Mostrando la última copia disponible (hace {hace})."
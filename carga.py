@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- PRUEBA DE CARGA DE UNA RÉPLICA ---
+# Lanza N sesiones de Streamlit sin navegador (AppTest) a la vez contra una
+# réplica en este mismo proceso: cada usuario virtual abre la página, escribe
+# un ticker y pulsa 'Analizar Acción', una y otra vez hasta agotar el tiempo
+# del escalón. Las sesiones comparten, como en el servidor real, las cachés de
+# datos, st.cache_data y los índices.
+# Los datos salen del proveedor offline (fixtures.py), así que el resultado no
+# depende de Yahoo; ANALIZADOR_FIXTURES_LATENCIA (--latencia) simula su espera.
+# Todo lo que la app escribe (cachés, cubo, instantáneas) va a un directorio
+# temporal.
+# Por escalón: análisis por segundo, latencias p50/p95/p99 del clic hasta la
+# página completa, CPU y RSS del proceso. El punto de saturación es el primer
+# escalón en que el rendimiento deja de crecer o el p95 supera el objetivo.
+#   python carga.py --niveles 1 2 4 8 16 --duracion 60 --slo-p95 3
+
+RUTA_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+NIVELES = [1, 2, 4, 8, 16]
+DURACION_NIVEL = 30
+UNIVERSO = 40
+SLO_P95 = 5.0
+MEJORA_MINIMA = 0.10     # por debajo de esto, más usuarios ya no dan más rendimiento
+TIMEOUT_SESION = 300
+ETIQUETA_BOTON = 'Analizar Acción'
+
+def preparar_entorno(directorio, latencia):
+    """Fixtures y rutas de escritura propias. Tiene que ir antes de que se importe ningún módulo de la app."""
+    os.environ['ANALIZADOR_FIXTURES'] = '1'
+    os.environ['ANALIZADOR_FIXTURES_LATENCIA'] = str(latencia)
+    for variable, nombre in (('ANALIZADOR_DIR_CACHE', 'cache'), ('ANALIZADOR_CUBO', 'cubo'), ('ANALIZADOR_INSTANTANEAS', 'instantaneas'),
+                             ('ANALIZADOR_SIMBOLOS', 'simbolos.csv'), ('ANALIZADOR_MONITOR', 'monitor_estado.json')):
+        os.environ[variable] = os.path.join(directorio, nombre)
+
+def sesiones_concurrentes():
+    """Deja que varias AppTest se ejecuten a la vez en el mismo proceso.
+
+    AppTest está pensado para una sola sesión: cada ejecución instala su
+    runtime simulado en Runtime._instance y lo borra al terminar, así que la
+    primera sesión que acaba deja sin runtime a las que siguen en marcha. Aquí,
+    si no hay ninguno instalado, se usa el último que hubo.
+    """
+    from streamlit.runtime import Runtime
+
+    ultimo = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            ultimo['runtime'] = cls._instance
+        if 'runtime' not in ultimo:
+            raise RuntimeError("Runtime hasn't been created!")
+        return cls._instance or ultimo['runtime']
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or 'runtime' in ultimo)
+    # Cada hilo de usuario sin contexto de script lo avisa en el log; aquí no aporta nada.
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+
+def memoria_mb():
+    """(RSS actual, pico de RSS) del proceso en MB."""
+    try:
+        with open('/proc/self/status') as f:
+            campos = dict(linea.split(':', 1) for linea in f if ':' in linea)
+        return int(campos['VmRSS'].split()[0]) / 1024, int(campos['VmHWM'].split()[0]) / 1024
+    except (OSError, KeyError):
+        pass
+    # Sin /proc solo hay el pico (ru_maxrss: KB en Linux, bytes en macOS); en Windows no hay módulo resource.
+    try:
+        import resource
+    except ImportError:
+        return np.nan, np.nan
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pico = pico / 2**20 if sys.platform == 'darwin' else pico / 2**10
+    return pico, pico
+
+def tiempo_cpu():
+    # Usuario + sistema de todo el proceso (todos los hilos), también en Windows.
+    return time.process_time()
+
+def sesion(ticker):
+    """Una visita completa. Devuelve (segundos de la carga inicial, segundos del análisis, error o None)."""
+    from streamlit.testing.v1 import AppTest
+
+    inicio = time.perf_counter()
+    app = AppTest.from_file(RUTA_APP, default_timeout=TIMEOUT_SESION).run()
+    cargada = time.perf_counter()
+    app.text_input(key='ticker_input').set_value(ticker)
+    next(b for b in app.button if b.label == ETIQUETA_BOTON).click().run()
+    fin = time.perf_counter()
+    if app.exception:
+        return cargada - inicio, fin - cargada, app.exception[0].value
+    if not app.header:
+        # Sin cabecera de análisis: la app mostró un error (ticker rechazado, Yahoo caído...).
+        return cargada - inicio, fin - cargada, app.error[0].value if app.error else "Sin análisis."
+    return cargada - inicio, fin - cargada, None
+
+def usuario_virtual(tickers, limite, resultados, semilla):
+    rng = random.Random(semilla)
+    while time.perf_counter() < limite:
+        try:
+            resultados.append(sesion(rng.choice(tickers)))
+        except Exception as e:
+            resultados.append((None, None, f"{type(e).__name__}: {e}"))
+
+def escalon(usuarios, tickers, duracion):
+    """Mide un escalón de `usuarios` sesiones concurrentes durante `duracion` segundos."""
+    resultados = []
+    cpu_inicio, inicio = tiempo_cpu(), time.perf_counter()
+    limite = inicio + duracion
+    hilos = [threading.Thread(target=usuario_virtual, args=(tickers, limite, resultados, i), daemon=True, name=f'usuario-{i}')
+             for i in range(usuarios)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    # Las sesiones empezadas antes del límite terminan después: la duración real es hasta la última.
+    transcurrido = time.perf_counter() - inicio
+    cpu = tiempo_cpu() - cpu_inicio
+    rss, pico = memoria_mb()
+    analisis = np.array([r[1] for r in resultados if r[2] is None])
+    cargas = np.array([r[0] for r in resultados if r[2] is None])
+    p50, p95, p99 = np.percentile(analisis, [50, 95, 99]) if len(analisis) else (np.nan,) * 3
+    errores = [r[2] for r in resultados if r[2] is not None]
+    return {
+        'usuarios': usuarios, 'analisis': len(analisis), 'errores': len(errores),
+        'por_segundo': len(analisis) / transcurrido, 'p50': p50, 'p95': p95, 'p99': p99,
+        'carga_p50': np.median(cargas) if len(cargas) else np.nan,
+        'cpu_pct': 100 * cpu / transcurrido, 'rss_mb': rss, 'pico_rss_mb': pico,
+        'primer_error': errores[0] if errores else None,
+    }
+
+def _saturado(actual, anterior, slo_p95, mejora_minima):
+    if actual['p95'] > slo_p95 or actual['errores']:
+        return True
+    return anterior is not None and actual['por_segundo'] < anterior['por_segundo'] * (1 + mejora_minima)
+
+def punto_saturacion(escalones, slo_p95=SLO_P95, mejora_minima=MEJORA_MINIMA):
+    """Primer escalón en que el rendimiento no mejora lo suficiente o el p95 supera el objetivo (None si ninguno)."""
+    for anterior, actual in zip([None] + escalones[:-1], escalones):
+        if _saturado(actual, anterior, slo_p95, mejora_minima):
+            return actual
+    return None
+
+def calentar(tickers):
+    """Rellena las cachés de datos de todos los tickers para medir el estado estable, no las primeras descargas."""
+    from adquisicion import obtener_datos_completos_swr, obtener_historicos_swr
+
+    for ticker in tickers:
+        obtener_datos_completos_swr(ticker)
+        obtener_historicos_swr(ticker)
+    # Una sesión completa compila el script y llena st.cache_data.
+    sesion(tickers[0])
+
+def prueba_carga(niveles=NIVELES, duracion=DURACION_NIVEL, universo=UNIVERSO, en_frio=False, slo_p95=SLO_P95, informar=print):
+    tickers = [f'CARGA{i:03d}' for i in range(universo)]
+    if not en_frio:
+        calentar(tickers)
+    escalones, seguidos = [], 0
+    for usuarios in niveles:
+        actual = escalon(usuarios, tickers, duracion)
+        informar(f"{usuarios:>4} usuarios: {actual['por_segundo']:.2f} análisis/s · p95 {actual['p95']:.2f} s · "
+                 f"CPU {actual['cpu_pct']:.0f}% · RSS {actual['rss_mb']:.0f} MB")
+        seguidos = seguidos + 1 if _saturado(actual, escalones[-1] if escalones else None, slo_p95, MEJORA_MINIMA) else 0
+        escalones.append(actual)
+        if seguidos == 2:
+            # Dos escalones seguidos saturados: subir más solo alarga la prueba.
+            break
+    return escalones, punto_saturacion(escalones, slo_p95)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prueba de carga de una réplica de la app con sesiones concurrentes sin navegador.")
+    parser.add_argument('--niveles', type=int, nargs='+', default=NIVELES, help="Usuarios concurrentes de cada escalón.")
+    parser.add_argument('--duracion', type=float, default=DURACION_NIVEL, help="Segundos por escalón.")
+    parser.add_argument('--universo', type=int, default=UNIVERSO, help="Tickers distintos entre los que eligen los usuarios.")
+    parser.add_argument('--latencia', type=float, default=0.0, help="Espera simulada de cada petición a Yahoo (s).")
+    parser.add_argument('--en-frio', action='store_true', help="No precalentar las cachés: incluye las primeras descargas.")
+    parser.add_argument('--slo-p95', type=float, default=SLO_P95, help="p95 máximo aceptable del análisis (s).")
+    parser.add_argument('--directorio', default=None, help="Dónde escribe la app (por defecto, uno temporal).")
+    parser.add_argument('--json', help="Guarda los resultados de cada escalón en este fichero.")
+    args = parser.parse_args()
+
+    directorio = args.directorio or tempfile.mkdtemp(prefix='carga-')
+    preparar_entorno(directorio, args.latencia)
+    sesiones_concurrentes()
+    print(f"Réplica {os.getpid()} · {os.cpu_count()} CPU · datos en {directorio}")
+    escalones, saturado = prueba_carga(sorted(set(args.niveles)), args.duracion, args.universo, args.en_frio, args.slo_p95)
+
+    tabla = pd.DataFrame(escalones).set_index('usuarios')
+    print()
+    print(tabla.drop(columns='primer_error').to_string(float_format=lambda v: f'{v:.2f}'))
+    for usuarios, error in tabla['primer_error'].dropna().items():
+        print(f"{usuarios} usuarios, primer error: {error}")
+    previos = [e for e in escalones if saturado is None or e['usuarios'] < saturado['usuarios']]
+    if saturado is None:
+        print(f"\nSin saturación hasta {escalones[-1]['usuarios']} usuarios (p95 ≤ {args.slo_p95} s).")
+    elif not previos:
+        print(f"\nSaturada ya con {saturado['usuarios']} usuarios: p95 {saturado['p95']:.2f} s, objetivo {args.slo_p95} s.")
+    else:
+        print(f"\nSaturación a {saturado['usuarios']} usuarios: capacidad de la réplica ≈ {previos[-1]['usuarios']} usuarios "
+              f"concurrentes ({previos[-1]['por_segundo']:.2f} análisis/s, p95 {previos[-1]['p95']:.2f} s).")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'cpu': os.cpu_count(), 'slo_p95': args.slo_p95, 'escalones': escalones,
+                       'saturacion': saturado['usuarios'] if saturado else None},
+                      f, ensure_ascii=False, indent=1, default=float)
@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+# --- COLA DE TRABAJOS DURADERA (SQLite) ---
+# La interfaz encola "refrescar ticker X" y los procesos de trabajador.py los
+# consumen, dejando el resultado en la caché compartida en disco. Menor
+# prioridad = más urgente: las peticiones interactivas adelantan a los lotes.
+# Cada trabajador deja un latido periódico; sin ninguno reciente la interfaz
+# no espera a la cola y descarga ella misma. Un trabajo fallido se reintenta
+# con espera exponencial.
+
+RUTA_COLA = os.environ.get('ANALIZADOR_COLA', '')
+
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_LOTE = 10
+
+PENDIENTE, EN_CURSO, HECHO, ERROR = 'pendiente', 'en_curso', 'hecho', 'error'
+
+MAX_INTENTOS = 3
+TIEMPO_MAXIMO_EN_CURSO = 300
+ESPERA_REINTENTO = 5         # segundos antes del 1.er reintento; se duplica en cada fallo
+INTERVALO_LATIDO = 5
+LATIDO_MAXIMO = 30           # un trabajador sin latido desde hace más se da por muerto
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    prioridad INTEGER NOT NULL,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    creado REAL NOT NULL,
+    iniciado REAL,
+    terminado REAL,
+    trabajador TEXT,
+    error TEXT,
+    disponible REAL
+);
+CREATE TABLE IF NOT EXISTS trabajadores (
+    nombre TEXT PRIMARY KEY,
+    latido REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_pendientes ON trabajos (estado, prioridad, id);
+CREATE INDEX IF NOT EXISTS idx_trabajos_clave ON trabajos (ticker, dataset, estado);
+"""
+
+def cola_activada():
+    return bool(RUTA_COLA)
+
+class ColaTrabajos:
+    def __init__(self, ruta=None):
+        self.ruta = ruta or RUTA_COLA or 'cola_trabajos.sqlite'
+        with closing(self._conexion()) as con:
+            con.executescript(ESQUEMA)
+            # Colas creadas antes de los reintentos con espera.
+            if 'disponible' not in {fila['name'] for fila in con.execute("PRAGMA table_info(trabajos)")}:
+                con.execute("ALTER TABLE trabajos ADD COLUMN disponible REAL")
+
+    def _conexion(self):
+        con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute('PRAGMA synchronous=NORMAL')
+        return con
+
+    def encolar(self, ticker, dataset, prioridad=PRIORIDAD_LOTE):
+        """Devuelve el id del trabajo. Si ya hay uno vivo para (ticker, dataset) se reutiliza y, si hace falta, se le sube la prioridad."""
+        con = self._conexion()
+        try:
+            con.execute('BEGIN IMMEDIATE')
+            fila = con.execute("SELECT id, prioridad FROM trabajos WHERE ticker = ? AND dataset = ? AND estado IN (?, ?) ORDER BY id LIMIT 1",
+                               (ticker, dataset, PENDIENTE, EN_CURSO)).fetchone()
+            if fila is not None:
+                if prioridad < fila['prioridad']:
+                    con.execute("UPDATE trabajos SET prioridad = ? WHERE id = ?", (prioridad, fila['id']))
+                con.execute('COMMIT')
+                return fila['id']
+            cursor = con.execute("INSERT INTO trabajos (ticker, dataset, prioridad, estado, creado) VALUES (?, ?, ?, ?, ?)",
+                                 (ticker, dataset, prioridad, PENDIENTE, time.time()))
+            con.execute('COMMIT')
+            return cursor.lastrowid
+        except Exception:
+            con.execute('ROLLBACK')
+            raise
+        finally:
+            con.close()
+
+    def reclamar(self, trabajador):
+        con = self._conexion()
+        try:
+            con.execute('BEGIN IMMEDIATE')
+            fila = con.execute("SELECT * FROM trabajos WHERE estado = ? AND (disponible IS NULL OR disponible <= ?) ORDER BY prioridad, id LIMIT 1",
+                               (PENDIENTE, time.time())).fetchone()
+            if fila is None:
+                con.execute('COMMIT')
+                return None
+            con.execute("UPDATE trabajos SET estado = ?, iniciado = ?, trabajador = ?, intentos = intentos + 1 WHERE id = ?",
+                        (EN_CURSO, time.time(), trabajador, fila['id']))
+            con.execute('COMMIT')
+            return dict(fila)
+        except Exception:
+            con.execute('ROLLBACK')
+            raise
+        finally:
+            con.close()
+
+    def completar(self, id_trabajo):
+        with closing(self._conexion()) as con:
+            con.execute("UPDATE trabajos SET estado = ?, terminado = ?, error = NULL WHERE id = ?", (HECHO, time.time(), id_trabajo))
+
+    def fallar(self, id_trabajo, error):
+        """Vuelve a pendiente tras ESPERA_REINTENTO · 2^(intentos-1) segundos, o queda en error al agotar MAX_INTENTOS."""
+        ahora = time.time()
+        with closing(self._conexion()) as con:
+            con.execute("UPDATE trabajos SET estado = CASE WHEN intentos < ? THEN ? ELSE ? END, terminado = ?, error = ?, "
+                        "disponible = ? + ? * (1 << (intentos - 1)) WHERE id = ?",
+                        (MAX_INTENTOS, PENDIENTE, ERROR, ahora, str(error), ahora, ESPERA_REINTENTO, id_trabajo))
+
+    def latir(self, trabajador):
+        with closing(self._conexion()) as con:
+            con.execute("INSERT INTO trabajadores (nombre, latido) VALUES (?, ?) ON CONFLICT (nombre) DO UPDATE SET latido = excluded.latido",
+                        (trabajador, time.time()))
+
+    def despedir(self, trabajador):
+        with closing(self._conexion()) as con:
+            con.execute("DELETE FROM trabajadores WHERE nombre = ?", (trabajador,))
+
+    def trabajadores_vivos(self, latido_maximo=LATIDO_MAXIMO):
+        """Número de trabajadores con latido reciente."""
+        with closing(self._conexion()) as con:
+            return con.execute("SELECT COUNT(*) FROM trabajadores WHERE latido >= ?", (time.time() - latido_maximo,)).fetchone()[0]
+
+    def recuperar_huerfanos(self, tiempo_maximo=TIEMPO_MAXIMO_EN_CURSO):
+        """Trabajos de un trabajador que murió a mitad: cuentan como un fallo, con la misma espera y el mismo límite que fallar."""
+        ahora = time.time()
+        with closing(self._conexion()) as con:
+            return con.execute("UPDATE trabajos SET estado = CASE WHEN intentos < ? THEN ? ELSE ? END, trabajador = NULL, terminado = ?, "
+                               "error = ?, disponible = ? + ? * (1 << (intentos - 1)) WHERE estado = ? AND iniciado < ?",
+                               (MAX_INTENTOS, PENDIENTE, ERROR, ahora, "El trabajador murió a mitad del trabajo.", ahora, ESPERA_REINTENTO,
+                                EN_CURSO, ahora - tiempo_maximo)).rowcount
+
+    def estado(self, id_trabajo):
+        with closing(self._conexion()) as con:
+            fila = con.execute("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+        return dict(fila) if fila is not None else None
+
+    def esperar(self, ids, timeout=60, intervalo=0.2):
+        """Sondea hasta que todos los trabajos terminen. Devuelve {id: estado} (los no terminados siguen en pendiente/en_curso)."""
+        limite = time.time() + timeout
+        marcadores = ','.join('?' * len(ids))
+        while True:
+            with closing(self._conexion()) as con:
+                filas = con.execute(f"SELECT id, estado FROM trabajos WHERE id IN ({marcadores})", list(ids)).fetchall()
+            estados = {fila['id']: fila['estado'] for fila in filas}
+            if all(e in (HECHO, ERROR) for e in estados.values()) or time.time() >= limite:
+                return estados
+            time.sleep(intervalo)
+
+    def resumen(self):
+        with closing(self._conexion()) as con:
+            filas = con.execute("SELECT estado, COUNT(*) AS n FROM trabajos GROUP BY estado").fetchall()
+        return {fila['estado']: fila['n'] for fila in filas}
+
+    def purgar(self, antiguedad=7 * 24 * 3600):
+        with closing(self._conexion()) as con:
+            con.execute("DELETE FROM trabajadores WHERE latido < ?", (time.time() - antiguedad,))
+            return con.execute("DELETE FROM trabajos WHERE estado IN (?, ?) AND terminado < ?", (HECHO, ERROR, time.time() - antiguedad)).rowcount
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from adquisicion import CACHE_FUNDAMENTALES, CACHE_HISTORICOS, obtener_datos_completos_swr, obtener_historicos_swr
+from puntuacion import SECTOR_BENCHMARKS, calcular_nota_final, calcular_puntuaciones_y_justificaciones
+
+# --- COMPARATIVA CON PARES DEL SECTOR ---
+# Los pares se descargan y puntúan en paralelo reutilizando las cachés SWR, así
+# que los ya analizados salen al instante y solo los nuevos cuestan una descarga.
+# La tabla enfrenta las métricas clave y las notas por bloque con el umbral
+# "bueno/justo" del sector en SECTOR_BENCHMARKS.
+
+MAX_HILOS_PARES = 8
+MAX_PARES = 10
+
+# (columna de la tabla, campo en datos/hist_data, clave de benchmark o None)
+METRICAS_COMPARABLES = [
+    ('ROE (%)', 'roe', 'roe_bueno'),
+    ('ROIC (%)', 'roic', 'roic_bueno'),
+    ('Margen Op. (%)', 'margen_operativo', 'margen_bueno'),
+    ('Margen Neto (%)', 'margen_beneficio', 'margen_neto_bueno'),
+    ('CAGR BPA (%)', 'bpa_cagr', 'bpa_growth_bueno'),
+    ('CAGR FCF (%)', 'cagr_fcf', 'fcf_growth_bueno'),
+    ('PER', 'per', 'per_justo'),
+    ('P/B', 'p_b', 'pb_justo'),
+    ('P/FCF', 'p_fcf', None),
+    ('Deuda/EBITDA', 'deuda_ebitda', 'deuda_ebitda_aceptable'),
+    ('Cobertura Int.', 'interest_coverage', 'int_coverage_bueno'),
+    ('Yield (%)', 'yield_dividendo', None),
+    ('Payout (%)', 'payout_ratio', 'payout_aceptable'),
+]
+NOTAS_COMPARABLES = [('Calidad', 'calidad'), ('Valoración', 'valoracion'), ('Salud', 'salud'), ('Dividendos', 'dividendos')]
+
+def _numero(valor):
+    if valor is None or isinstance(valor, str):
+        return np.nan
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+def en_cache(ticker):
+    # Sin deserializar nada: se llama para cada candidato del sector al ordenar las sugerencias.
+    return CACHE_FUNDAMENTALES.tiene_copia(ticker) and CACHE_HISTORICOS.tiene_copia(ticker)
+
+def analizar_par(ticker):
+    """Fila de la tabla para un ticker (descarga solo lo que no esté en caché)."""
+    datos, _ = obtener_datos_completos_swr(ticker)
+    if not datos:
+        raise ValueError(f"Sin datos para {ticker}.")
+    hist_data, _ = obtener_historicos_swr(ticker)
+    hist_data = hist_data or {}
+    puntuaciones, _, _ = calcular_puntuaciones_y_justificaciones(datos, hist_data)
+    fila = {'Ticker': ticker, 'Empresa': datos.get('nombre', ticker), 'Sector': datos.get('sector'), 'Industria': datos.get('industria')}
+    for columna, campo, _ in METRICAS_COMPARABLES:
+        fila[columna] = _numero(datos.get(campo) if campo in datos else hist_data.get(campo))
+    for columna, clave in NOTAS_COMPARABLES:
+        fila[columna] = _numero(puntuaciones.get(clave))
+    fila['Nota Global'] = calcular_nota_final(puntuaciones)
+    return fila
+
+def analizar_pares(tickers, max_hilos=MAX_HILOS_PARES):
+    """Analiza los pares en paralelo. Devuelve (filas por ticker, {ticker: error})."""
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    filas, errores = {}, {}
+    if not tickers:
+        return filas, errores
+    with ThreadPoolExecutor(max_workers=min(max_hilos, len(tickers)), thread_name_prefix='pares') as ejecutor:
+        futuros = {ejecutor.submit(analizar_par, t): t for t in tickers}
+        for futuro in as_completed(futuros):
+            ticker = futuros[futuro]
+            try:
+                filas[ticker] = futuro.result()
+            except Exception as e:
+                errores[ticker] = str(e)
+    return filas, errores
+
+def fila_benchmark(sector):
+    bench = SECTOR_BENCHMARKS.get(sector, SECTOR_BENCHMARKS['Default'])
+    fila = {'Ticker': 'BENCHMARK', 'Empresa': f"Referencia {sector if sector in SECTOR_BENCHMARKS else 'general'}", 'Sector': sector, 'Industria': ''}
+    for columna, _, clave in METRICAS_COMPARABLES:
+        fila[columna] = bench[clave] if clave else np.nan
+    return fila
+
+def tabla_comparables(objetivo, pares, sector, max_hilos=MAX_HILOS_PARES):
+    """Tabla (DataFrame indexado por ticker) con el objetivo, los pares y la fila de benchmark del sector."""
+    objetivo = objetivo.strip().upper()
+    pares = [p.strip().upper() for p in pares if p and p.strip()]
+    tickers = list(dict.fromkeys([objetivo] + [p for p in pares if p != objetivo][:MAX_PARES]))
+    filas, errores = analizar_pares(tickers, max_hilos)
+    orden = [t for t in tickers if t in filas]
+    tabla = pd.DataFrame([filas[t] for t in orden] + [fila_benchmark(sector)]).set_index('Ticker')
+    return tabla, errores
+
+def pares_sugeridos(cubo, objetivo, sector, limite=MAX_PARES):
+    """Tickers del mismo sector ya registrados en el cubo, empezando por los que están en caché."""
+    if cubo is None or not len(cubo):
+        return []
+    candidatos = [t for t, s in zip(cubo.tickers, cubo.sectores) if s == sector and t != objetivo.upper()]
+    candidatos.sort(key=lambda t: not en_cache(t))
+    return candidatos[:limite]
@@ -0,0 +1,348 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from cubo import CAMPOS_CUBO
+from puntuacion import PESOS, SECTOR_BENCHMARKS, calcular_puntuaciones_vectorizado
+
+# --- CRIBADO DEL UNIVERSO CON UN PEQUEÑO LENGUAJE DE CONSULTA ---
+# Ejemplo:
+#   sector == 'Utilities' and yield_dividendo > 4 and payout_ratio < sector.payout_aceptable
+#   and nota_final >= 6 order by nota_final desc limit 20
+# La consulta se compila una vez (plan cacheado con lru_cache) a un árbol de
+# funciones que operan sobre columnas NumPy completas de TablaPuntuaciones.
+# Las igualdades de sector/país en el nivel superior usan un índice invertido:
+# se parte solo de las filas de ese sector y el resto de filtros se evalúa
+# sobre ese subconjunto.
+# `sector.<clave>` es el umbral de SECTOR_BENCHMARKS del sector de cada fila.
+
+CAMPOS_TEXTO = ['ticker', 'sector', 'pais']
+CAMPOS_INDEXADOS = ['sector', 'pais']
+CAMPOS_PUNTUACION = ['geopolitico', 'penalizador_geo', 'calidad', 'salud', 'valoracion', 'dividendos',
+                     'margen_seguridad_analistas', 'margen_seguridad_per', 'margen_seguridad_yield', 'peg_lynch', 'nota_final']
+CAMPOS_CONSULTABLES = set(CAMPOS_CUBO) | set(CAMPOS_PUNTUACION) | set(CAMPOS_TEXTO)
+CLAVES_BENCHMARK = set(SECTOR_BENCHMARKS['Default'])
+
+class ErrorConsulta(ValueError):
+    pass
+
+def _tipo(operando):
+    """'texto' o 'número': lo que produce un operando al evaluarse."""
+    tipo, valor = operando
+    return 'texto' if tipo == 'txt' or (tipo == 'campo' and valor in CAMPOS_TEXTO) else 'número'
+
+def _describir(operando):
+    tipo, valor = operando
+    if tipo == 'txt':
+        return f"'{valor}'"
+    if tipo == 'num':
+        return f"{valor:g}"
+    return f"sector.{valor}" if tipo == 'bench' else valor
+
+# --- TABLA DE PUNTUACIONES (columnas NumPy del universo) ---
+class TablaPuntuaciones:
+    def __init__(self, tickers, sectores, paises, columnas):
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.sectores = np.asarray(sectores, dtype=object)
+        self.paises = np.asarray(paises, dtype=object)
+        self.columnas = {campo: np.asarray(valores, dtype=float) for campo, valores in columnas.items()}
+        self._texto = {'ticker': self.tickers, 'sector': self.sectores, 'pais': self.paises}
+        self._indice = {campo: self._indexar(self._texto[campo]) for campo in CAMPOS_INDEXADOS}
+        self._sectores_unicos, self._codigo_sector = np.unique(self.sectores.astype(str), return_inverse=True)
+        self._benchmarks = {}
+
+    @classmethod
+    def desde_cubo(cls, cubo, periodo=None, pesos=PESOS):
+        if cubo is None or not len(cubo) or not cubo.periodos:
+            return cls([], [], [], {})
+        columnas = {campo: np.array(valores) for campo, valores in cubo.columnas([c for c in CAMPOS_CUBO if c in cubo.campos], periodo).items()}
+        columnas.update(calcular_puntuaciones_vectorizado(columnas, cubo.sectores, cubo.paises, pesos))
+        return cls(cubo.tickers, cubo.sectores, cubo.paises, columnas)
+
+    @staticmethod
+    def _indexar(valores):
+        """Índice invertido valor → posiciones (ordenadas)."""
+        orden = np.argsort(valores.astype(str), kind='stable')
+        ordenados = valores[orden].astype(str)
+        unicos, inicios = np.unique(ordenados, return_index=True)
+        fines = np.append(inicios[1:], len(ordenados))
+        return {u: np.sort(orden[i:f]) for u, i, f in zip(unicos, inicios, fines)}
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def posiciones(self, campo, valor):
+        return self._indice[campo].get(valor, np.empty(0, dtype=np.int64))
+
+    def columna(self, campo):
+        if campo in self._texto:
+            return self._texto[campo]
+        if campo in self.columnas:
+            return self.columnas[campo]
+        return np.full(len(self), np.nan)
+
+    def benchmark(self, clave):
+        valores = self._benchmarks.get(clave)
+        if valores is None:
+            # Un valor por sector distinto, repartido a las filas con el código de sector.
+            por_sector = np.array([SECTOR_BENCHMARKS.get(s, SECTOR_BENCHMARKS['Default'])[clave] for s in self._sectores_unicos], dtype=float)
+            valores = self._benchmarks[clave] = por_sector[self._codigo_sector] if len(self) else np.empty(0)
+        return valores
+
+# --- ANÁLISIS LÉXICO Y SINTÁCTICO ---
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<numero>-?\d+(?:\.\d+)?)
+  | (?P<texto>'[^']*'|"[^"]*")
+  | (?P<operador>==|!=|>=|<=|>|<|=|\(|\)|,)
+  | (?P<nombre>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)?)
+)""", re.VERBOSE)
+
+PALABRAS_CLAVE = {'and', 'or', 'not', 'in', 'order', 'by', 'limit', 'asc', 'desc'}
+
+def _tokenizar(consulta):
+    tokens, posicion = [], 0
+    consulta = consulta.rstrip()
+    while posicion < len(consulta):
+        m = _TOKEN.match(consulta, posicion)
+        if m is None or m.end() == posicion:
+            raise ErrorConsulta(f"Carácter inesperado en la posición {posicion}: '{consulta[posicion:posicion + 10]}'")
+        tipo = m.lastgroup
+        valor, inicio = m.group(tipo), m.start(tipo)
+        if tipo == 'nombre' and valor.lower() in PALABRAS_CLAVE:
+            tipo, valor = 'clave', valor.lower()
+        elif tipo == 'operador' and valor == '=':
+            valor = '=='
+        tokens.append((tipo, valor, inicio))
+        posicion = m.end()
+    return tokens
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def _actual(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else (None, None, -1)
+
+    def _es(self, tipo, valor=None):
+        t, v, _ = self._actual()
+        return t == tipo and (valor is None or v == valor)
+
+    def _consumir(self, tipo, valor=None):
+        t, v, p = self._actual()
+        if t != tipo or (valor is not None and v != valor):
+            esperado = f"'{valor}'" if valor else {'nombre': 'un campo', 'numero': 'un número', 'texto': 'un texto'}.get(tipo, tipo)
+            raise ErrorConsulta(f"Se esperaba {esperado} en la posición {p}." if p >= 0 else f"Se esperaba {esperado} al final de la consulta.")
+        self.i += 1
+        return v
+
+    def consulta(self):
+        filtro = None if self._es('clave', 'order') or self._es('clave', 'limit') or self._actual()[0] is None else self.o()
+        orden, limite = [], None
+        if self._es('clave', 'order'):
+            self._consumir('clave', 'order'); self._consumir('clave', 'by')
+            while True:
+                campo = self._campo()
+                sentido = 'asc'
+                if self._es('clave', 'asc') or self._es('clave', 'desc'):
+                    sentido = self._consumir('clave')
+                orden.append((campo, sentido == 'desc'))
+                if not self._es('operador', ','):
+                    break
+                self._consumir('operador', ',')
+        if self._es('clave', 'limit'):
+            self._consumir('clave', 'limit')
+            p = self._actual()[2]
+            limite = int(float(self._consumir('numero')))
+            if limite < 0:
+                raise ErrorConsulta(f"El límite no puede ser negativo (posición {p}).")
+        if self._actual()[0] is not None:
+            raise ErrorConsulta(f"Sobra texto a partir de la posición {self._actual()[2]}.")
+        return filtro, tuple(orden), limite
+
+    def o(self):
+        nodos = [self.y()]
+        while self._es('clave', 'or'):
+            self._consumir('clave', 'or')
+            nodos.append(self.y())
+        return nodos[0] if len(nodos) == 1 else ('or', tuple(nodos))
+
+    def y(self):
+        nodos = [self.negacion()]
+        while self._es('clave', 'and'):
+            self._consumir('clave', 'and')
+            nodos.append(self.negacion())
+        return nodos[0] if len(nodos) == 1 else ('and', tuple(nodos))
+
+    def negacion(self):
+        if self._es('clave', 'not'):
+            self._consumir('clave', 'not')
+            return ('not', self.negacion())
+        if self._es('operador', '('):
+            self._consumir('operador', '(')
+            nodo = self.o()
+            self._consumir('operador', ')')
+            return nodo
+        return self.comparacion()
+
+    def comparacion(self):
+        # Los tipos se comprueban aquí: un 'sector > 3' fallaría (o no filtraría nada) al evaluarse sobre la tabla.
+        inicio = self._actual()[2]
+        izquierda = self.operando()
+        if self._es('clave', 'in'):
+            self._consumir('clave', 'in'); self._consumir('operador', '(')
+            valores = [self.literal()]
+            while self._es('operador', ','):
+                self._consumir('operador', ',')
+                valores.append(self.literal())
+            self._consumir('operador', ')')
+            for v in valores:
+                self._comprobar_tipos(izquierda, v, inicio)
+            return ('in', izquierda, tuple(v[1] for v in valores))
+        t, op, p = self._actual()
+        if t != 'operador' or op not in ('==', '!=', '>', '>=', '<', '<='):
+            raise ErrorConsulta(f"Se esperaba un operador de comparación en la posición {p}.")
+        self.i += 1
+        derecha = self.operando()
+        self._comprobar_tipos(izquierda, derecha, inicio)
+        return ('cmp', op, izquierda, derecha)
+
+    @staticmethod
+    def _comprobar_tipos(izquierda, derecha, posicion):
+        if _tipo(izquierda) != _tipo(derecha):
+            raise ErrorConsulta(f"No se puede comparar {_describir(izquierda)} ({_tipo(izquierda)}) con {_describir(derecha)} "
+                                f"({_tipo(derecha)}) (posición {posicion}).")
+
+    def literal(self):
+        if self._es('numero'):
+            return ('num', float(self._consumir('numero')))
+        if self._es('texto'):
+            return ('txt', self._consumir('texto')[1:-1])
+        raise ErrorConsulta(f"Se esperaba un número o un texto en la posición {self._actual()[2]}.")
+
+    def operando(self):
+        if self._es('numero') or self._es('texto'):
+            return self.literal()
+        return self._campo()
+
+    def _campo(self):
+        _, nombre, p = self._actual()
+        self._consumir('nombre')
+        if nombre.startswith('sector.'):
+            clave = nombre.split('.', 1)[1]
+            if clave not in CLAVES_BENCHMARK:
+                raise ErrorConsulta(f"'{clave}' no es un benchmark sectorial (posición {p}).")
+            return ('bench', clave)
+        if nombre not in CAMPOS_CONSULTABLES:
+            raise ErrorConsulta(f"Campo desconocido '{nombre}' (posición {p}).")
+        return ('campo', nombre)
+
+# --- COMPILACIÓN A FUNCIONES VECTORIZADAS ---
+_COMPARADORES = {'==': np.equal, '!=': np.not_equal, '>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal}
+
+def _compilar_operando(nodo):
+    tipo, valor = nodo
+    if tipo in ('num', 'txt'):
+        return lambda tabla, filas: valor
+    if tipo == 'bench':
+        return lambda tabla, filas: tabla.benchmark(valor) if filas is None else tabla.benchmark(valor)[filas]
+    return lambda tabla, filas: tabla.columna(valor) if filas is None else tabla.columna(valor)[filas]
+
+def _n_filas(tabla, filas):
+    return len(tabla) if filas is None else len(filas)
+
+def _compilar(nodo):
+    tipo = nodo[0]
+    if tipo == 'and' or tipo == 'or':
+        hijos = [_compilar(h) for h in nodo[1]]
+        combinar = np.logical_and if tipo == 'and' else np.logical_or
+        def evaluar(tabla, filas):
+            resultado = hijos[0](tabla, filas)
+            for hijo in hijos[1:]:
+                resultado = combinar(resultado, hijo(tabla, filas))
+            return resultado
+        return evaluar
+    if tipo == 'not':
+        hijo = _compilar(nodo[1])
+        return lambda tabla, filas: ~hijo(tabla, filas)
+    if tipo == 'in':
+        operando = _compilar_operando(nodo[1])
+        valores = list(nodo[2])
+        return lambda tabla, filas: np.isin(operando(tabla, filas), valores)
+    _, op, izquierda, derecha = nodo
+    izq, der, comparar = _compilar_operando(izquierda), _compilar_operando(derecha), _COMPARADORES[op]
+    def evaluar(tabla, filas):
+        a, b = izq(tabla, filas), der(tabla, filas)
+        with np.errstate(invalid='ignore'):
+            resultado = comparar(a, b)
+        # Comparar dos escalares (p. ej. 1 < 2) da un bool suelto: se expande a todas las filas.
+        return np.broadcast_to(np.asarray(resultado, dtype=bool), (_n_filas(tabla, filas),))
+    return evaluar
+
+def _ruta_indexada(nodo):
+    """Separa las igualdades sector/país del nivel superior (ruta rápida por índice) del resto del filtro."""
+    conjuntos = nodo[1] if nodo is not None and nodo[0] == 'and' else ((nodo,) if nodo is not None else ())
+    indexadas, resto = [], []
+    for c in conjuntos:
+        if c[0] == 'cmp' and c[1] == '==' and c[2][0] == 'campo' and c[2][1] in CAMPOS_INDEXADOS and c[3][0] == 'txt':
+            indexadas.append((c[2][1], (c[3][1],)))
+        elif c[0] == 'in' and c[1][0] == 'campo' and c[1][1] in CAMPOS_INDEXADOS and all(isinstance(v, str) for v in c[2]):
+            indexadas.append((c[1][1], c[2]))
+        else:
+            resto.append(c)
+    return indexadas, resto
+
+class PlanConsulta:
+    def __init__(self, consulta):
+        filtro, self.orden, self.limite = _Parser(_tokenizar(consulta)).consulta()
+        self.indexadas, resto = _ruta_indexada(filtro)
+        self.filtro = None if not resto else _compilar(resto[0] if len(resto) == 1 else ('and', tuple(resto)))
+        self.campos = sorted(self._campos(filtro) | {campo[1] for campo, _ in self.orden if campo[0] == 'campo'})
+
+    def _campos(self, nodo):
+        if nodo is None:
+            return set()
+        if nodo[0] in ('and', 'or'):
+            return set().union(*(self._campos(h) for h in nodo[1]))
+        if nodo[0] == 'not':
+            return self._campos(nodo[1])
+        if nodo[0] == 'in':
+            return {nodo[1][1]} if nodo[1][0] == 'campo' else set()
+        return {o[1] for o in nodo[2:] if o[0] == 'campo'}
+
+    def filas(self, tabla):
+        """Posiciones de las filas que cumplen el filtro, ya ordenadas y limitadas."""
+        filas = None
+        for campo, valores in self.indexadas:
+            candidatas = np.unique(np.concatenate([tabla.posiciones(campo, v) for v in valores]))
+            filas = candidatas if filas is None else np.intersect1d(filas, candidatas, assume_unique=True)
+        if self.filtro is not None:
+            mascara = self.filtro(tabla, filas)
+            filas = np.flatnonzero(mascara) if filas is None else filas[mascara]
+        elif filas is None:
+            filas = np.arange(len(tabla))
+        if self.orden:
+            claves = []
+            for campo, descendente in reversed(self.orden):
+                valores = _compilar_operando(campo)(tabla, filas)
+                if valores.dtype == object:
+                    valores = np.unique(valores.astype(str), return_inverse=True)[1].astype(float)
+                claves.append(-valores if descendente else valores)
+            filas = filas[np.lexsort(claves)]
+        return filas[:self.limite] if self.limite is not None else filas
+
+@lru_cache(maxsize=256)
+def compilar(consulta):
+    """Plan compilado y cacheado por texto de consulta (los planes no dependen de los datos)."""
+    return PlanConsulta(consulta.strip())
+
+def columnas_resultado(plan, columnas_extra=('nota_final',)):
+    return [c for c in dict.fromkeys(['sector', 'pais', *plan.campos, *columnas_extra]) if c != 'ticker']
+
+def cribar(tabla, consulta, columnas_extra=('nota_final',)):
+    plan = compilar(consulta)
+    filas = plan.filas(tabla)
+    campos = columnas_resultado(plan, columnas_extra)
+    return pd.DataFrame({c: tabla.columna(c)[filas] for c in campos}, index=pd.Index(tabla.tickers[filas], name='ticker'))
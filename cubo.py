@@ -0,0 +1,284 @@
+import json
+import operator
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from divisas import normalizar_campos
+from puntuacion import PESOS, calcular_puntuaciones_vectorizado
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin coordinación entre procesos
+    fcntl = None
+
+# --- CUBO DE FUNDAMENTALES (tickers × periodos × campos) ---
+# Cada campo vive en su propio fichero binario float64 con forma
+# (periodos, capacidad_tickers), así que una sección transversal
+# (un campo, un periodo) es una fila contigua del memmap y solo se lee esa fila.
+# Un periodo nuevo se añade al final de cada fichero (append-only); los
+# huecos se rellenan con NaN, que equivale a "dato no disponible".
+# Varios procesos (réplicas de la app, trabajador.py poblar) escriben en el
+# mismo cubo: cada escritura toma un cerrojo de fichero y relee el índice antes
+# de tocar nada; los lectores lo releen cuando ven que ha cambiado en disco.
+
+RUTA_CUBO = os.environ.get('ANALIZADOR_CUBO', 'cubo_fundamentales')
+
+CAMPOS_DATOS = ['roe', 'roic', 'margen_operativo', 'margen_beneficio', 'ratio_corriente', 'per', 'per_adelantado', 'p_fcf', 'p_b',
+                'yield_dividendo', 'payout_ratio', 'payout_fcf_ratio', 'precio_objetivo', 'precio_actual', 'bpa', 'bpa_growth_yoy',
+                'deuda_ebitda', 'interest_coverage', 'net_buybacks_pct', 'market_cap', 'raw_fcf', 'beta']
+CAMPOS_HISTORICOS = ['bpa_cagr', 'cagr_fcf', 'per_hist', 'yield_hist', 'ath_10y']
+CAMPOS_CUBO = CAMPOS_DATOS + CAMPOS_HISTORICOS
+
+CAPACIDAD_INICIAL = 256
+
+OPERADORES = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le, '==': operator.eq, '!=': operator.ne}
+
+def periodo_actual(fecha=None):
+    fecha = fecha or datetime.now()
+    return f"{fecha.year}-T{(fecha.month - 1) // 3 + 1}"
+
+def _a_float(valor):
+    if valor is None or isinstance(valor, str):
+        return np.nan
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+class CuboFundamentales:
+    def __init__(self, ruta=RUTA_CUBO, campos=None):
+        self.ruta = ruta
+        self._memmaps = {}
+        self._lock = threading.Lock()
+        self._firma_indice = None
+        os.makedirs(ruta, exist_ok=True)
+        with self._cerrojo():
+            if os.path.exists(self._ruta_indice()):
+                self._recargar_indice()
+            else:
+                self._indice = {'version': 1, 'campos': list(campos or CAMPOS_CUBO), 'periodos': [], 'tickers': [],
+                                'sector': [], 'pais': [], 'capacidad': CAPACIDAD_INICIAL}
+                self._guardar_indice()
+                self._posicion_ticker, self._posicion_campo = {}, {c: i for i, c in enumerate(self._indice['campos'])}
+
+    # --- Índice ---
+    def _ruta_indice(self):
+        return os.path.join(self.ruta, 'indice.json')
+
+    @contextmanager
+    def _cerrojo(self):
+        """Exclusión entre procesos para escribir el cubo (los hilos se coordinan con self._lock)."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.ruta, 'indice.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _firma(self):
+        estado = os.stat(self._ruta_indice())
+        return estado.st_mtime_ns, estado.st_size, estado.st_ino
+
+    def _recargar_indice(self):
+        # Otro proceso puede haber añadido tickers, periodos o capacidad: los memmaps abiertos ya no sirven.
+        self._soltar_memmaps()
+        firma = self._firma()
+        with open(self._ruta_indice()) as f:
+            self._indice = json.load(f)
+        self._firma_indice = firma
+        self._posicion_ticker = {t: i for i, t in enumerate(self._indice['tickers'])}
+        self._posicion_campo = {c: i for i, c in enumerate(self._indice['campos'])}
+
+    def _sincronizar(self):
+        """Relee el índice si otro proceso lo ha reescrito desde la última lectura."""
+        try:
+            if self._firma() == self._firma_indice:
+                return
+        except OSError:
+            return
+        with self._lock:
+            self._recargar_indice()
+
+    def _ruta_campo(self, campo):
+        return os.path.join(self.ruta, f'{campo}.f8')
+
+    def _guardar_indice(self):
+        tmp = self._ruta_indice() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._indice, f)
+        os.replace(tmp, self._ruta_indice())
+        self._firma_indice = self._firma()
+
+    @property
+    def tickers(self):
+        self._sincronizar()
+        return list(self._indice['tickers'])
+
+    @property
+    def periodos(self):
+        self._sincronizar()
+        return list(self._indice['periodos'])
+
+    @property
+    def campos(self):
+        return list(self._indice['campos'])
+
+    @property
+    def sectores(self):
+        return np.array(self._indice['sector'], dtype=object)
+
+    @property
+    def paises(self):
+        return np.array(self._indice['pais'], dtype=object)
+
+    @property
+    def revision(self):
+        """Contador que sube con cada escritura (de este o de otro proceso): sirve de clave de caché."""
+        self._sincronizar()
+        return self._indice.get('revision', 0)
+
+    def __len__(self):
+        self._sincronizar()
+        return len(self._indice['tickers'])
+
+    # --- Acceso a los memmaps ---
+    def _memmap(self, campo, modo='r'):
+        clave = (campo, modo)
+        forma = (len(self._indice['periodos']), self._indice['capacidad'])
+        mm = self._memmaps.get(clave)
+        if mm is None or mm.shape != forma:
+            mm = np.memmap(self._ruta_campo(campo), dtype='<f8', mode=modo, shape=forma)
+            self._memmaps[clave] = mm
+        return mm
+
+    def _soltar_memmaps(self):
+        for mm in self._memmaps.values():
+            if mm.mode != 'r':
+                mm.flush()
+        self._memmaps = {}
+
+    def _indice_periodo(self, periodo):
+        """None es el último periodo; un entero, una posición (los negativos cuentan desde el final)."""
+        periodos = self._indice['periodos']
+        if not periodos:
+            raise KeyError("El cubo no tiene periodos.")
+        if periodo is None:
+            return len(periodos) - 1
+        if isinstance(periodo, (int, np.integer)):
+            if not -len(periodos) <= periodo < len(periodos):
+                raise KeyError(f"Periodo {periodo} fuera de rango: el cubo tiene {len(periodos)} periodos.")
+            return int(periodo) % len(periodos)
+        if periodo not in periodos:
+            raise KeyError(f"El cubo no tiene el periodo '{periodo}'.")
+        return periodos.index(periodo)
+
+    # --- Escritura (append-only) ---
+    def agregar_periodo(self, periodo):
+        periodos = self._indice['periodos']
+        if periodo in periodos:
+            return periodos.index(periodo)
+        if periodos and periodo < periodos[-1]:
+            raise ValueError(f"El periodo '{periodo}' es anterior al último ('{periodos[-1]}'); el cubo es append-only.")
+        self._soltar_memmaps()
+        fila_vacia = np.full(self._indice['capacidad'], np.nan, dtype='<f8').tobytes()
+        for campo in self._indice['campos']:
+            with open(self._ruta_campo(campo), 'ab') as f:
+                f.write(fila_vacia)
+        periodos.append(periodo)
+        self._guardar_indice()
+        return len(periodos) - 1
+
+    def _ampliar_capacidad(self, minima):
+        capacidad_vieja = self._indice['capacidad']
+        capacidad = capacidad_vieja
+        while capacidad < minima:
+            capacidad *= 2
+        if capacidad == capacidad_vieja:
+            return
+        self._soltar_memmaps()
+        n_periodos = len(self._indice['periodos'])
+        for campo in self._indice['campos']:
+            ruta = self._ruta_campo(campo)
+            nuevo = np.full((n_periodos, capacidad), np.nan, dtype='<f8')
+            if n_periodos:
+                viejo = np.memmap(ruta, dtype='<f8', mode='r', shape=(n_periodos, capacidad_vieja))
+                nuevo[:, :capacidad_vieja] = viejo
+                del viejo
+            tmp = ruta + '.tmp'
+            nuevo.tofile(tmp)
+            os.replace(tmp, ruta)
+        self._indice['capacidad'] = capacidad
+
+    def _registrar_ticker(self, ticker, sector, pais):
+        posicion = self._posicion_ticker.get(ticker)
+        if posicion is None:
+            self._ampliar_capacidad(len(self._indice['tickers']) + 1)
+            posicion = len(self._indice['tickers'])
+            self._indice['tickers'].append(ticker)
+            self._indice['sector'].append(sector or 'N/A')
+            self._indice['pais'].append(pais or 'N/A')
+            self._posicion_ticker[ticker] = posicion
+        else:
+            if sector: self._indice['sector'][posicion] = sector
+            if pais: self._indice['pais'][posicion] = pais
+        return posicion
+
+    def escribir(self, ticker, periodo, valores, sector=None, pais=None):
+        with self._lock, self._cerrojo():
+            self._recargar_indice()
+            indice_periodo = self.agregar_periodo(periodo)
+            posicion = self._registrar_ticker(ticker, sector, pais)
+            for campo, valor in valores.items():
+                if campo in self._posicion_campo:
+                    self._memmap(campo, 'r+')[indice_periodo, posicion] = _a_float(valor)
+            self._soltar_memmaps()
+            self._indice['revision'] = self._indice.get('revision', 0) + 1
+            self._guardar_indice()
+
+    def registrar_analisis(self, ticker, datos, hist_data, periodo=None):
+        valores = {campo: datos.get(campo) for campo in CAMPOS_DATOS}
+        valores.update({campo: (hist_data or {}).get(campo) for campo in CAMPOS_HISTORICOS})
+        # Los importes se guardan en MONEDA_REFERENCIA para que el universo sea comparable entre mercados.
+        valores = normalizar_campos(valores, datos.get('moneda'), datos.get('financial_currency'))
+        self.escribir(ticker, periodo or periodo_actual(), valores, sector=datos.get('sector'), pais=datos.get('pais'))
+
+    # --- Lectura ---
+    def seccion(self, campo, periodo=None):
+        """Vista de solo lectura (sin copia) de un campo para todos los tickers en un periodo."""
+        return self._memmap(campo)[self._indice_periodo(periodo), :len(self)]
+
+    def columnas(self, campos=None, periodo=None):
+        return {campo: self.seccion(campo, periodo) for campo in (campos or self._indice['campos'])}
+
+    def serie(self, ticker, campo):
+        valores = np.array(self._memmap(campo)[:, self._posicion_ticker[ticker]])
+        return pd.Series(valores, index=self._indice['periodos'], name=campo)
+
+    def mascara(self, condiciones, periodo=None, sector=None, pais=None):
+        mascara = np.ones(len(self), dtype=bool)
+        if sector is not None:
+            mascara &= self.sectores == sector
+        if pais is not None:
+            mascara &= self.paises == pais
+        for campo, op, valor in condiciones:
+            with np.errstate(invalid='ignore'):
+                mascara &= OPERADORES[op](self.seccion(campo, periodo), valor)
+        return mascara
+
+    def consultar(self, condiciones, periodo=None, sector=None, pais=None):
+        """Ej.: consultar([('roic', '>', 12), ('deuda_ebitda', '<', 2)], sector='Industrials')"""
+        mascara = self.mascara(condiciones, periodo, sector, pais)
+        return [t for t, ok in zip(self._indice['tickers'], mascara) if ok]
+
+    def puntuar(self, periodo=None, pesos=PESOS):
+        columnas = self.columnas([c for c in CAMPOS_CUBO if c in self._posicion_campo], periodo)
+        puntuaciones = calcular_puntuaciones_vectorizado(columnas, self.sectores, self.paises, pesos)
+        return pd.DataFrame(puntuaciones, index=pd.Index(self._indice['tickers'], name='ticker'))
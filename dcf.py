@@ -0,0 +1,156 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from divisas import factor_subunidad
+
+# --- VALOR INTRÍNSECO: DCF POR MONTE CARLO ---
+# Descuenta el flujo de caja libre (FCF) en dos etapas: ANOS_PROYECCION años
+# creciendo a g y después una perpetuidad creciendo a g_terminal, todo a la
+# tasa r. Con q = (1+g)/(1+r) el valor presente por trayectoria es cerrado:
+#     FCF · q · (1 − qⁿ) / (1 − q)  +  FCF · qⁿ · (1 + g_t) / (r − g_t)
+# así que cada trayectoria es aritmética de arrays, sin bucle por año.
+# g, r y g_terminal se muestrean por trayectoria; g parte de cagr_fcf/bpa_cagr y
+# su dispersión de la volatilidad del propio histórico de FCF.
+# El FCF (moneda de los estados) se pasa a la moneda de cotización con
+# tipo_cambio_financiero antes de repartirlo por acción.
+
+TRAYECTORIAS = 100_000
+ANOS_PROYECCION = 10
+DESCUENTO_MEDIO, DESCUENTO_DESV = 0.09, 0.015
+DESCUENTO_MINIMO = 0.05
+TERMINAL_MIN, TERMINAL_MAX = 0.015, 0.03
+DIFERENCIAL_MINIMO = 0.01  # r − g_terminal mínimo: evita perpetuidades explosivas
+CRECIMIENTO_MIN, CRECIMIENTO_MAX = -0.10, 0.25
+VOLATILIDAD_MIN, VOLATILIDAD_MAX = 0.03, 0.15
+PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+MAX_CELDAS_LOTE = 2_000_000  # tickers × trayectorias por bloque (≈16 MB por array)
+
+def _numero(valor):
+    if valor is None or isinstance(valor, str):
+        return None
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return valor if np.isfinite(valor) else None
+
+# --- Semillas ---
+def semillas_dcf(datos, hist_data):
+    """Parámetros de la simulación para un ticker, o None si el DCF no tiene sentido (FCF ≤ 0, sin precio...)."""
+    hist_data = hist_data or {}
+    fcf = _numero(datos.get('raw_fcf'))
+    financials = hist_data.get('financials_charts')
+    serie_fcf = pd.Series(dtype=float)
+    if financials is not None and not financials.empty and 'Free Cash Flow' in financials.columns:
+        serie_fcf = pd.to_numeric(financials['Free Cash Flow'], errors='coerce').dropna()
+    if fcf is None and not serie_fcf.empty:
+        fcf = float(serie_fcf.iloc[-1])
+    precio = _numero(datos.get('precio_actual'))
+    market_cap = _numero(datos.get('market_cap'))
+    tipo_cambio = _numero(datos.get('tipo_cambio_financiero', 1.0))
+    if not fcf or fcf <= 0 or not precio or not market_cap or not tipo_cambio:
+        return None
+    # El precio puede ir en subunidades (GBp) y la capitalización no: FCF a la moneda del precio.
+    factor = factor_subunidad(datos.get('moneda'))
+    fcf *= tipo_cambio * factor
+
+    tasas = [t / 100 for t in (_numero(hist_data.get('cagr_fcf')), _numero(hist_data.get('bpa_cagr'))) if t is not None]
+    crecimiento = float(np.clip(np.mean(tasas), CRECIMIENTO_MIN, CRECIMIENTO_MAX)) if tasas else 0.03
+
+    volatilidad = VOLATILIDAD_MIN
+    anteriores = serie_fcf.shift(1)
+    variaciones = ((serie_fcf - anteriores) / anteriores.abs()).where(anteriores > 0).dropna()
+    if len(variaciones) >= 2:
+        volatilidad = float(np.clip(variaciones.std(), VOLATILIDAD_MIN, VOLATILIDAD_MAX))
+    if len(tasas) == 2:
+        # Si FCF y BPA cuentan historias distintas, más incertidumbre.
+        volatilidad = max(volatilidad, min(VOLATILIDAD_MAX, abs(tasas[0] - tasas[1]) / 2))
+
+    return {'fcf': fcf, 'acciones': market_cap * factor / precio, 'precio': precio,
+            'crecimiento': crecimiento, 'volatilidad': volatilidad}
+
+# --- Simulación ---
+def valor_presente(fcf, g, r, g_terminal, anos=ANOS_PROYECCION):
+    """Valor presente de las dos etapas (forma cerrada de la suma geométrica). Admite broadcasting."""
+    q = (1 + g) / (1 + r)
+    q_n = q ** anos
+    casi_uno = np.abs(1 - q) < 1e-9
+    with np.errstate(divide='ignore', invalid='ignore'):
+        etapa_1 = np.where(casi_uno, anos, q * (1 - q_n) / np.where(casi_uno, 1, 1 - q))
+    terminal = q_n * (1 + g_terminal) / (r - g_terminal)
+    return fcf * (etapa_1 + terminal)
+
+def simular(semillas, n_trayectorias=TRAYECTORIAS, semilla=None):
+    """Matriz (tickers × trayectorias) de valor razonable por acción para una lista de semillas."""
+    rng = np.random.default_rng(semilla)
+    n = len(semillas)
+    columna = lambda campo: np.array([s[campo] for s in semillas], dtype=float)[:, None]
+    g = np.clip(columna('crecimiento') + columna('volatilidad') * rng.standard_normal((n, n_trayectorias)),
+                CRECIMIENTO_MIN, CRECIMIENTO_MAX)
+    g_terminal = rng.uniform(TERMINAL_MIN, TERMINAL_MAX, (n, n_trayectorias))
+    r = np.maximum(rng.normal(DESCUENTO_MEDIO, DESCUENTO_DESV, (n, n_trayectorias)),
+                   np.maximum(DESCUENTO_MINIMO, g_terminal + DIFERENCIAL_MINIMO))
+    return valor_presente(columna('fcf'), g, r, g_terminal) / columna('acciones')
+
+def resumen_distribucion(valores, precio):
+    """Percentiles del valor razonable y margen de seguridad (mismo criterio que el de analistas) en cada uno."""
+    cuantiles = np.percentile(valores, PERCENTILES)
+    return {
+        'precio': precio,
+        'valor_medio': float(valores.mean()),
+        'percentiles': dict(zip(PERCENTILES, cuantiles.tolist())),
+        'margen_seguridad': {p: (v - precio) / precio * 100 for p, v in zip(PERCENTILES, cuantiles.tolist())},
+        # Fracción de trayectorias que valoran la acción por encima del precio actual.
+        'prob_infravalorada': float((valores > precio).mean()),
+        # Percentil que ocupa el precio dentro de la distribución.
+        'percentil_precio': float((valores < precio).mean() * 100),
+    }
+
+def valorar(semillas, n_trayectorias=TRAYECTORIAS, semilla=None):
+    if semillas is None:
+        return None
+    return resumen_distribucion(simular([semillas], n_trayectorias, semilla)[0], semillas['precio'])
+
+def valorar_lista(semillas_por_ticker, n_trayectorias=TRAYECTORIAS, semilla=None):
+    """{ticker: semillas} → DataFrame con una fila por ticker. Simula en bloques de MAX_CELDAS_LOTE celdas."""
+    validos = [(t, s) for t, s in semillas_por_ticker.items() if s is not None]
+    filas = []
+    por_bloque = max(1, MAX_CELDAS_LOTE // n_trayectorias)
+    rng = np.random.default_rng(semilla)
+    for i in range(0, len(validos), por_bloque):
+        bloque = validos[i:i + por_bloque]
+        valores = simular([s for _, s in bloque], n_trayectorias, rng)
+        for (ticker, s), fila in zip(bloque, valores):
+            r = resumen_distribucion(fila, s['precio'])
+            filas.append({'Ticker': ticker, 'Precio': s['precio'],
+                          **{f'P{p}': v for p, v in r['percentiles'].items()},
+                          'Margen P50 (%)': r['margen_seguridad'][50],
+                          'Prob. Infravalorada (%)': r['prob_infravalorada'] * 100})
+    return pd.DataFrame(filas).set_index('Ticker') if filas else pd.DataFrame()
+
+# python dcf.py AAPL MSFT KO --trayectorias 200000
+if __name__ == '__main__':
+    from adquisicion import obtener_datos_completos_swr, obtener_historicos_swr
+
+    parser = argparse.ArgumentParser(description="DCF por Monte Carlo para una lista de tickers.")
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--trayectorias', type=int, default=TRAYECTORIAS)
+    parser.add_argument('--semilla', type=int, default=None)
+    args = parser.parse_args()
+
+    semillas = {}
+    for ticker in (t.strip().upper() for t in args.tickers):
+        datos, _ = obtener_datos_completos_swr(ticker)
+        hist_data, _ = obtener_historicos_swr(ticker)
+        semillas[ticker] = semillas_dcf(datos, hist_data) if datos else None
+        if semillas[ticker] is None:
+            print(f"{ticker}: sin FCF positivo o sin precio; se omite.")
+    inicio = time.perf_counter()
+    tabla = valorar_lista(semillas, args.trayectorias, args.semilla)
+    duracion = time.perf_counter() - inicio
+    if not tabla.empty:
+        print(tabla.round(2).to_string())
+    print(f"{len(tabla)} tickers × {args.trayectorias} trayectorias en {duracion * 1000:.0f} ms")
@@ -0,0 +1,101 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- DECIMACIÓN DE SERIES LARGAS ---
+# Un gráfico de 800 px no puede mostrar 15.000 cierres diarios: se reducen a un
+# presupuesto de puntos proporcional al ancho antes de dibujar, así el coste de
+# pintar no depende de la longitud del historial.
+#  - LTTB (Largest-Triangle-Three-Buckets): conserva la forma visual de la curva.
+#    La elección en cada cubeta depende de la anterior, así que hay un bucle por
+#    cubeta, pero dentro de cada una el cálculo de áreas es vectorizado.
+#  - Mín/máx: un mínimo y un máximo por columna de píxeles; totalmente vectorizado
+#    y el que mejor conserva picos y caídas extremas.
+
+PRESUPUESTO_PUNTOS = 1000
+
+def lttb(x, y, n_salida):
+    """Índices (ordenados) de los n_salida puntos elegidos por LTTB."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_salida >= n or n_salida < 3:
+        return np.arange(n)
+    # n_salida - 2 cubetas interiores; el primer y el último punto siempre se conservan.
+    bordes = np.linspace(1, n - 1, n_salida - 1).astype(int)
+    suma_x = np.concatenate(([0.0], np.cumsum(x)))
+    suma_y = np.concatenate(([0.0], np.cumsum(y)))
+    tamanos = bordes[1:] - bordes[:-1]
+    medias_x = (suma_x[bordes[1:]] - suma_x[bordes[:-1]]) / tamanos
+    medias_y = (suma_y[bordes[1:]] - suma_y[bordes[:-1]]) / tamanos
+    medias_x = np.append(medias_x[1:], x[-1])
+    medias_y = np.append(medias_y[1:], y[-1])
+
+    indices = np.empty(n_salida, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_salida - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # Doble del área del triángulo (punto elegido anterior, candidato, media de la cubeta siguiente).
+        areas = np.abs((x[a] - medias_x[i]) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (medias_y[i] - y[a]))
+        a = inicio + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+def minmax(y, n_columnas):
+    """Índices del mínimo y el máximo de cada una de n_columnas cubetas (hasta 2 × n_columnas puntos)."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if 2 * n_columnas >= n or n_columnas < 1:
+        return np.arange(n)
+    tamano = int(np.ceil(n / n_columnas))
+    filas = int(np.ceil(n / tamano))
+    matriz = np.full(filas * tamano, np.nan)
+    matriz[:n] = y
+    matriz = matriz.reshape(filas, tamano)
+    desplazamientos = np.arange(filas) * tamano
+    minimos = desplazamientos + np.nanargmin(matriz, axis=1)
+    maximos = desplazamientos + np.nanargmax(matriz, axis=1)
+    return np.unique(np.concatenate(([0, n - 1], minimos, maximos)))
+
+METODOS = {'lttb': lambda x, y, puntos: lttb(x, y, puntos), 'minmax': lambda x, y, puntos: minmax(y, max(1, puntos // 2))}
+
+def decimar(serie, puntos=PRESUPUESTO_PUNTOS, metodo='lttb'):
+    """Reduce una Series con índice temporal a ~puntos valores (los NaN se descartan)."""
+    serie = serie.dropna()
+    if len(serie) <= puntos:
+        return serie
+    x = serie.index.asi8.astype(float) if isinstance(serie.index, pd.DatetimeIndex) else np.arange(len(serie), dtype=float)
+    return serie.iloc[METODOS[metodo](x, serie.to_numpy(dtype=float), puntos)]
+
+def decimar_tabla(df, columna='Close', puntos=PRESUPUESTO_PUNTOS, metodo='lttb'):
+    """Filas de df elegidas decimando `columna` (el resto de columnas acompaña a esas fechas)."""
+    if df is None or len(df) <= puntos:
+        return df
+    return df.loc[decimar(df[columna], puntos, metodo).index]
+
+# --- COMPARATIVA ---
+# python decimacion.py --benchmark
+def comparar_tiempos(longitudes=(1_000, 5_000, 15_000, 100_000), puntos=PRESUPUESTO_PUNTOS, repeticiones=5):
+    rng = np.random.default_rng(0)
+    resultados = []
+    for n in longitudes:
+        serie = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), index=pd.date_range('1962-01-01', periods=n, freq='D'))
+        fila = {'puntos_entrada': n}
+        for metodo in METODOS:
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                salida = decimar(serie, puntos, metodo)
+            fila[f'{metodo}_ms'] = (time.perf_counter() - inicio) / repeticiones * 1000
+            fila[f'{metodo}_salida'] = len(salida)
+        resultados.append(fila)
+    return pd.DataFrame(resultados).set_index('puntos_entrada')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coste de la decimación según la longitud de la serie.")
+    parser.add_argument('--benchmark', action='store_true')
+    parser.add_argument('--puntos', type=int, default=PRESUPUESTO_PUNTOS)
+    args = parser.parse_args()
+    print(comparar_tiempos(puntos=args.puntos).round(2).to_string())
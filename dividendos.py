@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+# --- ANÁLISIS DE DIVIDENDOS ---
+# Los dividendos llegan en la columna 'Dividends' del historial de precios
+# cacheado (precios.py), así que no hay una descarga aparte: una sola petición
+# trae precios y dividendos y ambos comparten caché y caducidad.
+# El cierre del historial viene ajustado por dividendos (auto_adjust), que es
+# justo la serie de rentabilidad total. El cierre sin ajustar se reconstruye
+# deshaciendo el factor de Yahoo en cada fecha ex-dividendo; el yield TTM y la
+# rentabilidad solo-precio se calculan sobre ese cierre.
+
+VENTANAS_CAGR = [3, 5, 10]
+VENTANAS_RENTABILIDAD = [1, 3, 5, 10]
+UMBRAL_RECORTE = 0.10  # caída anual del dividendo por acción que cuenta como recorte
+
+def serie_dividendos(historial):
+    """Pagos por fecha ex-dividendo (solo los no nulos)."""
+    if historial is None or historial.empty or 'Dividends' not in historial.columns:
+        return pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+    pagos = historial['Dividends'].fillna(0.0)
+    return pagos[pagos > 0]
+
+def dividendos_anuales(pagos, fecha_corte=None):
+    """Dividendo por acción de cada año natural completo (el año en curso se descarta)."""
+    if pagos.empty:
+        return pd.Series(dtype=float)
+    anuales = pagos.groupby(pagos.index.year).sum()
+    ultimo_completo = (fecha_corte or pd.Timestamp.today()).year - 1
+    anuales = anuales[anuales.index <= ultimo_completo]
+    # Años intermedios sin pagos cuentan como dividendo cero (un recorte total).
+    return anuales.reindex(range(anuales.index.min(), anuales.index.max() + 1), fill_value=0.0) if not anuales.empty else anuales
+
+def cierre_sin_ajustar(historial):
+    """
+    Cierre sin el ajuste por dividendos. Yahoo multiplica los precios anteriores a
+    cada fecha ex por m = 1 − D / cierre_real(día previo); como el día previo ya
+    está ajustado por los dividendos posteriores (M), m = 1 / (1 + D·M / ajustado).
+    Se resuelve hacia atrás recorriendo solo las fechas ex; el resto es vectorizado.
+    """
+    ajustado = historial['Close'].astype(float)
+    pagos = historial['Dividends'].fillna(0.0).to_numpy() if 'Dividends' in historial.columns else np.zeros(len(historial))
+    factores = np.ones(len(ajustado))
+    acumulado = 1.0
+    valores = ajustado.to_numpy()
+    for i in np.flatnonzero(pagos > 0)[::-1]:
+        if i == 0 or not valores[i - 1] > 0:
+            continue
+        factores[i] = 1.0 / (1.0 + pagos[i] * acumulado / valores[i - 1])
+        acumulado *= factores[i]
+    # Cada día se divide por el producto de los factores de las fechas ex posteriores.
+    posteriores = np.append(np.cumprod(factores[::-1])[::-1][1:], 1.0)
+    return pd.Series(valores / posteriores, index=ajustado.index, name='Close')
+
+# --- Métricas ---
+def cagr_dividendos(anuales, ventanas=VENTANAS_CAGR):
+    """{ventana: CAGR (%) del dividendo por acción}, None si no hay años suficientes o el inicio es cero."""
+    resultado = {}
+    for anos in ventanas:
+        if len(anuales) <= anos or anuales.iloc[-1 - anos] <= 0 or anuales.iloc[-1] <= 0:
+            resultado[anos] = None
+        else:
+            resultado[anos] = float(((anuales.iloc[-1] / anuales.iloc[-1 - anos]) ** (1 / anos) - 1) * 100)
+    return resultado
+
+def racha_subidas(anuales):
+    """Años consecutivos (hasta el último completo) en que el dividendo anual ha subido."""
+    if len(anuales) < 2:
+        return 0
+    sube = (anuales.diff().iloc[1:] > 0).to_numpy()
+    sin_subida = np.flatnonzero(~sube)
+    return int(len(sube) - (sin_subida[-1] + 1)) if len(sin_subida) else int(len(sube))
+
+def detectar_recortes(anuales, umbral=UMBRAL_RECORTE):
+    """DataFrame con los años en que el dividendo anual cayó más de `umbral` respecto al anterior."""
+    variacion = anuales.pct_change()
+    recortes = variacion[(variacion < -umbral) & (anuales.shift(1) > 0)]
+    return pd.DataFrame({'Dividendo': anuales.loc[recortes.index], 'Variación (%)': recortes * 100})
+
+def yield_ttm(historial, cierre=None):
+    """Yield de los últimos 12 meses (%) para cada sesión, alineado con el historial de precios."""
+    if historial is None or historial.empty or 'Dividends' not in historial.columns:
+        return pd.Series(dtype=float)
+    cierre = cierre_sin_ajustar(historial) if cierre is None else cierre
+    pagados = historial['Dividends'].fillna(0.0).rolling('365D').sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (pagados / cierre * 100).where(cierre > 0)
+
+def comparar_rentabilidades(historial, cierre=None, ventanas=VENTANAS_RENTABILIDAD):
+    """Rentabilidad anualizada solo-precio frente a total (dividendos reinvertidos) en cada ventana."""
+    if historial is None or historial.empty:
+        return pd.DataFrame()
+    cierre = cierre_sin_ajustar(historial) if cierre is None else cierre
+    total = historial['Close'].to_numpy(dtype=float)
+    precio = cierre.to_numpy(dtype=float)
+    fechas = historial.index
+    final = fechas[-1]
+    inicios = pd.DatetimeIndex([final - pd.DateOffset(years=a) for a in ventanas])
+    posiciones = fechas.searchsorted(inicios)
+    # Solo ventanas que el historial cubre entero.
+    validas = inicios >= fechas[0]
+    anos = np.asarray(ventanas, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_precio = ((precio[-1] / precio[posiciones]) ** (1 / anos) - 1) * 100
+        r_total = ((total[-1] / total[posiciones]) ** (1 / anos) - 1) * 100
+    tabla = pd.DataFrame({'Precio (% anual)': r_precio, 'Total (% anual)': r_total,
+                          'Aportación Dividendos (pp)': r_total - r_precio},
+                         index=pd.Index([f'{a}A' for a in ventanas], name='Ventana'))
+    return tabla[validas]
+
+def analizar_dividendos(historial, fecha_corte=None):
+    """Todas las métricas a partir del historial de precios cacheado (una única descarga)."""
+    pagos = serie_dividendos(historial)
+    if pagos.empty:
+        return None
+    anuales = dividendos_anuales(pagos, fecha_corte)
+    cierre = cierre_sin_ajustar(historial)
+    return {
+        'pagos': pagos,
+        'anuales': anuales,
+        'cagr': cagr_dividendos(anuales),
+        'racha_subidas': racha_subidas(anuales),
+        'recortes': detectar_recortes(anuales),
+        'yield_ttm': yield_ttm(historial, cierre),
+        'rentabilidades': comparar_rentabilidades(historial, cierre),
+    }
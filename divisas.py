@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from precios import obtener_historial, precargar_historiales
+
+# --- CONVERSIÓN DE DIVISAS ---
+# Los tipos de cambio son historiales diarios más de la caché de precios
+# (pares de Yahoo 'EURUSD=X' = dólares por euro), así que se descargan en bloque
+# con precargar_historiales y caducan igual que cualquier precio. Todo se cotiza
+# contra el dólar: origen → destino = usd(origen) / usd(destino).
+# Las conversiones por fecha son uniones "as-of" hacia atrás (el último tipo
+# conocido en o antes de cada fecha) resueltas con searchsorted sobre el índice,
+# sin búsquedas fila a fila.
+#
+# Yahoo mezcla tres monedas en `info`: los estados financieros van en
+# financialCurrency, el precio en `currency` (a veces una subunidad, como los
+# peniques 'GBp' de Londres) y la capitalización en la unidad principal de esa
+# moneda.
+
+MONEDA_REFERENCIA = os.environ.get('ANALIZADOR_MONEDA', 'USD')
+# Subunidad: (moneda principal, subunidades por unidad).
+SUBUNIDADES = {'GBp': ('GBP', 100), 'GBX': ('GBP', 100), 'ILA': ('ILS', 100), 'ZAc': ('ZAR', 100)}
+
+# Campos de `datos`/`hist_data` según la moneda en que los da Yahoo.
+CAMPOS_EN_MONEDA_PRECIO = ['precio_actual', 'precio_objetivo', 'bpa', 'ath_10y']
+CAMPOS_EN_MONEDA_PRINCIPAL = ['market_cap']
+CAMPOS_EN_MONEDA_FINANCIERA = ['raw_fcf']
+
+def moneda_principal(moneda):
+    return SUBUNIDADES.get(moneda, (moneda, 1))[0]
+
+def factor_subunidad(moneda):
+    """Subunidades por unidad principal (100 para 'GBp', 1 para el resto)."""
+    return SUBUNIDADES.get(moneda, (moneda, 1))[1]
+
+def par_usd(moneda):
+    return f'{moneda_principal(moneda)}USD=X'
+
+def cargar_divisas(monedas):
+    """Deja en caché, en lotes, los tipos contra el dólar de todas las monedas dadas."""
+    pares = sorted({par_usd(m) for m in monedas if m and moneda_principal(m) != 'USD'})
+    return precargar_historiales(pares) if pares else {'lote': 0, 'individual': 0, 'fallidos': []}
+
+def serie_usd(moneda):
+    """Dólares por unidad de `moneda` (cierres diarios). None para el dólar; Series vacía si no hay datos."""
+    if moneda_principal(moneda) == 'USD':
+        return None
+    try:
+        historial = obtener_historial(par_usd(moneda))
+    except Exception:
+        return pd.Series(dtype=float)
+    return historial['Close'].dropna() if not historial.empty else pd.Series(dtype=float)
+
+def _usd_en_fechas(moneda, fechas):
+    serie = serie_usd(moneda)
+    if serie is None:
+        tipos = np.ones(len(fechas))
+    elif serie.empty:
+        tipos = np.full(len(fechas), np.nan)
+    else:
+        # As-of hacia atrás; antes del primer dato se usa el primero.
+        posiciones = np.clip(serie.index.searchsorted(fechas, side='right') - 1, 0, len(serie) - 1)
+        tipos = serie.to_numpy(dtype=float)[posiciones]
+    return tipos / factor_subunidad(moneda)
+
+def tipos_en_fechas(origen, destino, fechas):
+    """Unidades de `destino` por unidad de `origen` en cada fecha (array alineado con `fechas`)."""
+    fechas = pd.DatetimeIndex(fechas)
+    if origen == destino:
+        return np.ones(len(fechas))
+    return _usd_en_fechas(origen, fechas) / _usd_en_fechas(destino, fechas)
+
+def tipo_actual(origen, destino):
+    """Último tipo conocido, o None si falta alguna de las dos series."""
+    if not origen or not destino or origen == destino:
+        return 1.0
+    tipo = float(tipos_en_fechas(origen, destino, [pd.Timestamp.today().normalize()])[0])
+    return tipo if np.isfinite(tipo) else None
+
+# --- Conversión vectorizada ---
+def convertir_historial(historial, origen, destino, columnas=('Open', 'High', 'Low', 'Close', 'Dividends')):
+    """Historial de precios (fechas × campos): cada sesión a su tipo de ese día. El volumen no se toca."""
+    if historial is None or historial.empty or origen == destino:
+        return historial
+    tipos = tipos_en_fechas(origen, destino, historial.index)
+    convertido = historial.copy()
+    presentes = [c for c in columnas if c in convertido.columns]
+    convertido[presentes] = convertido[presentes].to_numpy(dtype=float) * tipos[:, None]
+    return convertido
+
+def normalizar_campos(valores, moneda_precio, moneda_financiera, destino=MONEDA_REFERENCIA, fecha=None):
+    """Copia de `valores` (dict de campos) con los importes monetarios expresados en `destino`."""
+    convertidos = dict(valores)
+    moneda_precio = moneda_precio or moneda_financiera or destino
+    moneda_financiera = moneda_financiera or moneda_precio
+    fecha = pd.Timestamp(fecha) if fecha is not None else pd.Timestamp.today().normalize()
+    grupos = [(CAMPOS_EN_MONEDA_PRECIO, moneda_precio), (CAMPOS_EN_MONEDA_PRINCIPAL, moneda_principal(moneda_precio)),
+              (CAMPOS_EN_MONEDA_FINANCIERA, moneda_financiera)]
+    for campos, moneda in grupos:
+        if moneda == destino:
+            continue
+        tipo = tipos_en_fechas(moneda, destino, [fecha])[0]
+        for campo in campos:
+            valor = convertidos.get(campo)
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                convertidos[campo] = float(valor * tipo)
+    return convertidos
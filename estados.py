@@ -0,0 +1,78 @@
+import pandas as pd
+import yfinance as yf
+
+from cache import CacheSWR
+
+# --- ESTADOS FINANCIEROS CON CADUCIDAD POR EVENTOS ---
+# Los estados (cuenta de resultados, balance, flujos de caja) solo cambian cuando
+# la empresa publica resultados, unas cuatro veces al año. En lugar de un TTL
+# fijo, cada copia es válida hasta la próxima fecha de resultados conocida más
+# un margen para que Yahoo la incorpore; pasada esa fecha se refresca.
+# Las fechas salen del calendario de resultados, que tiene su propia caché (es
+# una petición ligera). `info` y el precio conservan sus TTL cortos.
+
+MARGEN_PUBLICACION = 2 * 86400        # tras la fecha de resultados, tiempo hasta que los estados nuevos están en Yahoo
+REINTENTO_ESTADOS = 86400             # la fecha ya pasó al descargar: se reintenta cada día
+TTL_ESTADOS_SIN_CALENDARIO = 7 * 86400
+TTL_ESTADOS_MAX = 120 * 86400         # ni con una fecha lejana se pasa un trimestre largo sin revisar
+TTL_CALENDARIO = 86400
+ESTADOS = ['financials', 'balance_sheet', 'cashflow']
+
+def _fechas_resultados(calendario):
+    """Fechas de resultados del calendario de yfinance (dict en versiones recientes, DataFrame en las antiguas)."""
+    if isinstance(calendario, pd.DataFrame):
+        if 'Earnings Date' not in calendario.index:
+            return []
+        fechas = calendario.loc['Earnings Date'].tolist()
+    elif isinstance(calendario, dict):
+        fechas = calendario.get('Earnings Date') or []
+    else:
+        return []
+    fechas = fechas if isinstance(fechas, (list, tuple)) else [fechas]
+    return sorted({pd.Timestamp(f).tz_localize(None) if pd.Timestamp(f).tzinfo else pd.Timestamp(f) for f in fechas if pd.notna(f)})
+
+def descargar_calendario(ticker):
+    """{'resultados': [fechas]} o {} si Yahoo no conoce ninguna."""
+    fechas = _fechas_resultados(yf.Ticker(ticker).calendar)
+    return {'resultados': fechas} if fechas else {}
+
+CACHE_CALENDARIO = CacheSWR('calendario', ttl=TTL_CALENDARIO, ttl_vacio=TTL_CALENDARIO)
+
+def proximos_resultados(ticker, desde=None):
+    """Primera fecha de resultados conocida posterior a `desde` (ahora por defecto), o None."""
+    try:
+        calendario, _ = CACHE_CALENDARIO.obtener(ticker, descargar_calendario, ticker)
+    except Exception:
+        return None
+    desde = pd.Timestamp(desde).normalize() if desde is not None else pd.Timestamp.now().normalize()
+    futuras = [f for f in (calendario or {}).get('resultados', []) if f >= desde]
+    return futuras[0] if futuras else None
+
+def vigencia_estados(valor, creado):
+    """Segundos de validez de una copia de los estados según la fecha de resultados que tenía al descargarse."""
+    proxima = valor.get('proximos_resultados')
+    if proxima is None:
+        return TTL_ESTADOS_SIN_CALENDARIO
+    caduca = proxima.timestamp() + MARGEN_PUBLICACION
+    if caduca <= creado:
+        return REINTENTO_ESTADOS
+    return min(caduca - creado, TTL_ESTADOS_MAX)
+
+def descargar_estados(ticker):
+    stock = yf.Ticker(ticker)
+    estados = {nombre: getattr(stock, nombre) for nombre in ESTADOS}
+    estados = {nombre: e if isinstance(e, pd.DataFrame) else pd.DataFrame() for nombre, e in estados.items()}
+    if all(e.empty for e in estados.values()):
+        return {}
+    estados['proximos_resultados'] = proximos_resultados(ticker)
+    return estados
+
+# La obsolescencia máxima cubre toda la vigencia: unos estados caducados se
+# sirven al instante mientras se refrescan, como cualquier otro dataset.
+CACHE_ESTADOS = CacheSWR('estados', ttl=TTL_ESTADOS_SIN_CALENDARIO, vigencia=vigencia_estados,
+                         max_obsolescencia=TTL_ESTADOS_MAX + TTL_ESTADOS_SIN_CALENDARIO)
+
+def obtener_estados(ticker):
+    """(financials, balance_sheet, cashflow) desde la caché; DataFrames vacíos si no hay datos."""
+    estados, _ = CACHE_ESTADOS.obtener(ticker, descargar_estados, ticker)
+    return tuple((estados or {}).get(nombre, pd.DataFrame()) for nombre in ESTADOS)
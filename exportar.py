@@ -0,0 +1,247 @@
+import argparse
+import base64
+import html
+import os
+import re
+import sys
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from graficos import DORADO, FONDO, TEXTO, crear_grafico_historial_puntuaciones, crear_grafico_radar, crear_grafico_tecnico, crear_grafico_valoracion_historica, crear_graficos_financieros, figura_a_png
+from presentacion import ESTILOS_CSS, generar_resumen_ejecutivo, veredicto
+from puntuacion import SECTOR_BENCHMARKS, analizar_banderas_rojas, calcular_nota_final, calcular_puntuaciones_y_justificaciones
+
+# --- EXPORTACIÓN DE INFORMES EN LOTE (HTML / PDF) ---
+# Genera el informe completo de cada ticker de una lista como fichero
+# autónomo: nota y radar, identidad, resumen ejecutivo, banderas rojas,
+# evolución financiera, valoración histórica, evolución de la nota y técnico.
+# El proceso principal obtiene los datos (cachés SWR, como la app) y reparte el
+# renderizado entre un pool de procesos: matplotlib es CPU y no suelta el GIL,
+# así que con hilos no se ganaría nada. Los procesos se lanzan con 'spawn'
+# para no heredar los hilos de refresco de las cachés.
+# Cada HTML lleva la hoja de estilos una sola vez en la cabecera y los gráficos
+# como PNG en base64, sin ficheros externos. El PDF usa los mismos gráficos
+# vectoriales, una página por gráfico. Al final se escribe un índice.
+#   python exportar.py AAPL MSFT KO --salida informes --formato html pdf
+#   python exportar.py --lista cartera.txt --procesos 4
+
+CARPETA_INFORMES = 'informes'
+FORMATOS = ['html', 'pdf']
+TAMANO_A4 = (8.27, 11.69)
+LINEAS_POR_PAGINA = 58
+ANCHO_LINEA = 95
+
+ESTILOS_INFORME = """
+    body { background-color: #0E1117; color: #FAFAFA; font-family: 'Source Sans Pro', Helvetica, Arial, sans-serif; max-width: 1100px; margin: 2rem auto; padding: 0 1rem; }
+    section { border: 1px solid #D4AF37; border-radius: 10px; padding: 15px; margin-bottom: 1rem; }
+    h6 { color: #D4AF37; font-size: 1rem; margin: 1rem 0 0.5rem; }
+    img { max-width: 100%; }
+    .centrado { text-align: center; }
+    .bandera { background-color: #3b1219; border-radius: 8px; padding: 8px 12px; margin-bottom: 6px; }
+    .aviso { background-color: #3b2a12; border-radius: 8px; padding: 8px 12px; margin-bottom: 6px; }
+    .nota { color: #adb5bd; font-size: 0.85rem; }
+    table { border-collapse: collapse; width: 100%; }
+    td, th { border-bottom: 1px solid #333; padding: 6px 8px; text-align: left; vertical-align: top; }
+"""
+
+_SIMBOLOS_NO_PDF = re.compile('[\U00010000-\U0010FFFF\u2600-\u27BF\uFE0F]')
+
+def _markdown_basico(texto):
+    """Las banderas usan **negrita** de Markdown: se escapa el resto y se traduce la negrita."""
+    return re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', html.escape(texto))
+
+def _texto_plano(fragmento_html):
+    """HTML del resumen → líneas de texto para el PDF (sin etiquetas ni emojis, que las fuentes de matplotlib no tienen)."""
+    texto = re.sub(r'<h6>', '\n\n', fragmento_html)
+    texto = re.sub(r'</?(h6|p|ul|br)[^>]*>', '\n', texto)
+    texto = re.sub(r'<li>', '\n• ', texto)
+    texto = html.unescape(re.sub(r'<[^>]+>', '', texto))
+    texto = _SIMBOLOS_NO_PDF.sub('', texto).replace('**', '')
+    lineas = []
+    for parrafo in texto.split('\n'):
+        parrafo = ' '.join(parrafo.split())
+        if parrafo:
+            sangria = '  ' if parrafo.startswith('•') else ''
+            lineas += textwrap.wrap(parrafo, ANCHO_LINEA, initial_indent=sangria, subsequent_indent=sangria * 2)
+        elif lineas and lineas[-1]:
+            lineas.append('')
+    return lineas[:-1] if lineas and not lineas[-1] else lineas
+
+# --- Contenido (se calcula en cada proceso del pool) ---
+def componer_informe(ticker, datos, hist_data):
+    """Todo lo que va en el informe de un ticker: textos y, para los gráficos, funciones que crean cada figura."""
+    puntuaciones, justificaciones, benchmarks = calcular_puntuaciones_y_justificaciones(datos, hist_data)
+    sector_bench = benchmarks.get(datos['sector'], SECTOR_BENCHMARKS['Default'])
+    nota_final = calcular_nota_final(puntuaciones)
+    banderas, avisos = analizar_banderas_rojas(datos, hist_data.get('financials_charts'))
+    avisos += hist_data.get('avisos_divisas') or []
+    tech_data = hist_data.get('tech_data')
+    graficos = [
+        ("Resumen y Nota Global", lambda: crear_grafico_radar(puntuaciones, nota_final)),
+        ("Evolución Financiera", lambda: crear_graficos_financieros(hist_data.get('financials_charts'), hist_data.get('dividends_charts'))),
+        ("Análisis de Valoración Histórica", lambda: crear_grafico_valoracion_historica(hist_data.get('valuation_history'), datos.get('per'), datos.get('p_b'))),
+        ("Evolución Histórica de la Nota", lambda: crear_grafico_historial_puntuaciones(hist_data.get('score_history'))),
+        ("Análisis Técnico", lambda: crear_grafico_tecnico(tech_data) if tech_data is not None and not tech_data.empty else None),
+    ]
+    return {
+        'ticker': ticker, 'datos': datos, 'puntuaciones': puntuaciones, 'justificaciones': justificaciones,
+        'nota_final': nota_final, 'veredicto': veredicto(nota_final), 'banderas': banderas, 'avisos': avisos,
+        'resumen': generar_resumen_ejecutivo(datos, puntuaciones, hist_data, sector_bench), 'graficos': graficos,
+    }
+
+def _img_base64(png):
+    return f'<img src="data:image/png;base64,{base64.b64encode(png).decode("ascii")}">'
+
+def _documento_html(titulo, cuerpo):
+    return (f'<!DOCTYPE html>\n<html lang="es">\n<head>\n<meta charset="utf-8">\n<title>{html.escape(titulo)}</title>\n'
+            f'<style>{ESTILOS_CSS}{ESTILOS_INFORME}</style>\n</head>\n<body>\n{cuerpo}\n</body>\n</html>\n')
+
+def informe_html(informe, pngs, generado):
+    """Documento HTML autónomo. `pngs`: {título del gráfico: PNG}."""
+    datos, puntuaciones, justificaciones = informe['datos'], informe['puntuaciones'], informe['justificaciones']
+    partes = [
+        f"<h1>Análisis Fundamental: {html.escape(str(datos['nombre']))} ({informe['ticker']})</h1>",
+        f'<p class="nota">Generado el {generado:%d/%m/%Y %H:%M}.</p>',
+        f"<h3>🧭 Veredicto del Analizador: {informe['nota_final']:.1f} / 10</h3><p>{informe['veredicto']}</p>",
+        f'<section class="centrado"><h2>Resumen y Nota Global</h2>{_img_base64(pngs["Resumen y Nota Global"])}</section>',
+        '<section><h2>Identidad y Riesgo Geopolítico</h2>'
+        f"<p><strong>Sector:</strong> {html.escape(str(datos['sector']))} | <strong>Industria:</strong> {html.escape(str(datos['industria']))} | "
+        f"<strong>País:</strong> {html.escape(str(datos['pais']))}</p><p class=\"nota\">{html.escape(justificaciones['geopolitico'])}</p></section>",
+        f"<section><h2>Resumen Ejecutivo</h2>{informe['resumen']}</section>",
+    ]
+    filas = "".join(f"<tr><td>{nombre}</td><td>{puntuaciones[bloque]:.1f}</td><td>{html.escape(justificaciones[bloque])}</td></tr>"
+                    for bloque, nombre in (('calidad', 'Calidad del Negocio'), ('salud', 'Salud Financiera'),
+                                           ('valoracion', 'Valoración'), ('dividendos', 'Dividendos & Recompras')))
+    partes.append(f"<section><h2>Puntuación por Bloques</h2><table><tr><th>Bloque</th><th>Nota</th><th>Justificación</th></tr>{filas}</table></section>")
+    banderas = "".join(f'<div class="aviso">{_markdown_basico(a)}</div>' for a in informe['avisos'])
+    banderas += "".join(f'<div class="bandera">{_markdown_basico(b)}</div>' for b in informe['banderas']) \
+        or "<p>✅ No se han detectado banderas rojas significativas.</p>"
+    partes.append(f"<section><h2>Banderas de Alerta</h2>{banderas}</section>")
+    for titulo, _ in informe['graficos'][1:]:
+        if titulo in pngs:
+            partes.append(f"<section><h2>{titulo}</h2>{_img_base64(pngs[titulo])}</section>")
+    return _documento_html(f"{informe['ticker']} · Informe", "\n".join(partes))
+
+def _pagina_texto(pdf, lineas, titulo=None):
+    fig = Figure(figsize=TAMANO_A4, facecolor=FONDO)
+    y = 0.95
+    if titulo:
+        fig.text(0.06, y, titulo, color=DORADO, fontsize=15, weight='bold', va='top')
+        y -= 0.05
+    fig.text(0.06, y, "\n".join(lineas), color=TEXTO, fontsize=8.5, va='top', family='DejaVu Sans', linespacing=1.45)
+    pdf.savefig(fig, facecolor=FONDO)
+    fig.clear()
+
+def paginas_texto_pdf(informe, pdf, generado):
+    """Veredicto, resumen y banderas como páginas de texto; los gráficos van después, uno por página."""
+    datos = informe['datos']
+    lineas = [f"Generado el {generado:%d/%m/%Y %H:%M}.", "",
+              f"Veredicto del Analizador: {informe['nota_final']:.1f} / 10 · {informe['veredicto']}",
+              f"Sector: {datos['sector']} | Industria: {datos['industria']} | País: {datos['pais']}", ""]
+    lineas += _texto_plano(informe['resumen'])
+    lineas += ["", "Banderas de Alerta"]
+    lineas += _texto_plano("".join(f"<li>{t}" for t in informe['avisos'] + informe['banderas'])) or ["Sin banderas rojas significativas."]
+    for inicio in range(0, len(lineas), LINEAS_POR_PAGINA):
+        _pagina_texto(pdf, lineas[inicio:inicio + LINEAS_POR_PAGINA], f"{datos['nombre']} ({informe['ticker']})" if inicio == 0 else None)
+
+def renderizar_informe(ticker, datos, hist_data, carpeta, formatos):
+    """Trabajo de cada proceso del pool. Devuelve el resumen para el índice."""
+    generado = datetime.now()
+    informe = componer_informe(ticker, datos, hist_data)
+    rutas, pngs, pdf = [], {}, None
+    if 'pdf' in formatos:
+        rutas.append(os.path.join(carpeta, f'{ticker}.pdf'))
+        pdf = PdfPages(rutas[-1], metadata={'Title': f"{datos['nombre']} ({ticker})", 'Subject': 'Análisis fundamental'})
+    try:
+        if pdf is not None:
+            paginas_texto_pdf(informe, pdf, generado)
+        # Cada figura se crea una sola vez y sirve para las dos salidas.
+        for titulo, crear in informe['graficos']:
+            fig = crear()
+            if fig is None:
+                continue
+            if pdf is not None:
+                pdf.savefig(fig, facecolor=fig.get_facecolor())
+            if 'html' in formatos:
+                pngs[titulo] = figura_a_png(fig)
+            else:
+                fig.clear()
+    finally:
+        if pdf is not None:
+            pdf.close()
+    if 'html' in formatos:
+        rutas.insert(0, os.path.join(carpeta, f'{ticker}.html'))
+        with open(rutas[0], 'w', encoding='utf-8') as f:
+            f.write(informe_html(informe, pngs, generado))
+    return {'ticker': ticker, 'nombre': datos['nombre'], 'nota_final': informe['nota_final'],
+            'banderas': len(informe['banderas']), 'rutas': rutas}
+
+def escribir_indice(resultados, carpeta):
+    filas = []
+    for r in sorted(resultados, key=lambda r: (r.get('nota_final') is None, -(r.get('nota_final') or 0))):
+        if 'error' in r:
+            filas.append(f"<tr><td>{r['ticker']}</td><td colspan=\"4\" class=\"nota\">{html.escape(r['error'])}</td></tr>")
+            continue
+        enlaces = " · ".join(f'<a href="{os.path.basename(ruta)}">{os.path.splitext(ruta)[1][1:].upper()}</a>' for ruta in r['rutas'])
+        filas.append(f"<tr><td>{r['ticker']}</td><td>{html.escape(str(r['nombre']))}</td><td>{r['nota_final']:.1f}</td><td>{r['banderas']}</td><td>{enlaces}</td></tr>")
+    cuerpo = (f"<h1>Informes del {datetime.now():%d/%m/%Y}</h1><section><table>"
+              f"<tr><th>Ticker</th><th>Empresa</th><th>Nota</th><th>Banderas</th><th>Informe</th></tr>{''.join(filas)}</table></section>")
+    ruta = os.path.join(carpeta, 'index.html')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(_documento_html("Informes", cuerpo))
+    return ruta
+
+def exportar(tickers, carpeta=CARPETA_INFORMES, formatos=FORMATOS, procesos=None):
+    """Informes de todos los tickers. Los datos se piden aquí y cada ticker se renderiza en cuanto los tiene."""
+    # La importación va aquí: los procesos del pool solo renderizan y no necesitan las cachés.
+    from adquisicion import obtener_datos_completos_swr, obtener_historicos_swr
+
+    os.makedirs(carpeta, exist_ok=True)
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    resultados = []
+    with ProcessPoolExecutor(max_workers=procesos or os.cpu_count(), mp_context=get_context('spawn')) as pool:
+        pendientes = {}
+        for ticker in tickers:
+            try:
+                datos, _ = obtener_datos_completos_swr(ticker)
+                hist_data = obtener_historicos_swr(ticker)[0] if datos else None
+            except Exception as e:
+                resultados.append({'ticker': ticker, 'error': f"Error al obtener los datos: {e}"})
+                continue
+            if not datos:
+                resultados.append({'ticker': ticker, 'error': "Ticker no encontrado."})
+                continue
+            pendientes[pool.submit(renderizar_informe, ticker, datos, hist_data or {}, carpeta, formatos)] = ticker
+        for futuro in as_completed(pendientes):
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                resultados.append({'ticker': pendientes[futuro], 'error': f"Error al generar el informe: {e}"})
+    return resultados, escribir_indice(resultados, carpeta)
+
+if __name__ == '__main__':
+    from monitor import leer_lista
+
+    parser = argparse.ArgumentParser(description="Exporta el informe completo de varios tickers a HTML/PDF.")
+    parser.add_argument('tickers', nargs='*')
+    parser.add_argument('--lista', help="Fichero con un ticker por línea (# para comentarios).")
+    parser.add_argument('--salida', default=CARPETA_INFORMES)
+    parser.add_argument('--formato', nargs='+', choices=FORMATOS, default=FORMATOS)
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos de renderizado (por defecto, uno por CPU).")
+    args = parser.parse_args()
+
+    tickers = list(args.tickers) + (leer_lista(args.lista) if args.lista else [])
+    if not tickers:
+        parser.error("Indica tickers o --lista.")
+    inicio = time.perf_counter()
+    resultados, indice = exportar(tickers, args.salida, args.formato, args.procesos)
+    for r in resultados:
+        print(f"{r['ticker']}: {r['error']}" if 'error' in r else f"{r['ticker']}: {r['nota_final']:.1f} → {', '.join(r['rutas'])}",
+              file=sys.stderr if 'error' in r else sys.stdout)
+    print(f"{len(resultados)} tickers en {time.perf_counter() - inicio:.1f} s · índice en {indice}")
@@ -0,0 +1,160 @@
+import functools
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# --- PROVEEDOR OFFLINE DE DATOS (fixtures) ---
+# Sustituye yf.Ticker y yf.download por datos sintéticos deterministas: el mismo
+# ticker devuelve siempre la misma empresa (sector, país, estados, historial
+# con dividendos), así que la app, la API y las pruebas de carga funcionan sin
+# red y con resultados reproducibles. Los tickers que empiezan por
+# PREFIJO_INEXISTENTE se comportan como un símbolo que Yahoo no conoce.
+# Se activa con ANALIZADOR_FIXTURES=1 (adquisicion.py llama entonces a activar()); conviene usar
+# también un ANALIZADOR_DIR_CACHE propio para no mezclar estas copias con las reales.
+# ANALIZADOR_FIXTURES_LATENCIA añade una espera por petición (segundos) para
+# simular la latencia de Yahoo en las pruebas de carga.
+
+ACTIVADO = os.environ.get('ANALIZADOR_FIXTURES', '') not in ('', '0')
+LATENCIA = float(os.environ.get('ANALIZADOR_FIXTURES_LATENCIA', 0))
+PREFIJO_INEXISTENTE = 'ZZ'
+ANOS_HISTORIAL = 15
+
+EMPRESAS_TIPO = [
+    ('Technology', 'United States', 'Software'), ('Health Care', 'United States', 'Pharmaceuticals'),
+    ('Financial Services', 'United Kingdom', 'Banks'), ('Consumer Staples', 'Switzerland', 'Packaged Foods'),
+    ('Utilities', 'Spain', 'Electric Utilities'), ('Energy', 'Brazil', 'Oil & Gas'),
+    ('Industrials', 'Germany', 'Machinery'), ('Communication Services', 'China', 'Internet Content'),
+]
+
+def _rng(ticker, sal=''):
+    return np.random.default_rng(int(hashlib.sha1(f'{ticker}{sal}'.encode()).hexdigest()[:12], 16))
+
+def _esperar():
+    if LATENCIA > 0:
+        time.sleep(LATENCIA)
+
+def existe(ticker):
+    return not ticker.upper().startswith(PREFIJO_INEXISTENTE)
+
+def historial_fijo(ticker):
+    """OHLCV + dividendos diarios (ajustados, como auto_adjust) de los últimos ANOS_HISTORIAL años."""
+    return _historial_fijo(ticker, pd.Timestamp.today().normalize()).copy()
+
+@functools.lru_cache(maxsize=512)
+def _historial_fijo(ticker, hoy):
+    rng = _rng(ticker, 'historial')
+    fin = hoy - pd.offsets.BDay(1)
+    fechas = pd.bdate_range(fin - pd.DateOffset(years=ANOS_HISTORIAL), fin)
+    deriva, volatilidad = rng.uniform(0.0001, 0.0006), rng.uniform(0.008, 0.02)
+    cierre = rng.uniform(20, 200) * np.exp(np.cumsum(rng.normal(deriva, volatilidad, len(fechas))))
+    dividendos = np.zeros(len(fechas))
+    if rng.random() < 0.75:
+        trimestrales = np.arange(40, len(fechas), 63)
+        dividendos[trimestrales] = cierre[trimestrales] * rng.uniform(0.003, 0.01) * np.linspace(0.7, 1.0, len(trimestrales))
+    return pd.DataFrame({'Open': cierre * (1 + rng.normal(0, 0.003, len(fechas))), 'High': cierre * 1.01, 'Low': cierre * 0.99,
+                         'Close': cierre, 'Volume': rng.integers(1e5, 1e7, len(fechas)).astype(float),
+                         'Dividends': dividendos, 'Stock Splits': 0.0}, index=fechas)
+
+class TickerFijo:
+    """Lo que el resto del código usa de yf.Ticker: info, estados, calendario, fast_info e history."""
+    def __init__(self, ticker):
+        self.ticker = ticker.upper()
+        rng = _rng(self.ticker)
+        self._sector, self._pais, self._industria = EMPRESAS_TIPO[rng.integers(len(EMPRESAS_TIPO))]
+        self._ingresos = rng.uniform(1e9, 2e11)
+        self._margen = rng.uniform(0.05, 0.35)
+        self._crecimiento = rng.uniform(-0.03, 0.15)
+        self._acciones = rng.uniform(1e8, 5e9)
+        ultimo = pd.Timestamp.today().year - 1
+        self._cierres = pd.to_datetime([f'{a}-12-31' for a in range(ultimo - 3, ultimo + 1)])
+
+    def _anual(self, funcion):
+        return pd.DataFrame({fecha: funcion(i, self._ingresos * (1 + self._crecimiento) ** (i - 3)) for i, fecha in enumerate(self._cierres)})
+
+    @property
+    def info(self):
+        _esperar()
+        if not existe(self.ticker):
+            return {}
+        rng = _rng(self.ticker, 'info')
+        precio = float(historial_fijo(self.ticker)['Close'].iloc[-1])
+        beneficio = self._ingresos * self._margen * 0.7
+        bpa = beneficio / self._acciones
+        dividendo = bpa * rng.uniform(0, 0.7)
+        return {
+            'longName': f'{self.ticker} Fixture Corp', 'sector': self._sector, 'country': self._pais, 'industry': self._industria,
+            'exchange': 'FIX', 'currency': 'USD', 'financialCurrency': 'USD',
+            'returnOnEquity': rng.uniform(0.05, 0.35), 'operatingMargins': self._margen, 'profitMargins': self._margen * 0.7,
+            'currentRatio': rng.uniform(0.7, 2.5), 'trailingPE': precio / bpa if bpa > 0 else None,
+            'forwardPE': precio / (bpa * (1 + self._crecimiento)) if bpa > 0 else None, 'priceToBook': rng.uniform(0.8, 10),
+            'payoutRatio': dividendo / bpa if bpa > 0 else 0, 'dividendRate': dividendo, 'currentPrice': precio,
+            'targetMeanPrice': precio * rng.uniform(0.8, 1.4), 'trailingEps': bpa, 'earningsGrowth': self._crecimiento,
+            'beta': rng.uniform(0.5, 1.6), 'freeCashflow': beneficio * rng.uniform(0.6, 1.2), 'marketCap': precio * self._acciones,
+            'ebitda': self._ingresos * self._margen * 1.2, 'totalDebt': self._ingresos * rng.uniform(0.1, 0.8),
+            'totalCash': self._ingresos * rng.uniform(0.05, 0.3), 'recommendationKey': 'hold',
+            'longBusinessSummary': f'{self.ticker} es una empresa sintética. Sirve para pruebas sin conexión. No existe.',
+        }
+
+    @property
+    def financials(self):
+        _esperar()
+        if not existe(self.ticker):
+            return pd.DataFrame()
+        return self._anual(lambda i, ingresos: {
+            'Total Revenue': ingresos, 'Operating Income': ingresos * self._margen, 'EBIT': ingresos * self._margen,
+            'EBITDA': ingresos * self._margen * 1.2, 'Interest Expense': ingresos * 0.01, 'Pretax Income': ingresos * self._margen * 0.95,
+            'Tax Provision': ingresos * self._margen * 0.2, 'Net Income': ingresos * self._margen * 0.7,
+            'Basic Average Shares': self._acciones * (1.01 - 0.01 * i)})
+
+    @property
+    def balance_sheet(self):
+        _esperar()
+        if not existe(self.ticker):
+            return pd.DataFrame()
+        return self._anual(lambda i, ingresos: {
+            'Total Stockholder Equity': ingresos * 0.6, 'Total Debt': ingresos * 0.4, 'Cash And Cash Equivalents': ingresos * 0.1,
+            'Total Assets': ingresos * 1.5, 'Current Assets': ingresos * 0.5, 'Current Liabilities': ingresos * 0.35})
+
+    @property
+    def cashflow(self):
+        _esperar()
+        if not existe(self.ticker):
+            return pd.DataFrame()
+        return self._anual(lambda i, ingresos: {
+            'Free Cash Flow': ingresos * self._margen * 0.6, 'Cash Dividends Paid': -ingresos * self._margen * 0.2,
+            'Depreciation And Amortization': ingresos * 0.04, 'Net Income From Continuing Operations': ingresos * self._margen * 0.7})
+
+    @property
+    def calendar(self):
+        _esperar()
+        proximo = pd.Timestamp.today().normalize() + pd.Timedelta(days=int(_rng(self.ticker, 'calendario').integers(5, 90)))
+        return {'Earnings Date': [proximo.date()]} if existe(self.ticker) else {}
+
+    @property
+    def fast_info(self):
+        _esperar()
+        return {'lastPrice': float(historial_fijo(self.ticker)['Close'].iloc[-1]) if existe(self.ticker) else None}
+
+    @property
+    def dividends(self):
+        historial = self.history()
+        return historial['Dividends'][historial['Dividends'] > 0] if not historial.empty else pd.Series(dtype=float)
+
+    def history(self, period='max', **kwargs):
+        _esperar()
+        return historial_fijo(self.ticker) if existe(self.ticker) else pd.DataFrame()
+
+def descargar_fijo(tickers, **kwargs):
+    """Equivalente a yf.download(..., group_by='ticker'): columnas (ticker, campo)."""
+    _esperar()
+    tickers = tickers.split() if isinstance(tickers, str) else list(tickers)
+    historiales = {t: historial_fijo(t) for t in tickers if existe(t)}
+    return pd.concat(historiales, axis=1) if historiales else pd.DataFrame()
+
+def activar():
+    yf.Ticker = TickerFijo
+    yf.download = descargar_fijo
@@ -0,0 +1,291 @@
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from puntuacion import UMBRALES_VEREDICTO
+
+# --- GRÁFICOS SIN ESTADO GLOBAL (API orientada a objetos de matplotlib) ---
+# Nada de pyplot: cada gráfico es una Figure propia con su lienzo Agg, sin
+# registro global de figuras ni plt.style.use (que cambiaba rcParams para todas
+# las sesiones). Los colores del tema oscuro se ponen explícitamente en cada
+# elemento, así que se pueden generar gráficos desde varios hilos a la vez.
+# figura_a_png() rasteriza y libera la figura en el acto.
+
+FONDO = '#0E1117'
+TEXTO = 'white'
+DORADO = '#D4AF37'
+REJILLA = dict(color='gray', linestyle='--', linewidth=0.5)
+
+def _nueva_figura(figsize):
+    fig = Figure(figsize=figsize, facecolor=FONDO)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _estilo_oscuro(ax):
+    ax.set_facecolor(FONDO)
+    ax.tick_params(colors=TEXTO, which='both')
+    for spine in ax.spines.values():
+        spine.set_color(TEXTO)
+    ax.yaxis.label.set_color(TEXTO)
+    ax.xaxis.label.set_color(TEXTO)
+    ax.title.set_color(TEXTO)
+
+def _leyenda(ax, **kwargs):
+    ax.legend(facecolor=FONDO, edgecolor='gray', labelcolor=TEXTO, **kwargs)
+
+def figura_a_png(fig, dpi=100):
+    """Rasteriza la figura a PNG y la libera (no queda referencia viva en ningún registro)."""
+    if fig is None:
+        return None
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format='png', dpi=dpi, facecolor=fig.get_facecolor())
+    finally:
+        fig.clear()
+    return buffer.getvalue()
+
+def crear_grafico_radar(puntuaciones, score):
+    labels = ['Calidad', 'Valoración', 'Salud Fin.', 'Dividendos']
+    stats = [
+        puntuaciones.get('calidad', 0),
+        puntuaciones.get('valoracion', 0),
+        puntuaciones.get('salud', 0),
+        puntuaciones.get('dividendos', 0)
+    ]
+
+    angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
+    stats = np.concatenate((stats, [stats[0]]))
+    angles = np.concatenate((angles, [angles[0]]))
+
+    fig = _nueva_figura((3.5, 3.5))
+    ax = fig.add_subplot(polar=True)
+    ax.set_facecolor(FONDO)
+
+    ax.plot(angles, stats, color=DORADO, linewidth=2)
+    ax.fill(angles, stats, color=DORADO, alpha=0.25)
+
+    ax.set_yticklabels([])
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels(labels, color=TEXTO, size=10)
+    ax.set_ylim(0, 10)
+
+    ax.spines['polar'].set_color(TEXTO)
+    ax.grid(**REJILLA)
+
+    ax.text(0, 0, f'{score:.1f}', ha='center', va='center', fontsize=36, color=TEXTO, weight='bold')
+    ax.text(0, 0, '\n\n\nNota Global', ha='center', va='center', fontsize=12, color='gray')
+
+    return fig
+
+def crear_grafico_tecnico(data):
+    fig = _nueva_figura((8, 5))
+    ax1, ax2 = fig.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1]}, sharex=True)
+
+    _estilo_oscuro(ax1)
+    ax1.plot(data.index, data['Close'], label='Precio', color='#87CEEB', linewidth=2)
+    if 'SMA50' in data.columns and not data['SMA50'].isnull().all():
+        ax1.plot(data.index, data['SMA50'], label='Media Móvil 50 días', color='#FFA500', linestyle='--')
+    if 'SMA200' in data.columns and not data['SMA200'].isnull().all():
+        ax1.plot(data.index, data['SMA200'], label='Media Móvil 200 días', color='#FF0000', linestyle='--')
+    ax1.set_title('Análisis Técnico del Precio (Último Año)', color=TEXTO)
+    _leyenda(ax1)
+    ax1.grid(**REJILLA)
+
+    _estilo_oscuro(ax2)
+    if 'RSI' in data.columns and not data['RSI'].isnull().all():
+        ax2.plot(data.index, data['RSI'], label='RSI', color='#DA70D6')
+        ax2.axhline(70, color='red', linestyle='--', linewidth=1)
+        ax2.axhline(30, color='green', linestyle='--', linewidth=1)
+    ax2.set_ylim(0, 100)
+    ax2.set_ylabel('RSI', color=TEXTO)
+    ax2.grid(**REJILLA)
+
+    fig.tight_layout()
+    return fig
+
+def crear_grafico_precio_largo(serie, titulo, etiqueta='Precio'):
+    fig = _nueva_figura((8, 3.5))
+    ax = fig.subplots()
+    _estilo_oscuro(ax)
+    ax.plot(serie.index, serie.to_numpy(), color='#87CEEB', linewidth=1.2)
+    ax.set_title(titulo, color=TEXTO)
+    ax.set_ylabel(etiqueta, color=TEXTO)
+    ax.grid(**REJILLA)
+    fig.tight_layout()
+    return fig
+
+def crear_graficos_financieros(financials, dividends):
+    try:
+        if financials is None or financials.empty: return None
+        años = [d.year for d in financials.index]
+        fig = _nueva_figura((8, 5))
+        axs = fig.subplots(2, 2)
+
+        for ax in axs.flat:
+            _estilo_oscuro(ax)
+            ax.tick_params(bottom=False, left=False)
+            ax.set_xticks(años)
+            ax.set_xticklabels(años)
+
+        axs[0, 0].bar(años, financials['Total Revenue'] / 1e9, label='Ingresos', color='#87CEEB')
+        axs[0, 0].bar(años, financials['Net Income'] / 1e9, label='Beneficio Neto', color=DORADO, width=0.5)
+        axs[0, 0].set_title('1. Crecimiento (Billones)'); _leyenda(axs[0, 0])
+
+        ax2 = axs[0, 1]
+        ax2_twin = ax2.twinx()
+        _estilo_oscuro(ax2_twin)
+        line1, = ax2.plot(años, financials['ROE'] * 100, color='purple', marker='o', label='ROE (%)')
+        line2, = ax2_twin.plot(años, financials['Operating Margin'] * 100, color=DORADO, marker='s', label='Margen Op. (%)')
+        ax2.set_title('2. Rentabilidad')
+        _leyenda(ax2, handles=[line1, line2])
+
+        axs[1, 0].bar(años, financials['Net Income'] / 1e9, label='Beneficio Neto (B)', color='royalblue')
+        axs[1, 0].plot(años, financials['Free Cash Flow'] / 1e9, label='FCF (B)', color='green', marker='o', linestyle='--')
+        axs[1, 0].set_title('3. Beneficio vs. Caja Real'); _leyenda(axs[1, 0])
+
+        if dividends is not None and not dividends.empty:
+            axs[1, 1].bar(dividends.index.year, dividends, label='Dividendo/Acción', color='orange')
+        axs[1, 1].set_title('4. Retorno al Accionista')
+
+        fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+        return fig
+    except Exception:
+        return None
+
+def _linea_historica(ax, serie, color, nombre, actual):
+    ax.plot(serie.index, serie, marker='o', linestyle='-', color=color, label=f'{nombre} Histórico')
+
+    media = serie.mean()
+    desviacion = serie.std()
+
+    if actual: ax.axhline(actual, color=DORADO, linestyle='--', label=f'{nombre} Actual ({actual:.2f})')
+    ax.axhline(media, color=TEXTO, linestyle=':', label=f'Media ({media:.2f})')
+    ax.axhline(media + desviacion, color='red', linestyle=':', alpha=0.5, label='+1 Desv. Est.')
+    ax.axhline(media - desviacion, color='green', linestyle=':', alpha=0.5, label='-1 Desv. Est.')
+
+    ax.set_ylabel(f'Ratio {nombre}')
+    ax.set_title(f'Evolución Histórica del {nombre} Ratio', color=TEXTO)
+    _leyenda(ax)
+    ax.grid(**REJILLA)
+
+def crear_grafico_valoracion_historica(valuation_df, current_per, current_pb):
+    if valuation_df is None or valuation_df.empty:
+        return None
+
+    pe_data = valuation_df['P/E'].dropna() if 'P/E' in valuation_df.columns else pd.Series(dtype=float)
+    pb_data = valuation_df['P/B'].dropna() if 'P/B' in valuation_df.columns else pd.Series(dtype=float)
+
+    series = []
+    if not pe_data.empty:
+        series.append((pe_data, '#87CEEB', 'P/E', current_per))
+    if not pb_data.empty:
+        series.append((pb_data, '#90EE90', 'P/B', current_pb))
+
+    if not series:
+        return None
+
+    fig = _nueva_figura((8, 3 * len(series)))
+    axs = fig.subplots(len(series), 1, sharex=True, squeeze=False)
+    for (serie, color, nombre, actual), ax in zip(series, axs[:, 0]):
+        _estilo_oscuro(ax)
+        _linea_historica(ax, serie, color, nombre, actual)
+
+    fig.tight_layout()
+    return fig
+
+SERIES_PUNTUACION = [('calidad', 'Calidad', '#87CEEB'), ('valoracion', 'Valoración', '#90EE90'),
+                     ('salud', 'Salud Fin.', '#FFA07A'), ('dividendos', 'Dividendos', '#DDA0DD')]
+
+def crear_grafico_historial_puntuaciones(score_df):
+    if score_df is None or score_df.empty:
+        return None
+
+    fig = _nueva_figura((8, 4))
+    ax = fig.subplots()
+    _estilo_oscuro(ax)
+    anos = [str(a) for a in score_df.index]
+    for columna, nombre, color in SERIES_PUNTUACION:
+        if columna in score_df.columns:
+            ax.plot(anos, score_df[columna], marker='o', linewidth=1, alpha=0.8, color=color, label=nombre)
+    ax.plot(anos, score_df['nota_final'], marker='o', linewidth=2.5, color=DORADO, label='Nota Global')
+    # Los mismos tramos que el veredicto de la app.
+    ax.axhline(max(UMBRALES_VEREDICTO), color='green', linestyle=':', alpha=0.5)
+    ax.axhline(min(UMBRALES_VEREDICTO), color='red', linestyle=':', alpha=0.5)
+
+    ax.set_ylim(0, 10.5)
+    ax.set_ylabel('Nota (0-10)')
+    ax.set_title('Evolución de la Nota por Ejercicio Fiscal', color=TEXTO)
+    _leyenda(ax, loc='lower left', ncol=5, fontsize='small')
+    ax.grid(**REJILLA)
+    fig.tight_layout()
+    return fig
+
+# --- PRUEBA DE MEMORIA ---
+# python graficos.py --memoria 1000
+# Renderiza los cuatro gráficos N veces con datos sintéticos y muestra el RSS;
+# debe estabilizarse tras las primeras iteraciones (cachés de fuentes, etc.).
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        pass
+    # Sin /proc solo hay el pico (ru_maxrss: KB en Linux, bytes en macOS); en Windows no hay módulo resource.
+    try:
+        import resource
+    except ImportError:
+        return np.nan
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == 'darwin' else pico / 2**10
+
+def datos_sinteticos(semilla=0):
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range('2024-01-01', periods=252, freq='B')
+    cierre = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(fechas))))
+    tecnico = pd.DataFrame({'Close': cierre}, index=fechas)
+    tecnico['SMA50'] = tecnico['Close'].rolling(50).mean()
+    tecnico['SMA200'] = tecnico['Close'].rolling(200).mean()
+    tecnico['RSI'] = rng.uniform(20, 80, len(fechas))
+    anos = pd.to_datetime([f'{a}-12-31' for a in range(2021, 2025)])
+    financials = pd.DataFrame({'Total Revenue': rng.uniform(5e10, 9e10, 4), 'Net Income': rng.uniform(5e9, 1e10, 4),
+                               'ROE': rng.uniform(0.1, 0.3, 4), 'Operating Margin': rng.uniform(0.1, 0.3, 4),
+                               'Free Cash Flow': rng.uniform(4e9, 9e9, 4)}, index=anos)
+    dividendos = pd.Series(rng.uniform(1, 2, 5), index=pd.to_datetime([f'{a}-12-31' for a in range(2020, 2025)]))
+    valoracion = pd.DataFrame({'P/E': rng.uniform(10, 30, 8), 'P/B': rng.uniform(1, 6, 8)}, index=range(2017, 2025))
+    puntuaciones = {'calidad': 7, 'valoracion': 5, 'salud': 8, 'dividendos': 6}
+    return tecnico, financials, dividendos, valoracion, puntuaciones
+
+def renderizar_todos(tecnico, financials, dividendos, valoracion, puntuaciones):
+    return [figura_a_png(crear_grafico_radar(puntuaciones, 6.5)),
+            figura_a_png(crear_grafico_tecnico(tecnico)),
+            figura_a_png(crear_graficos_financieros(financials, dividendos)),
+            figura_a_png(crear_grafico_valoracion_historica(valoracion, 18.0, 3.0))]
+
+def prueba_memoria(iteraciones, calentamiento=20):
+    datos = datos_sinteticos()
+    for _ in range(calentamiento):
+        renderizar_todos(*datos)
+    base = _rss_mb()
+    print(f"RSS tras calentamiento: {base:.1f} MB")
+    paso = max(1, iteraciones // 10)
+    for i in range(1, iteraciones + 1):
+        renderizar_todos(*datos)
+        if i % paso == 0:
+            print(f"{i:>6} renders × 4 gráficos: RSS {_rss_mb():.1f} MB ({_rss_mb() - base:+.1f})")
+    return _rss_mb() - base
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prueba de memoria del renderizado de gráficos.")
+    parser.add_argument('--memoria', type=int, default=1000, help="Número de iteraciones.")
+    parser.add_argument('--tolerancia', type=float, default=25.0, help="Crecimiento máximo aceptable del RSS (MB).")
+    args = parser.parse_args()
+    crecimiento = prueba_memoria(args.memoria)
+    print("OK: RSS estable." if crecimiento <= args.tolerancia else f"FALLO: el RSS ha crecido {crecimiento:.1f} MB.")
+    sys.exit(0 if crecimiento <= args.tolerancia else 1)
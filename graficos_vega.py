@@ -0,0 +1,270 @@
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from decimacion import decimar_tabla
+from puntuacion import UMBRALES_VEREDICTO
+
+# --- GRÁFICOS INTERACTIVOS (especificaciones Vega-Lite) ---
+# Alternativa a graficos.py: en vez de rasterizar en el servidor se genera una
+# especificación JSON declarativa y es el navegador quien dibuja (con zoom y
+# tooltips). Al servidor solo le cuesta construir un dict. Las series largas se
+# reducen antes a MAX_PUNTOS (LTTB) para no mandar miles de filas por sesión.
+
+FONDO = '#0E1117'
+DORADO = '#D4AF37'
+MAX_PUNTOS = 600
+
+CONFIG_OSCURO = {
+    'background': FONDO,
+    'view': {'stroke': None},
+    'axis': {'labelColor': 'white', 'titleColor': 'white', 'gridColor': 'gray', 'gridDash': [3, 3],
+             'gridOpacity': 0.5, 'domainColor': 'white', 'tickColor': 'white'},
+    'legend': {'labelColor': 'white', 'titleColor': 'white', 'orient': 'bottom'},
+    'title': {'color': 'white', 'anchor': 'start'},
+    'text': {'color': 'white'},
+}
+
+def _especificacion(cuerpo, titulo=None):
+    spec = {'$schema': 'https://vega.github.io/schema/vega-lite/v5.json', 'config': CONFIG_OSCURO}
+    if titulo:
+        spec['title'] = titulo
+    spec.update(cuerpo)
+    return spec
+
+def _valor(v):
+    if v is None:
+        return None
+    if isinstance(v, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(v).strftime('%Y-%m-%d')
+    if isinstance(v, (int, np.integer)):
+        return int(v)
+    v = float(v)
+    return None if math.isnan(v) or math.isinf(v) else v
+
+def _registros(df, columnas):
+    """DataFrame → lista de dicts serializable (fechas ISO, NaN → null)."""
+    indice = [_valor(i) for i in df.index]
+    valores = {c: [_valor(v) for v in df[c].to_numpy()] for c in columnas if c in df.columns}
+    return [{'fecha': indice[i], **{c: valores[c][i] for c in valores}} for i in range(len(indice))]
+
+def reducir(df, max_puntos=MAX_PUNTOS):
+    """Reduce un DataFrame temporal a ~max_puntos filas, eligiéndolas por LTTB sobre el cierre."""
+    if df is None or len(df) <= max_puntos:
+        return df
+    return decimar_tabla(df, 'Close' if 'Close' in df.columns else df.columns[0], max_puntos)
+
+# --- Gráficos ---
+def spec_radar(puntuaciones, score):
+    ejes = ['Calidad', 'Valoración', 'Salud Fin.', 'Dividendos']
+    claves = ['calidad', 'valoracion', 'salud', 'dividendos']
+    # Gráfico polar de sectores iguales (un cuarto por bloque) cuyo radio es la nota.
+    valores = [{'eje': eje, 'nota': _valor(puntuaciones.get(clave, 0)), 'orden': i, 'peso': 1} for i, (eje, clave) in enumerate(zip(ejes, claves))]
+    base = {
+        'theta': {'field': 'peso', 'type': 'quantitative', 'stack': True},
+        'order': {'field': 'orden', 'type': 'ordinal'},
+        'radius': {'field': 'nota', 'type': 'quantitative', 'scale': {'type': 'linear', 'domain': [0, 10], 'zero': True, 'rangeMin': 25}},
+    }
+    return _especificacion({
+        'data': {'values': valores},
+        'width': 300, 'height': 300,
+        'layer': [
+            {'mark': {'type': 'arc', 'stroke': FONDO, 'strokeWidth': 2, 'opacity': 0.85},
+             'encoding': {**base, 'color': {'value': DORADO},
+                          'tooltip': [{'field': 'eje', 'title': 'Bloque'}, {'field': 'nota', 'title': 'Nota', 'format': '.1f'}]}},
+            {'mark': {'type': 'text', 'radiusOffset': 18, 'fontSize': 11},
+             'encoding': {**base, 'text': {'field': 'eje'}}},
+        ],
+    }, titulo={'text': f'{score:.1f}', 'subtitle': 'Nota Global', 'anchor': 'middle', 'fontSize': 32,
+               'subtitleColor': 'gray', 'color': 'white'})
+
+def spec_tecnico(data, max_puntos=MAX_PUNTOS):
+    series = {'Close': ('Precio', '#87CEEB'), 'SMA50': ('Media Móvil 50 días', '#FFA500'), 'SMA200': ('Media Móvil 200 días', '#FF0000')}
+    presentes = [c for c in series if c in data.columns and not data[c].isnull().all()]
+    data = reducir(data, max_puntos).rename(columns={c: series[c][0] for c in presentes})
+    registros = _registros(data, [series[c][0] for c in presentes] + ['RSI'])
+    eje_x = {'field': 'fecha', 'type': 'temporal', 'title': None}
+    precio = {
+        'height': 260,
+        'transform': [{'fold': [series[c][0] for c in presentes], 'as': ['nombre', 'valor']},
+                      {'filter': 'isValid(datum.valor)'}],
+        'params': [{'name': 'zoom', 'select': {'type': 'interval', 'encodings': ['x']}, 'bind': 'scales'}],
+        'mark': {'type': 'line', 'strokeWidth': 1.5},
+        'encoding': {
+            'x': eje_x,
+            'y': {'field': 'valor', 'type': 'quantitative', 'scale': {'zero': False}, 'title': 'Precio'},
+            'color': {'field': 'nombre', 'type': 'nominal', 'title': None,
+                      'scale': {'domain': [series[c][0] for c in presentes], 'range': [series[c][1] for c in presentes]}},
+            'strokeDash': {'field': 'nombre', 'type': 'nominal', 'legend': None,
+                           'scale': {'domain': [series[c][0] for c in presentes], 'range': [[1, 0] if c == 'Close' else [4, 3] for c in presentes]}},
+            'tooltip': [{'field': 'fecha', 'type': 'temporal'}, {'field': 'nombre'}, {'field': 'valor', 'format': '.2f'}],
+        },
+    }
+    rsi = {
+        'height': 90,
+        'layer': [
+            {'mark': {'type': 'line', 'color': '#DA70D6'},
+             'encoding': {'x': {**eje_x, 'scale': {'domain': {'param': 'zoom'}}},
+                          'y': {'field': 'RSI', 'type': 'quantitative', 'scale': {'domain': [0, 100]}, 'title': 'RSI'}}},
+            {'data': {'values': [{'nivel': 70, 'color': 'red'}, {'nivel': 30, 'color': 'green'}]},
+             'mark': {'type': 'rule', 'strokeDash': [4, 3]},
+             'encoding': {'y': {'field': 'nivel', 'type': 'quantitative'}, 'color': {'field': 'color', 'type': 'nominal', 'scale': None}}},
+        ],
+    }
+    return _especificacion({'data': {'values': registros}, 'vconcat': [precio, rsi], 'resolve': {'scale': {'color': 'independent'}}},
+                           titulo='Análisis Técnico del Precio (Último Año)')
+
+def spec_precio_largo(serie, titulo, etiqueta='Precio'):
+    """Serie diaria ya decimada (ver decimacion.py); se dibuja tal cual, con zoom horizontal."""
+    valores = [{'fecha': _valor(f), 'precio': _valor(v)} for f, v in serie.items()]
+    return _especificacion({
+        'data': {'values': valores},
+        'height': 280,
+        'params': [{'name': 'zoom_largo', 'select': {'type': 'interval', 'encodings': ['x']}, 'bind': 'scales'}],
+        'mark': {'type': 'line', 'color': '#87CEEB', 'strokeWidth': 1.2},
+        'encoding': {'x': {'field': 'fecha', 'type': 'temporal', 'title': None},
+                     'y': {'field': 'precio', 'type': 'quantitative', 'title': etiqueta, 'scale': {'zero': False}},
+                     'tooltip': [{'field': 'fecha', 'type': 'temporal'}, {'field': 'precio', 'format': '.2f'}]},
+    }, titulo=titulo)
+
+def spec_financieros(financials, dividends):
+    if financials is None or financials.empty:
+        return None
+    años = [{'ano': str(d.year), 'ingresos': _valor(r.get('Total Revenue', np.nan) / 1e9), 'beneficio': _valor(r.get('Net Income', np.nan) / 1e9),
+             'roe': _valor(r.get('ROE', np.nan) * 100), 'margen_op': _valor(r.get('Operating Margin', np.nan) * 100),
+             'fcf': _valor(r.get('Free Cash Flow', np.nan) / 1e9)}
+            for d, r in financials.iterrows()]
+    eje_x = {'field': 'ano', 'type': 'ordinal', 'title': None, 'axis': {'labelAngle': 0}}
+    tamano = {'width': 260, 'height': 150}
+    crecimiento = {
+        **tamano, 'title': '1. Crecimiento (Billones)',
+        'transform': [{'fold': ['ingresos', 'beneficio'], 'as': ['serie', 'valor']}],
+        'mark': 'bar',
+        'encoding': {'x': eje_x, 'xOffset': {'field': 'serie'}, 'y': {'field': 'valor', 'type': 'quantitative', 'title': None},
+                     'color': {'field': 'serie', 'type': 'nominal', 'title': None,
+                               'scale': {'domain': ['ingresos', 'beneficio'], 'range': ['#87CEEB', DORADO]}},
+                     'tooltip': [{'field': 'ano'}, {'field': 'serie'}, {'field': 'valor', 'format': '.2f'}]},
+    }
+    rentabilidad = {
+        **tamano, 'title': '2. Rentabilidad',
+        'layer': [
+            {'mark': {'type': 'line', 'point': True, 'color': 'purple'},
+             'encoding': {'x': eje_x, 'y': {'field': 'roe', 'type': 'quantitative', 'title': 'ROE (%)'}}},
+            {'mark': {'type': 'line', 'point': {'shape': 'square'}, 'color': DORADO},
+             'encoding': {'x': eje_x, 'y': {'field': 'margen_op', 'type': 'quantitative', 'title': 'Margen Op. (%)'}}},
+        ],
+        'resolve': {'scale': {'y': 'independent'}},
+    }
+    caja = {
+        **tamano, 'title': '3. Beneficio vs. Caja Real',
+        'layer': [
+            {'mark': {'type': 'bar', 'color': 'royalblue'}, 'encoding': {'x': eje_x, 'y': {'field': 'beneficio', 'type': 'quantitative', 'title': 'Billones'}}},
+            {'mark': {'type': 'line', 'point': True, 'color': 'green', 'strokeDash': [4, 3]}, 'encoding': {'x': eje_x, 'y': {'field': 'fcf', 'type': 'quantitative'}}},
+        ],
+    }
+    valores_div = [] if dividends is None or dividends.empty else [{'ano': str(i.year), 'dividendo': _valor(v)} for i, v in dividends.items()]
+    retorno = {
+        **tamano, 'title': '4. Retorno al Accionista',
+        'data': {'values': valores_div},
+        'mark': {'type': 'bar', 'color': 'orange'},
+        'encoding': {'x': {**eje_x, 'field': 'ano'}, 'y': {'field': 'dividendo', 'type': 'quantitative', 'title': 'Dividendo/Acción'}},
+    }
+    return _especificacion({'data': {'values': años}, 'vconcat': [{'hconcat': [crecimiento, rentabilidad]}, {'hconcat': [caja, retorno]}],
+                            'resolve': {'scale': {'color': 'independent'}}})
+
+def _capa_historica(serie, color, nombre, actual):
+    media, desviacion = float(serie.mean()), float(serie.std()) if len(serie) > 1 else 0.0
+    referencias = [{'etiqueta': f'Media ({media:.2f})', 'nivel': media, 'color': 'white', 'trazo': [2, 2]},
+                   {'etiqueta': '+1 Desv. Est.', 'nivel': media + desviacion, 'color': 'red', 'trazo': [2, 2]},
+                   {'etiqueta': '-1 Desv. Est.', 'nivel': media - desviacion, 'color': 'green', 'trazo': [2, 2]}]
+    if actual:
+        referencias.insert(0, {'etiqueta': f'{nombre} Actual ({actual:.2f})', 'nivel': float(actual), 'color': DORADO, 'trazo': [6, 3]})
+    return {
+        'title': f'Evolución Histórica del {nombre} Ratio', 'width': 'container', 'height': 180,
+        'layer': [
+            {'data': {'values': [{'ano': int(a), 'ratio': _valor(v)} for a, v in serie.items()]},
+             'mark': {'type': 'line', 'point': True, 'color': color},
+             'encoding': {'x': {'field': 'ano', 'type': 'ordinal', 'title': None, 'axis': {'labelAngle': 0}},
+                          'y': {'field': 'ratio', 'type': 'quantitative', 'title': f'Ratio {nombre}', 'scale': {'zero': False}},
+                          'tooltip': [{'field': 'ano', 'title': 'Año'}, {'field': 'ratio', 'format': '.2f'}]}},
+            {'data': {'values': referencias},
+             'mark': {'type': 'rule', 'opacity': 0.7},
+             'encoding': {'y': {'field': 'nivel', 'type': 'quantitative'},
+                          'color': {'field': 'etiqueta', 'type': 'nominal', 'title': None,
+                                    'scale': {'domain': [r['etiqueta'] for r in referencias], 'range': [r['color'] for r in referencias]}},
+                          'tooltip': [{'field': 'etiqueta'}, {'field': 'nivel', 'format': '.2f'}]}},
+        ],
+    }
+
+def spec_valoracion_historica(valuation_df, current_per, current_pb):
+    if valuation_df is None or valuation_df.empty:
+        return None
+    capas = []
+    for columna, color, nombre, actual in (('P/E', '#87CEEB', 'P/E', current_per), ('P/B', '#90EE90', 'P/B', current_pb)):
+        serie = valuation_df[columna].dropna() if columna in valuation_df.columns else pd.Series(dtype=float)
+        if not serie.empty:
+            capas.append(_capa_historica(serie, color, nombre, actual))
+    if not capas:
+        return None
+    return _especificacion({'vconcat': capas, 'resolve': {'scale': {'color': 'independent'}}})
+
+SERIES_PUNTUACION = [('calidad', 'Calidad', '#87CEEB'), ('valoracion', 'Valoración', '#90EE90'),
+                     ('salud', 'Salud Fin.', '#FFA07A'), ('dividendos', 'Dividendos', '#DDA0DD'),
+                     ('nota_final', 'Nota Global', DORADO)]
+
+def spec_historial_puntuaciones(score_df):
+    if score_df is None or score_df.empty:
+        return None
+    series = [(c, n, color) for c, n, color in SERIES_PUNTUACION if c in score_df.columns]
+    valores = [{'ano': int(a), 'bloque': n, 'nota': _valor(score_df.at[a, c])} for a in score_df.index for c, n, _ in series]
+    return _especificacion({
+        'data': {'values': valores}, 'width': 'container', 'height': 280,
+        'layer': [
+            {'mark': {'type': 'line', 'point': True},
+             'encoding': {'x': {'field': 'ano', 'type': 'ordinal', 'title': None, 'axis': {'labelAngle': 0}},
+                          'y': {'field': 'nota', 'type': 'quantitative', 'title': 'Nota (0-10)', 'scale': {'domain': [0, 10]}},
+                          'color': {'field': 'bloque', 'type': 'nominal', 'title': None,
+                                    'scale': {'domain': [n for _, n, _ in series], 'range': [color for _, _, color in series]}},
+                          'strokeWidth': {'condition': {'test': "datum.bloque === 'Nota Global'", 'value': 3}, 'value': 1.5},
+                          'tooltip': [{'field': 'ano', 'title': 'Año'}, {'field': 'bloque', 'title': 'Bloque'},
+                                      {'field': 'nota', 'format': '.1f'}]}},
+            {'data': {'values': [{'nivel': umbral} for umbral in UMBRALES_VEREDICTO]},
+             'mark': {'type': 'rule', 'strokeDash': [2, 2], 'opacity': 0.5, 'color': 'gray'},
+             'encoding': {'y': {'field': 'nivel', 'type': 'quantitative'}}},
+        ],
+    }, titulo='Evolución de la Nota por Ejercicio Fiscal')
+
+# --- COMPARATIVA DE COSTE EN SERVIDOR ---
+# python graficos_vega.py --benchmark 50
+def comparar_coste(iteraciones=50):
+    from graficos import (crear_grafico_radar, crear_grafico_tecnico, crear_grafico_valoracion_historica,
+                          crear_graficos_financieros, datos_sinteticos, figura_a_png)
+    tecnico, financials, dividendos, valoracion, puntuaciones = datos_sinteticos()
+    motores = {
+        'matplotlib (PNG)': lambda: [figura_a_png(crear_grafico_radar(puntuaciones, 6.5)), figura_a_png(crear_grafico_tecnico(tecnico)),
+                                     figura_a_png(crear_graficos_financieros(financials, dividendos)),
+                                     figura_a_png(crear_grafico_valoracion_historica(valoracion, 18.0, 3.0))],
+        'vega-lite (JSON)': lambda: [json.dumps(spec_radar(puntuaciones, 6.5)), json.dumps(spec_tecnico(tecnico)),
+                                     json.dumps(spec_financieros(financials, dividendos)),
+                                     json.dumps(spec_valoracion_historica(valoracion, 18.0, 3.0))],
+    }
+    resultados = {}
+    for nombre, motor in motores.items():
+        salida = motor()
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            salida = motor()
+        resultados[nombre] = {'ms_por_pagina': (time.perf_counter() - inicio) / iteraciones * 1000,
+                              'kb_por_pagina': sum(len(s) for s in salida) / 1024}
+    return resultados
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coste en servidor: matplotlib frente a Vega-Lite.")
+    parser.add_argument('--benchmark', type=int, default=50, help="Iteraciones (4 gráficos por iteración).")
+    args = parser.parse_args()
+    for nombre, r in comparar_coste(args.benchmark).items():
+        print(f"{nombre:<18} {r['ms_por_pagina']:8.2f} ms/página   {r['kb_por_pagina']:8.1f} KB/página")
@@ -0,0 +1,233 @@
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- INSTANTÁNEAS DE ANÁLISIS (point-in-time, append-only) ---
+# Cada análisis deja una instantánea plana por ticker: escalares de `datos` y
+# `hist_data`, puntuaciones por bloque, nota final y banderas, con su momento.
+# Nada se sobrescribe. Las instantáneas nuevas se añaden a un diario JSONL y,
+# cada TAMANO_SEGMENTO, se compactan en un segmento columnar comprimido (.npz,
+# una columna por campo, ordenado por ticker y momento).
+# Si una instantánea es idéntica a la última del mismo ticker no se guarda: el
+# almacén crece con los cambios, no con las consultas.
+# Las consultas "as-of" (qué decía la herramienta en tal fecha) son dos
+# searchsorted sobre la tabla ordenada: el bloque del ticker y, dentro, la fecha.
+
+RUTA_INSTANTANEAS = os.environ.get('ANALIZADOR_INSTANTANEAS', 'instantaneas')
+TAMANO_SEGMENTO = 256
+COLUMNAS_CLAVE = ['ticker', 'momento', 'huella']
+
+def _escalar(valor):
+    return valor is None or isinstance(valor, (bool, int, float, str, np.integer, np.floating))
+
+def _limpiar(valor):
+    if isinstance(valor, (bool, np.bool_)):
+        return float(valor)
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        valor = float(valor)
+        return None if math.isnan(valor) or math.isinf(valor) else valor
+    return valor
+
+def componer(datos, hist_data, puntuaciones, nota_final, banderas):
+    """Instantánea plana {campo: valor} con prefijos por origen (datos., hist., punt.)."""
+    valores = {f'datos.{k}': _limpiar(v) for k, v in datos.items() if _escalar(v)}
+    valores.update({f'hist.{k}': _limpiar(v) for k, v in (hist_data or {}).items() if _escalar(v)})
+    valores.update({f'punt.{k}': _limpiar(v) for k, v in puntuaciones.items() if _escalar(v)})
+    valores['punt.nota_final'] = _limpiar(nota_final)
+    valores['banderas'] = json.dumps(sorted(banderas), ensure_ascii=False)
+    return valores
+
+def huella(valores):
+    return hashlib.sha1(json.dumps(valores, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+def _a_columnas(registros):
+    """Registros del diario → dict de arrays (float64 si todos los valores son numéricos, texto si no)."""
+    tabla = pd.DataFrame([{'ticker': r['ticker'], 'momento': r['momento'], 'huella': r['huella'], **r['valores']} for r in registros])
+    tabla = tabla.sort_values(['ticker', 'momento'], kind='stable')
+    columnas = {}
+    for campo in tabla.columns:
+        serie = tabla[campo]
+        if campo == 'momento':
+            columnas[campo] = serie.to_numpy(dtype=float)
+            continue
+        if campo not in ('ticker', 'huella') and not serie.map(lambda v: isinstance(v, str)).any():
+            columnas[campo] = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=float)
+        else:
+            columnas[campo] = serie.fillna('').astype(str).to_numpy(dtype=str)
+    return columnas
+
+class AlmacenInstantaneas:
+    def __init__(self, ruta=RUTA_INSTANTANEAS, tamano_segmento=TAMANO_SEGMENTO):
+        self.ruta = ruta
+        self.tamano_segmento = tamano_segmento
+        os.makedirs(ruta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._tabla = None
+        self._version = None
+        self._segmentos_leidos = {}   # los segmentos son inmutables: se leen una vez
+        self._ultimas_huellas = None
+
+    @property
+    def _ruta_diario(self):
+        return os.path.join(self.ruta, 'diario.jsonl')
+
+    def _segmentos(self):
+        return sorted(glob.glob(os.path.join(self.ruta, 'segmento-*.npz')))
+
+    # --- Escritura ---
+    def registrar(self, ticker, valores, momento=None):
+        """Añade la instantánea salvo que sea igual a la última del ticker. Devuelve True si se guardó."""
+        ticker = ticker.upper()
+        resumen = huella(valores)
+        with self._lock:
+            if self._ultimas_huellas is None:
+                tabla = self.tabla()
+                self._ultimas_huellas = dict(zip(tabla['ticker'], tabla['huella']))  # orden por momento: gana la última
+            if self._ultimas_huellas.get(ticker) == resumen:
+                return False
+            registro = {'ticker': ticker, 'momento': float(momento if momento is not None else time.time()), 'huella': resumen, 'valores': valores}
+            with open(self._ruta_diario, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            self._ultimas_huellas[ticker] = resumen
+            if self._lineas_diario() >= self.tamano_segmento:
+                self.compactar()
+        return True
+
+    def _lineas_diario(self):
+        try:
+            with open(self._ruta_diario, encoding='utf-8') as f:
+                return sum(1 for _ in f)
+        except OSError:
+            return 0
+
+    def _leer_diario(self, ruta=None):
+        try:
+            with open(ruta or self._ruta_diario, encoding='utf-8') as f:
+                return [json.loads(linea) for linea in f if linea.strip()]
+        except OSError:
+            return []
+
+    def compactar(self):
+        """Diario → segmento .npz comprimido. El diario se aparta con un rename atómico antes de leerlo."""
+        if not os.path.exists(self._ruta_diario):
+            return None
+        apartado = f'{self._ruta_diario}.{os.getpid()}.compactando'
+        os.replace(self._ruta_diario, apartado)
+        registros = self._leer_diario(apartado)
+        if not registros:
+            os.remove(apartado)
+            return None
+        destino = os.path.join(self.ruta, f'segmento-{time.time_ns():020d}-{os.getpid()}.npz')
+        tmp = destino[:-4] + '.tmp.npz'
+        np.savez_compressed(tmp, **_a_columnas(registros))
+        os.replace(tmp, destino)
+        os.remove(apartado)
+        return destino
+
+    # --- Lectura ---
+    def _version_actual(self):
+        firmas = [(s, os.path.getsize(s)) for s in self._segmentos()]
+        try:
+            firmas.append(('diario', os.stat(self._ruta_diario).st_mtime_ns))
+        except OSError:
+            pass
+        return tuple(firmas)
+
+    def tabla(self):
+        """Todas las instantáneas, ordenadas por (ticker, momento). Se recarga solo si cambian los ficheros."""
+        version = self._version_actual()
+        if self._tabla is not None and version == self._version:
+            return self._tabla
+        partes = []
+        for segmento in self._segmentos():
+            if segmento not in self._segmentos_leidos:
+                with np.load(segmento, allow_pickle=False) as npz:
+                    self._segmentos_leidos[segmento] = pd.DataFrame({campo: npz[campo] for campo in npz.files})
+            partes.append(self._segmentos_leidos[segmento])
+        diario = self._leer_diario()
+        if diario:
+            partes.append(pd.DataFrame(_a_columnas(diario)))
+        if partes:
+            tabla = pd.concat(partes, ignore_index=True, sort=False)
+            tabla = tabla.drop_duplicates(['ticker', 'momento', 'huella']).sort_values(['ticker', 'momento'], kind='stable').reset_index(drop=True)
+        else:
+            tabla = pd.DataFrame(columns=COLUMNAS_CLAVE)
+        self._tabla, self._version = tabla, version
+        self._tickers = tabla['ticker'].to_numpy(dtype=str)
+        self._momentos = tabla['momento'].to_numpy(dtype=float)
+        return tabla
+
+    def _bloque(self, ticker):
+        self.tabla()
+        return self._tickers.searchsorted(ticker, 'left'), self._tickers.searchsorted(ticker, 'right')
+
+    def historial(self, ticker):
+        inicio, fin = self._bloque(ticker.upper())
+        return self._tabla.iloc[inicio:fin]
+
+    def momentos(self, ticker):
+        inicio, fin = self._bloque(ticker.upper())
+        return pd.to_datetime(self._momentos[inicio:fin], unit='s')
+
+    def en_fecha(self, ticker, fecha):
+        """Última instantánea del ticker en o antes de `fecha` (Series sin los campos vacíos), o None."""
+        inicio, fin = self._bloque(ticker.upper())
+        limite = pd.Timestamp(fecha).timestamp()
+        posicion = inicio + self._momentos[inicio:fin].searchsorted(limite, 'right') - 1
+        if posicion < inicio:
+            return None
+        fila = self._tabla.iloc[posicion]
+        return fila[fila.notna() & (fila != '')]
+
+    def diferencias(self, ticker, fecha_a, fecha_b):
+        """Campos que cambian entre las instantáneas vigentes en `fecha_a` y en `fecha_b`."""
+        a, b = self.en_fecha(ticker, fecha_a), self.en_fecha(ticker, fecha_b)
+        if a is None or b is None:
+            return pd.DataFrame(columns=['Antes', 'Después', 'Cambio'])
+        campos = [c for c in dict.fromkeys(list(a.index) + list(b.index)) if c not in COLUMNAS_CLAVE]
+        filas = {}
+        for campo in campos:
+            antes, despues = a.get(campo), b.get(campo)
+            if antes == despues or (antes is None and despues is None):
+                continue
+            if isinstance(antes, (float, np.floating)) and isinstance(despues, (float, np.floating)):
+                if np.isclose(antes, despues, rtol=1e-9, atol=0):
+                    continue
+                cambio = despues - antes
+            else:
+                cambio = None
+            filas[campo] = {'Antes': antes, 'Después': despues, 'Cambio': cambio}
+        return pd.DataFrame.from_dict(filas, orient='index', columns=['Antes', 'Después', 'Cambio'])
+
+# python instantaneas.py diff AAPL 2025-01-01 2025-07-01
+# python instantaneas.py compactar
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Instantáneas de análisis por ticker.")
+    parser.add_argument('--ruta', default=RUTA_INSTANTANEAS)
+    sub = parser.add_subparsers(dest='orden', required=True)
+    p_historial = sub.add_parser('historial')
+    p_historial.add_argument('ticker')
+    p_diff = sub.add_parser('diff')
+    p_diff.add_argument('ticker')
+    p_diff.add_argument('fecha_a')
+    p_diff.add_argument('fecha_b')
+    sub.add_parser('compactar')
+    args = parser.parse_args()
+
+    almacen = AlmacenInstantaneas(args.ruta)
+    if args.orden == 'historial':
+        historial = almacen.historial(args.ticker)
+        print(historial[['momento', 'punt.nota_final']].assign(momento=almacen.momentos(args.ticker)).to_string(index=False)
+              if 'punt.nota_final' in historial else "Sin instantáneas.")
+    elif args.orden == 'diff':
+        print(almacen.diferencias(args.ticker, args.fecha_a, args.fecha_b).to_string())
+    else:
+        print(almacen.compactar() or "Diario vacío.")
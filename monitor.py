@@ -0,0 +1,203 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+import pandas as pd
+
+from adquisicion import DATASETS, obtener_datos_completos_swr, obtener_historicos_swr, refrescar_dataset
+from puntuacion import UMBRALES_VEREDICTO, analizar_banderas_rojas, calcular_nota_final, calcular_puntuaciones_y_justificaciones
+
+# --- MONITOR DE LA LISTA DE SEGUIMIENTO ---
+# Reevalúa periódicamente una lista de tickers y emite solo los cambios: la nota
+# final cruza un umbral del veredicto o aparece / desaparece una bandera roja.
+# Es incremental: cada ticker guarda una huella de sus entradas (los campos de
+# `datos` y `hist_data` que usan la puntuación y las banderas); si no ha
+# cambiado desde la última pasada, no se vuelve a puntuar ni a comparar.
+# Las descargas siguen las políticas de frescura de cada dataset (adquisicion.py),
+# así que una pasada sobre datos frescos no hace ninguna petición.
+# Los eventos van a uno o varios sumideros: fichero JSONL, webhook o la salida estándar.
+# El estado de un ticker con eventos solo avanza si al menos un sumidero los
+# recibió; si fallan todos, la pasada siguiente lo reevalúa y los vuelve a emitir.
+
+RUTA_ESTADO = os.environ.get('ANALIZADOR_MONITOR', 'monitor_estado.json')
+DATASETS_MONITOR = ['fundamentales', 'precio', 'historicos']
+TIMEOUT_WEBHOOK = 10
+
+def _titulo_bandera(bandera):
+    """'🔴 **Deuda Creciente:** ...' → 'Deuda Creciente'."""
+    encontrado = re.search(r'\*\*(.+?):?\*\*', bandera)
+    return encontrado.group(1) if encontrado else bandera
+
+def _escalar(valor):
+    return valor is None or isinstance(valor, (bool, int, float, str))
+
+def huella_entradas(datos, hist_data):
+    """Resumen estable de todo lo que alimenta la nota y las banderas."""
+    h = hashlib.sha1()
+    for origen in (datos, hist_data or {}):
+        h.update(json.dumps({k: v for k, v in origen.items() if _escalar(v)}, sort_keys=True, default=str).encode())
+    financials = (hist_data or {}).get('financials_charts')
+    if isinstance(financials, pd.DataFrame) and not financials.empty:
+        h.update(pd.util.hash_pandas_object(financials, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+# --- Sumideros ---
+class SumideroJSONL:
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def emitir(self, eventos):
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            for evento in eventos:
+                f.write(json.dumps(evento, ensure_ascii=False) + '\n')
+
+class SumideroWebhook:
+    def __init__(self, url, timeout=TIMEOUT_WEBHOOK):
+        self.url = url
+        self.timeout = timeout
+
+    def emitir(self, eventos):
+        cuerpo = json.dumps({'eventos': eventos}, ensure_ascii=False).encode('utf-8')
+        peticion = urllib.request.Request(self.url, data=cuerpo, headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(peticion, timeout=self.timeout):
+            pass
+
+class SumideroSalida:
+    def emitir(self, eventos):
+        for evento in eventos:
+            print(json.dumps(evento, ensure_ascii=False))
+
+# --- Monitor ---
+class Monitor:
+    def __init__(self, sumideros, ruta_estado=RUTA_ESTADO, umbrales=UMBRALES_VEREDICTO):
+        self.sumideros = list(sumideros)
+        self.ruta_estado = ruta_estado
+        self.umbrales = sorted(umbrales)
+        self.estado = self._cargar_estado()
+
+    def _cargar_estado(self):
+        try:
+            with open(self.ruta_estado, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_estado(self):
+        tmp = f'{self.ruta_estado}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.estado, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.ruta_estado)
+
+    def _actualizar_datos(self, ticker):
+        # Solo se descarga lo que su política de frescura da por caducado.
+        for dataset in DATASETS_MONITOR:
+            if not DATASETS[dataset][0].es_fresca(ticker):
+                refrescar_dataset(ticker, dataset)
+        datos, _ = obtener_datos_completos_swr(ticker)
+        hist_data, _ = obtener_historicos_swr(ticker)
+        return datos, hist_data
+
+    def evaluar(self, ticker, datos, hist_data):
+        puntuaciones, _, _ = calcular_puntuaciones_y_justificaciones(datos, hist_data or {})
+        banderas, _ = analizar_banderas_rojas(datos, (hist_data or {}).get('financials_charts'))
+        return round(float(calcular_nota_final(puntuaciones)), 2), sorted(_titulo_bandera(b) for b in banderas)
+
+    def comparar(self, ticker, anterior, nota, banderas, momento):
+        """Eventos de cambio entre la evaluación anterior y la actual."""
+        if anterior is None:
+            return [{'ticker': ticker, 'momento': momento, 'tipo': 'alta', 'nota': nota, 'banderas': banderas}]
+        eventos = []
+        for umbral in self.umbrales:
+            if (anterior['nota'] >= umbral) != (nota >= umbral):
+                eventos.append({'ticker': ticker, 'momento': momento, 'tipo': 'cruce_umbral', 'umbral': umbral,
+                                'direccion': 'sube' if nota >= umbral else 'baja', 'antes': anterior['nota'], 'ahora': nota})
+        previas = set(anterior['banderas'])
+        for bandera in banderas:
+            if bandera not in previas:
+                eventos.append({'ticker': ticker, 'momento': momento, 'tipo': 'bandera_nueva', 'bandera': bandera, 'nota': nota})
+        for bandera in sorted(previas - set(banderas)):
+            eventos.append({'ticker': ticker, 'momento': momento, 'tipo': 'bandera_retirada', 'bandera': bandera, 'nota': nota})
+        return eventos
+
+    def pasada(self, tickers):
+        """Una pasada sobre la lista. Devuelve (eventos, resumen)."""
+        momento = datetime.now().isoformat(timespec='seconds')
+        eventos, resumen = [], {'evaluados': 0, 'sin_cambios': 0, 'errores': 0, 'no_entregados': 0}
+        nuevos, con_eventos = {}, set()
+        for ticker in dict.fromkeys(t.strip().upper() for t in tickers if t.strip()):
+            try:
+                datos, hist_data = self._actualizar_datos(ticker)
+            except Exception as e:
+                resumen['errores'] += 1
+                print(f"{ticker}: {e}", file=sys.stderr)
+                continue
+            if not datos:
+                resumen['errores'] += 1
+                continue
+            anterior = self.estado.get(ticker)
+            huella = huella_entradas(datos, hist_data)
+            if anterior is not None and anterior.get('huella') == huella:
+                resumen['sin_cambios'] += 1
+                continue
+            nota, banderas = self.evaluar(ticker, datos, hist_data)
+            resumen['evaluados'] += 1
+            eventos_ticker = self.comparar(ticker, anterior, nota, banderas, momento)
+            if eventos_ticker:
+                con_eventos.add(ticker)
+            eventos += eventos_ticker
+            nuevos[ticker] = {'huella': huella, 'nota': nota, 'banderas': banderas, 'evaluado': momento}
+        if eventos and not self.emitir(eventos):
+            # Nadie recibió los eventos: esos tickers conservan su estado anterior para reintentarlo.
+            resumen['no_entregados'] = len(con_eventos)
+            nuevos = {t: e for t, e in nuevos.items() if t not in con_eventos}
+        self.estado.update(nuevos)
+        self._guardar_estado()
+        return eventos, resumen
+
+    def emitir(self, eventos):
+        """Envía los eventos a todos los sumideros. True si al menos uno los recibió."""
+        entregados = False
+        for sumidero in self.sumideros:
+            try:
+                sumidero.emitir(eventos)
+                entregados = True
+            except Exception as e:
+                # Un sumidero caído no impide que el resto reciba los eventos.
+                print(f"Sumidero {type(sumidero).__name__}: {e}", file=sys.stderr)
+        return entregados
+
+def leer_lista(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return [linea.split('#')[0].strip() for linea in f if linea.split('#')[0].strip()]
+
+# python monitor.py --lista cartera.txt --jsonl eventos.jsonl --cada 900
+# python monitor.py AAPL MSFT --webhook https://ejemplo.org/hook
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reevalúa una lista de seguimiento y emite los cambios de nota y banderas.")
+    parser.add_argument('tickers', nargs='*')
+    parser.add_argument('--lista', help="Fichero con un ticker por línea (# para comentarios).")
+    parser.add_argument('--estado', default=RUTA_ESTADO)
+    parser.add_argument('--jsonl', help="Añade los eventos a este fichero JSONL.")
+    parser.add_argument('--webhook', help="POST de los eventos en JSON a esta URL.")
+    parser.add_argument('--cada', type=float, default=None, help="Segundos entre pasadas; sin él, una sola pasada.")
+    args = parser.parse_args()
+
+    tickers = list(args.tickers) + (leer_lista(args.lista) if args.lista else [])
+    if not tickers:
+        parser.error("Indica tickers o --lista.")
+    sumideros = [SumideroJSONL(args.jsonl)] if args.jsonl else []
+    if args.webhook:
+        sumideros.append(SumideroWebhook(args.webhook))
+    monitor = Monitor(sumideros or [SumideroSalida()], args.estado)
+    while True:
+        eventos, resumen = monitor.pasada(tickers)
+        print(f"{datetime.now():%H:%M:%S} · {len(eventos)} eventos · {resumen}", file=sys.stderr)
+        if args.cada is None:
+            break
+        time.sleep(args.cada)
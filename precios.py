@@ -0,0 +1,113 @@
+import pandas as pd
+import yfinance as yf
+
+from cache import CORTACIRCUITOS_YAHOO, CacheSWR
+
+# --- HISTORIAL DE PRECIOS EN BLOQUE ---
+# Un cribado o una cartera de cientos de tickers no debe hacer una petición por
+# ticker (y menos dos, 10y y max). Se descargan lotes de símbolos por petición
+# con yf.download, se alinean en una matriz ancha fechas × tickers y se reparte
+# por ticker en la caché. Solo los que fallen en el lote se piden uno a uno.
+# El historial de 10 años se deriva del máximo, no se vuelve a descargar.
+
+TAMANO_LOTE = 50
+CAMPOS_OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Los dividendos viajan en el mismo historial (ver dividendos.py): no hay descarga aparte.
+CAMPOS_HISTORIAL = CAMPOS_OHLCV + ['Dividends']
+
+# Valor cacheado: {'historial': DataFrame OHLCV + Dividends} o {} si Yahoo no tiene datos.
+CACHE_HISTORIAL_PRECIOS = CacheSWR('historial_precios', ttl=3600)
+
+def _normalizar(historial):
+    if historial is None or historial.empty:
+        return {}
+    historial = historial[[c for c in CAMPOS_HISTORIAL if c in historial.columns]]
+    historial = historial.dropna(how='all', subset=[c for c in CAMPOS_OHLCV if c in historial.columns])
+    if historial.empty or 'Close' not in historial.columns:
+        return {}
+    if historial.index.tz is not None:
+        historial.index = historial.index.tz_localize(None)
+    return {'historial': historial}
+
+def descargar_historial(ticker, periodo='max'):
+    """Ruta de un solo ticker (la de siempre), usada como respaldo del lote."""
+    return _normalizar(yf.Ticker(ticker).history(period=periodo))
+
+def _descargar_lote(tickers, periodo):
+    if not CORTACIRCUITOS_YAHOO.permite():
+        return {}
+    try:
+        bruto = yf.download(tickers, period=periodo, group_by='ticker', auto_adjust=True, actions=True,
+                            threads=True, progress=False)
+    except Exception:
+        CORTACIRCUITOS_YAHOO.fallo()
+        return {}
+    if bruto is None or bruto.empty:
+        CORTACIRCUITOS_YAHOO.fallo()
+        return {}
+    CORTACIRCUITOS_YAHOO.exito()
+    resultado = {}
+    if isinstance(bruto.columns, pd.MultiIndex):
+        disponibles = set(bruto.columns.get_level_values(0))
+        for ticker in tickers:
+            if ticker in disponibles:
+                normalizado = _normalizar(bruto[ticker])
+                if normalizado:
+                    resultado[ticker] = normalizado
+    elif len(tickers) == 1:
+        normalizado = _normalizar(bruto)
+        if normalizado:
+            resultado[tickers[0]] = normalizado
+    return resultado
+
+def precargar_historiales(tickers, periodo='max', tamano_lote=TAMANO_LOTE, forzar=False):
+    """Descarga en lotes los historiales que falten (o todos, con forzar) y los deja en la caché.
+    Devuelve {'lote': n, 'individual': n, 'fallidos': [...]}."""
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    pendientes = tickers if forzar else [t for t in tickers if not CACHE_HISTORIAL_PRECIOS.es_fresca(t)]
+    informe = {'lote': 0, 'individual': 0, 'fallidos': []}
+    for inicio in range(0, len(pendientes), tamano_lote):
+        lote = pendientes[inicio:inicio + tamano_lote]
+        descargados = _descargar_lote(lote, periodo)
+        for ticker, valor in descargados.items():
+            CACHE_HISTORIAL_PRECIOS.guardar(ticker, valor)
+        informe['lote'] += len(descargados)
+        for ticker in lote:
+            if ticker in descargados:
+                continue
+            try:
+                valor = CACHE_HISTORIAL_PRECIOS.refrescar(ticker, descargar_historial, ticker, periodo)
+            except Exception:
+                valor = None
+            if valor:
+                informe['individual'] += 1
+            else:
+                informe['fallidos'].append(ticker)
+    return informe
+
+def obtener_historial(ticker):
+    """Historial OHLCV máximo de un ticker (DataFrame, vacío si no hay datos)."""
+    valor, _ = CACHE_HISTORIAL_PRECIOS.obtener(ticker, descargar_historial, ticker)
+    return valor.get('historial', pd.DataFrame(columns=CAMPOS_OHLCV)) if valor else pd.DataFrame(columns=CAMPOS_OHLCV)
+
+def ultimos_anos(historial, anos):
+    if historial.empty:
+        return historial
+    return historial[historial.index >= historial.index.max() - pd.DateOffset(years=anos)]
+
+def matriz_cierres(tickers, anos=None, precargar=True):
+    """Matriz ancha de cierres alineada por fecha (filas) y ticker (columnas)."""
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    if precargar:
+        precargar_historiales(tickers)
+    columnas = {}
+    for ticker in tickers:
+        try:
+            historial = obtener_historial(ticker)
+        except Exception:
+            continue
+        if anos is not None:
+            historial = ultimos_anos(historial, anos)
+        if not historial.empty:
+            columnas[ticker] = historial['Close']
+    return pd.DataFrame(columnas).sort_index()
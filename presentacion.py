@@ -0,0 +1,229 @@
+import numpy as np
+
+from puntuacion import UMBRALES_VEREDICTO
+
+# --- HTML COMPARTIDO ENTRE LA APP Y LOS INFORMES ---
+# Estilos y textos que pinta tanto la página de Streamlit como los informes
+# exportados (exportar.py). No importa streamlit, así que se puede usar desde
+# procesos sin interfaz.
+
+ESTILOS_CSS = """
+    .stApp { background-color: #0E1117; color: #FAFAFA; }
+    h1, h2, h3 { color: #D4AF37; }
+    .st-emotion-cache-1r6slb0, [data-testid="stVerticalBlock"] > [style*="flex-direction: column;"] > [data-testid="stVerticalBlock"] { border: 1px solid #D4AF37 !important; border-radius: 10px; padding: 15px !important; margin-bottom: 1rem; }
+    .stButton>button { background-color: #D4AF37; color: #0E1117; border-radius: 8px; border: 1px solid #D4AF37; font-weight: bold; }
+    
+    /* Estilos para métricas con colores dinámicos */
+    .metric-container { margin-bottom: 10px; padding-top: 5px; }
+    .metric-label { font-size: 1rem; color: #adb5bd; }
+    .metric-value { font-size: 1.75rem; font-weight: bold; line-height: 1.2; }
+    .formula-label { font-size: 0.8rem; color: #6c757d; font-style: italic; }
+    .color-green { color: #28a745; }
+    .color-red { color: #dc3545; }
+    .color-orange { color: #fd7e14; }
+    .color-white { color: #FAFAFA; }
+"""
+
+# Un texto por tramo de UMBRALES_VEREDICTO, de menor a mayor nota.
+VEREDICTOS = [
+    "Empresa SÓLIDA, pero vigilar valoración o riesgos.",
+    "Empresa de ALTA CALIDAD a un precio razonable.",
+    "Empresa EXCEPCIONAL a un precio potencialmente atractivo.",
+]
+
+def nivel_veredicto(nota_final):
+    """Cuántos umbrales del veredicto alcanza la nota (0 = el más bajo)."""
+    return sum(nota_final >= umbral for umbral in sorted(UMBRALES_VEREDICTO))
+
+def veredicto(nota_final):
+    return VEREDICTOS[nivel_veredicto(nota_final)]
+
+def generar_resumen_ejecutivo(datos, puntuaciones, hist_data, sector_bench):
+    """
+    Genera un análisis textual profundo y profesional de la empresa,
+    combinando métricas cuantitativas con una interpretación cualitativa y estética mejorada.
+    """
+    
+    # --- Helper function for colorizing text ---
+    def colorize(value, good_threshold, bad_threshold, lower_is_better=False, is_percent=False, is_ratio=False):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return "N/A"
+        
+        if is_percent:
+            formatted_value = f"{value:.1f}%"
+        elif is_ratio:
+            formatted_value = f"{value:.1f}x"
+        else:
+            formatted_value = f"{value:.2f}"
+            
+        color = "#fd7e14" # Orange
+        try:
+            numeric_value = float(value)
+            if lower_is_better:
+                if numeric_value < good_threshold: color = "#28a745" # Green
+                elif numeric_value > bad_threshold: color = "#dc3545" # Red
+            else:
+                if numeric_value > good_threshold: color = "#28a745" # Green
+                elif numeric_value < bad_threshold: color = "#dc3545" # Red
+        except (ValueError, TypeError):
+            pass # Keep orange if not comparable
+            
+        return f'<span style="color: {color}; font-weight: bold;">{formatted_value}</span>'
+
+    # --- Data Extraction ---
+    calidad_score = puntuaciones.get('calidad', 0)
+    valoracion_score = puntuaciones.get('valoracion', 0)
+    salud_score = puntuaciones.get('salud', 0)
+    dividendos_score = puntuaciones.get('dividendos', 0)
+    
+    roe = datos.get('roe')
+    roic = datos.get('roic')
+    margen_op = datos.get('margen_operativo')
+    bpa_cagr = hist_data.get('bpa_cagr')
+    deuda_ebitda = datos.get('deuda_ebitda')
+    per = datos.get('per')
+    per_hist = hist_data.get('per_hist')
+    yield_div = datos.get('yield_dividendo')
+    payout = datos.get('payout_ratio')
+    net_buybacks = datos.get('net_buybacks_pct')
+    
+    resumen_parts = []
+
+    # --- 1. Veredicto General ---
+    resumen_parts.append('<h6>Veredicto General</h6>')
+    veredicto_text = ""
+    if calidad_score >= 7.5 and valoracion_score >= 7.5 and salud_score >= 7:
+        veredicto_text = "<strong>Oportunidad de Inversión de Alta Convicción:</strong> Nos encontramos ante una empresa excepcional a un precio que parece muy atractivo. Combina un modelo de negocio de élite, una salud financiera robusta y una valoración que ofrece un margen de seguridad considerable."
+    elif calidad_score >= 7.5 and valoracion_score < 5:
+        veredicto_text = "<strong>Negocio Excepcional a un Precio Exigente:</strong> Estamos ante una joya de negocio, pero su valoración actual es elevada. El mercado reconoce su calidad y la cotiza a múltiplos altos. La inversión aquí depende de la confianza en que su crecimiento futuro justifique el precio actual."
+    elif calidad_score < 5 and valoracion_score >= 7.5:
+        veredicto_text = "<strong>Posible 'Ganga' con Riesgos (Deep Value):</strong> Esta es una potencial oportunidad de valor profundo, pero no exenta de riesgos. Su bajo precio refleja debilidades en su modelo de negocio. Requiere un análisis más profundo para determinar si es una 'trampa de valor' o un activo genuinamente infravalorado."
+    else:
+        veredicto_text = "<strong>Empresa Sólida, Inversión Equilibrada:</strong> Se trata de una empresa sólida con una valoración razonable, que presenta un equilibrio entre sus puntos fuertes y sus áreas de mejora. Podría ser un componente estable y fiable en una cartera diversificada."
+    
+    resumen_parts.append(f'<p style="background-color: #1a1c24; padding: 12px; border-radius: 8px; border: 1px solid #333;">{veredicto_text}</p>')
+
+    # --- 2. Análisis de Calidad del Negocio ---
+    resumen_parts.append(f"<h6>✅ Análisis de Calidad del Negocio (Sector: {datos['sector']})</h6>")
+    calidad_fortalezas = []
+    calidad_debilidades = []
+
+    if roe is not None and roic is not None:
+        if roe > sector_bench['roe_excelente'] and roic > sector_bench['roic_excelente']:
+            calidad_fortalezas.append(f"Presenta una rentabilidad sobre el capital sobresaliente, con un ROE del {colorize(roe, sector_bench['roe_excelente'], sector_bench['roe_bueno'], is_percent=True)} y un ROIC del {colorize(roic, sector_bench['roic_excelente'], sector_bench['roic_bueno'], is_percent=True)}.")
+        elif roe > sector_bench['roe_bueno'] and roic > sector_bench['roic_bueno']:
+            calidad_fortalezas.append(f"Muestra una buena rentabilidad, con un ROE del {colorize(roe, sector_bench['roe_excelente'], sector_bench['roe_bueno'], is_percent=True)} y un ROIC del {colorize(roic, sector_bench['roic_excelente'], sector_bench['roic_bueno'], is_percent=True)}, superando los niveles aceptables para su sector.")
+        else:
+            calidad_debilidades.append(f"Su rentabilidad es un punto débil. El ROE de {colorize(roe, sector_bench['roe_excelente'], sector_bench['roe_bueno'], is_percent=True)} y el ROIC de {colorize(roic, sector_bench['roic_excelente'], sector_bench['roic_bueno'], is_percent=True)} están por debajo de la media del sector.")
+    
+    if margen_op is not None:
+        if margen_op > sector_bench['margen_excelente']:
+            calidad_fortalezas.append(f"Opera con unos márgenes de beneficio de élite ({colorize(margen_op, sector_bench['margen_excelente'], sector_bench['margen_bueno'], is_percent=True)}), lo que sugiere fuertes ventajas competitivas.")
+        elif margen_op < sector_bench['margen_bueno']:
+            calidad_debilidades.append(f"Sus márgenes operativos son ajustados ({colorize(margen_op, sector_bench['margen_excelente'], sector_bench['margen_bueno'], is_percent=True)}), indicando una posible alta competencia.")
+
+    if bpa_cagr is not None:
+        if bpa_cagr > sector_bench['bpa_growth_excelente']:
+            calidad_fortalezas.append(f"Demuestra un crecimiento de beneficios a largo plazo excepcional (CAGR del {colorize(bpa_cagr, sector_bench['bpa_growth_excelente'], sector_bench['bpa_growth_bueno'], is_percent=True)}).")
+        elif bpa_cagr < sector_bench['bpa_growth_bueno']:
+            calidad_debilidades.append(f"El crecimiento de beneficios a largo plazo es lento o negativo ({colorize(bpa_cagr, sector_bench['bpa_growth_excelente'], sector_bench['bpa_growth_bueno'], is_percent=True)}).")
+
+    if calidad_fortalezas:
+        resumen_parts.append('<strong style="color: #28a745;">Fortalezas:</strong><ul><li>' + "</li><li>".join(calidad_fortalezas) + '</li></ul>')
+    if calidad_debilidades:
+        resumen_parts.append('<br><strong style="color: #dc3545;">Debilidades:</strong><ul><li>' + "</li><li>".join(calidad_debilidades) + '</li></ul>')
+    if not calidad_fortalezas and not calidad_debilidades:
+        resumen_parts.append('<p style="font-style: italic; color: #adb5bd;">En esta área, la empresa se encuentra dentro de los parámetros normales para su sector, sin fortalezas o debilidades que destaquen significativamente.</p>')
+
+    # --- 3. Análisis de Salud Financiera ---
+    resumen_parts.append(f"<h6>🛡️ Análisis de Salud Financiera</h6>")
+    salud_fortalezas = []
+    salud_debilidades = []
+
+    if deuda_ebitda is not None:
+        if deuda_ebitda < sector_bench['deuda_ebitda_bueno']:
+            salud_fortalezas.append(f"Su balance es muy sólido, con un nivel de deuda neta de solo {colorize(deuda_ebitda, sector_bench['deuda_ebitda_bueno'], sector_bench['deuda_ebitda_aceptable'], lower_is_better=True, is_ratio=True)} veces su EBITDA, un ratio muy saludable para el sector {datos['sector']}.")
+        elif deuda_ebitda > sector_bench['deuda_ebitda_aceptable']:
+            salud_debilidades.append(f"El nivel de apalancamiento es un punto de riesgo. Su deuda neta es de {colorize(deuda_ebitda, sector_bench['deuda_ebitda_bueno'], sector_bench['deuda_ebitda_aceptable'], lower_is_better=True, is_ratio=True)} veces su EBITDA, una cifra elevada para una empresa del sector {datos['sector']}.")
+
+    if datos.get('raw_fcf') is not None and datos.get('raw_fcf') < 0:
+        salud_debilidades.append("Actualmente presenta un Flujo de Caja Libre negativo, lo que significa que está quemando más efectivo del que genera. Es una bandera roja importante que requiere vigilancia.")
+
+    if salud_fortalezas:
+        resumen_parts.append('<strong style="color: #28a745;">Fortalezas:</strong><ul><li>' + "</li><li>".join(salud_fortalezas) + '</li></ul>')
+    if salud_debilidades:
+        resumen_parts.append('<br><strong style="color: #dc3545;">Debilidades:</strong><ul><li>' + "</li><li>".join(salud_debilidades) + '</li></ul>')
+    if not salud_fortalezas and not salud_debilidades:
+        resumen_parts.append('<p style="font-style: italic; color: #adb5bd;">El balance de la compañía se considera adecuado y dentro de la normalidad para su sector, sin puntos de riesgo o solidez excepcionales.</p>')
+
+    # --- 4. Análisis de Valoración ---
+    resumen_parts.append(f"<h6>⚖️ Análisis de Valoración</h6>")
+    valoracion_oportunidades = []
+    valoracion_riesgos = []
+
+    if per is not None and per_hist is not None:
+        if per < sector_bench['per_barato'] and per < per_hist * 0.8:
+            valoracion_oportunidades.append(f"La valoración por múltiplos parece muy atractiva. Su PER actual de {colorize(per, sector_bench['per_barato'], sector_bench['per_justo'], lower_is_better=True)} no solo es bajo para su sector, sino que cotiza con un descuento significativo frente a su media histórica de {per_hist:.1f}x.")
+        elif per > sector_bench['per_justo'] and per > per_hist * 1.2:
+            valoracion_riesgos.append(f"La acción parece cara en este momento. Su PER de {colorize(per, sector_bench['per_barato'], sector_bench['per_justo'], lower_is_better=True)} es elevado tanto para su sector como en comparación con su propia historia (media de {per_hist:.1f}x).")
+        else:
+            base_text = f"La valoración se encuentra en un rango razonable para su sector, con un PER de {colorize(per, sector_bench['per_barato'], sector_bench['per_justo'], lower_is_better=True)}. "
+            if per < per_hist * 0.9:
+                historical_comparison = f"Sin embargo, cotiza con un <strong>atractivo descuento</strong> frente a su media histórica de {per_hist:.1f}x, lo que podría sugerir una oportunidad."
+                valoracion_oportunidades.append(base_text + historical_comparison)
+            elif per > per_hist * 1.1:
+                historical_comparison = f"No obstante, cotiza con una <strong>prima</strong> sobre su media histórica de {per_hist:.1f}x, indicando que el mercado tiene expectativas más altas que en el pasado."
+                valoracion_riesgos.append(base_text + historical_comparison)
+            else:
+                historical_comparison = f"Este múltiplo está en línea con su propia media histórica de {per_hist:.1f}x."
+                valoracion_oportunidades.append(base_text + historical_comparison)
+
+    if valoracion_oportunidades:
+        resumen_parts.append('<strong style="color: #28a745;">Oportunidades:</strong><ul><li>' + "</li><li>".join(valoracion_oportunidades) + '</li></ul>')
+    if valoracion_riesgos:
+        if valoracion_oportunidades:
+            resumen_parts.append('<br>')
+        resumen_parts.append('<strong style="color: #dc3545;">Riesgos:</strong><ul><li>' + "</li><li>".join(valoracion_riesgos) + '</li></ul>')
+    if not valoracion_oportunidades and not valoracion_riesgos:
+        resumen_parts.append('<p style="font-style: italic; color: #adb5bd;">La valoración actual no presenta oportunidades ni riesgos evidentes en comparación con su histórico y su sector. Se considera que cotiza a un precio justo.</p>')
+    
+    # --- 5. Análisis de Retorno al Accionista ---
+    resumen_parts.append(f"<h6>💸 Análisis de Retorno al Accionista</h6>")
+    dividendos_fortalezas = []
+    dividendos_debilidades = []
+
+    if yield_div is not None and yield_div > 0:
+        payout_label = "FFO" if datos.get('sector') == 'Real Estate' else "Beneficios"
+        if yield_div > 3.5 and payout < sector_bench['payout_bueno']:
+            dividendos_fortalezas.append(f"Ofrece un dividendo muy atractivo del {colorize(yield_div, 3.5, 2.0, is_percent=True)} que además parece muy seguro, con un Payout Ratio sobre {payout_label} del {colorize(payout, sector_bench['payout_bueno'], sector_bench['payout_aceptable'], lower_is_better=True, is_percent=True)}.")
+        elif payout > sector_bench['payout_aceptable']:
+            dividendos_debilidades.append(f"La sostenibilidad del dividendo es una preocupación. El Payout Ratio sobre {payout_label} es del {colorize(payout, sector_bench['payout_bueno'], sector_bench['payout_aceptable'], lower_is_better=True, is_percent=True)}, un nivel muy elevado que podría comprometer futuros pagos.")
+        elif deuda_ebitda is not None and deuda_ebitda > sector_bench['deuda_ebitda_aceptable']:
+            dividendos_debilidades.append(f"Aunque el Payout es aceptable, el alto nivel de deuda ({colorize(deuda_ebitda, sector_bench['deuda_ebitda_bueno'], sector_bench['deuda_ebitda_aceptable'], lower_is_better=True, is_ratio=True)}) podría presionar la capacidad de la empresa para mantener el dividendo a futuro.")
+
+    if net_buybacks is not None and net_buybacks > 1:
+        dividendos_fortalezas.append(f"Además del dividendo, la empresa está recomprando activamente sus propias acciones ({colorize(net_buybacks, 1, -1, is_percent=True)} en el último año), lo que aumenta el valor para el accionista.")
+
+    if dividendos_fortalezas:
+        resumen_parts.append('<strong style="color: #28a745;">Fortalezas:</strong><ul><li>' + "</li><li>".join(dividendos_fortalezas) + '</li></ul>')
+    if dividendos_debilidades:
+        if dividendos_fortalezas:
+            resumen_parts.append('<br>')
+        resumen_parts.append('<strong style="color: #dc3545;">Debilidades:</strong><ul><li>' + "</li><li>".join(dividendos_debilidades) + '</li></ul>')
+    if not dividendos_fortalezas and not dividendos_debilidades:
+        resumen_parts.append('<p style="font-style: italic; color: #adb5bd;">La política de retorno al accionista se encuentra en un rango normal, sin puntos especialmente destacables o preocupantes.</p>')
+
+    # --- 6. Perfil de Inversor ---
+    resumen_parts.append("<h6>👤 Perfil Ideal de Inversor</h6>")
+    perfil_text = ""
+    if calidad_score >= 7 and dividendos_score >= 7:
+        perfil_text = "<strong>Inversor en Dividendos (DGI):</strong> Busca empresas de alta calidad que ofrezcan una renta estable y creciente. La combinación de un negocio sólido y un dividendo fiable es su principal atractivo."
+    elif calidad_score >= 7 and valoracion_score < 5:
+        perfil_text = "<strong>Inversor en Crecimiento a un Precio Razonable (GARP):</strong> Dispuesto a pagar un precio justo o ligeramente alto por un negocio de calidad superior con altas expectativas de futuro, esperando que el crecimiento compuesto justifique la valoración."
+    elif calidad_score < 5 and valoracion_score >= 7:
+        perfil_text = "<strong>Inversor de Valor Profundo (Deep Value):</strong> Busca activos infravalorados que el mercado ha castigado, asumiendo un riesgo mayor a cambio de un potencial de revalorización significativo si la empresa logra dar un giro a su situación."
+    else:
+        perfil_text = "<strong>Inversor Mixto (Blend):</strong> Busca un equilibrio entre calidad, crecimiento y un precio razonable. Esta empresa encaja en una cartera diversificada como un activo que no destaca excesivamente en ningún área pero que es competente en todas."
+    resumen_parts.append(f'<p style="font-style: italic;">{perfil_text}</p>')
+
+    return "".join(resumen_parts)
@@ -0,0 +1,428 @@
+import numpy as np
+
+# --- Benchmarks Centralizados y Completos para los 11 Sectores GICS ---
+SECTOR_BENCHMARKS = {
+    'Information Technology': {'roe_excelente': 25, 'roe_bueno': 18, 'roic_excelente': 20, 'roic_bueno': 15, 'margen_excelente': 25, 'margen_bueno': 18, 'margen_neto_excelente': 20, 'margen_neto_bueno': 15, 'bpa_growth_excelente': 15, 'bpa_growth_bueno': 10, 'fcf_growth_excelente': 15, 'fcf_growth_bueno': 10, 'per_barato': 25, 'per_justo': 35, 'pb_barato': 4, 'pb_justo': 8, 'payout_bueno': 60, 'payout_aceptable': 80, 'deuda_ebitda_bueno': 2, 'deuda_ebitda_aceptable': 3, 'int_coverage_excelente': 10, 'int_coverage_bueno': 5},
+    'Health Care': {'roe_excelente': 20, 'roe_bueno': 15, 'roic_excelente': 15, 'roic_bueno': 12, 'margen_excelente': 20, 'margen_bueno': 15, 'margen_neto_excelente': 15, 'margen_neto_bueno': 10, 'bpa_growth_excelente': 12, 'bpa_growth_bueno': 7, 'fcf_growth_excelente': 10, 'fcf_growth_bueno': 6, 'per_barato': 20, 'per_justo': 30, 'pb_barato': 3, 'pb_justo': 5, 'payout_bueno': 60, 'payout_aceptable': 80, 'deuda_ebitda_bueno': 3, 'deuda_ebitda_aceptable': 4, 'int_coverage_excelente': 8, 'int_coverage_bueno': 4},
+    'Financials': {'roe_excelente': 12, 'roe_bueno': 10, 'roic_excelente': 8, 'roic_bueno': 5, 'margen_excelente': 15, 'margen_bueno': 10, 'margen_neto_excelente': 10, 'margen_neto_bueno': 8, 'bpa_growth_excelente': 10, 'bpa_growth_bueno': 5, 'fcf_growth_excelente': 8, 'fcf_growth_bueno': 4, 'per_barato': 12, 'per_justo': 18, 'pb_barato': 1, 'pb_justo': 1.5, 'payout_bueno': 70, 'payout_aceptable': 90, 'deuda_ebitda_bueno': 1, 'deuda_ebitda_aceptable': 2, 'int_coverage_excelente': 5, 'int_coverage_bueno': 3},
+    'Financial Services': {'roe_excelente': 12, 'roe_bueno': 10, 'roic_excelente': 8, 'roic_bueno': 5, 'margen_excelente': 15, 'margen_bueno': 10, 'margen_neto_excelente': 10, 'margen_neto_bueno': 8, 'bpa_growth_excelente': 10, 'bpa_growth_bueno': 5, 'fcf_growth_excelente': 8, 'fcf_growth_bueno': 4, 'per_barato': 12, 'per_justo': 18, 'pb_barato': 1, 'pb_justo': 1.5, 'payout_bueno': 70, 'payout_aceptable': 90, 'deuda_ebitda_bueno': 1, 'deuda_ebitda_aceptable': 2, 'int_coverage_excelente': 5, 'int_coverage_bueno': 3},
+    'Industrials': {'roe_excelente': 18, 'roe_bueno': 14, 'roic_excelente': 12, 'roic_bueno': 9, 'margen_excelente': 15, 'margen_bueno': 10, 'margen_neto_excelente': 8, 'margen_neto_bueno': 6, 'bpa_growth_excelente': 10, 'bpa_growth_bueno': 6, 'fcf_growth_excelente': 10, 'fcf_growth_bueno': 5, 'per_barato': 20, 'per_justo': 25, 'pb_barato': 2.5, 'pb_justo': 4, 'payout_bueno': 60, 'payout_aceptable': 80, 'deuda_ebitda_bueno': 2.5, 'deuda_ebitda_aceptable': 4, 'int_coverage_excelente': 7, 'int_coverage_bueno': 4},
+    'Utilities': {'roe_excelente': 10, 'roe_bueno': 8, 'roic_excelente': 8, 'roic_bueno': 5, 'margen_excelente': 15, 'margen_bueno': 12, 'margen_neto_excelente': 8, 'margen_neto_bueno': 5, 'bpa_growth_excelente': 6, 'bpa_growth_bueno': 3, 'fcf_growth_excelente': 5, 'fcf_growth_bueno': 3, 'per_barato': 18, 'per_justo': 22, 'pb_barato': 1.5, 'pb_justo': 2, 'payout_bueno': 80, 'payout_aceptable': 95, 'deuda_ebitda_bueno': 4, 'deuda_ebitda_aceptable': 5.5, 'int_coverage_excelente': 4, 'int_coverage_bueno': 2.5},
+    'Consumer Discretionary': {'roe_excelente': 18, 'roe_bueno': 14, 'roic_excelente': 15, 'roic_bueno': 12, 'margen_excelente': 12, 'margen_bueno': 8, 'margen_neto_excelente': 7, 'margen_neto_bueno': 5, 'bpa_growth_excelente': 12, 'bpa_growth_bueno': 7, 'fcf_growth_excelente': 12, 'fcf_growth_bueno': 7, 'per_barato': 20, 'per_justo': 28, 'pb_barato': 3, 'pb_justo': 5, 'payout_bueno': 60, 'payout_aceptable': 80, 'deuda_ebitda_bueno': 3, 'deuda_ebitda_aceptable': 4.5, 'int_coverage_excelente': 6, 'int_coverage_bueno': 3.5},
+    'Consumer Staples': {'roe_excelente': 20, 'roe_bueno': 15, 'roic_excelente': 15, 'roic_bueno': 12, 'margen_excelente': 15, 'margen_bueno': 10, 'margen_neto_excelente': 8, 'margen_neto_bueno': 5, 'bpa_growth_excelente': 8, 'bpa_growth_bueno': 5, 'fcf_growth_excelente': 7, 'fcf_growth_bueno': 4, 'per_barato': 20, 'per_justo': 25, 'pb_barato': 4, 'pb_justo': 6, 'payout_bueno': 70, 'payout_aceptable': 85, 'deuda_ebitda_bueno': 3, 'deuda_ebitda_aceptable': 4.5, 'int_coverage_excelente': 7, 'int_coverage_bueno': 4},
+    'Energy': {'roe_excelente': 15, 'roe_bueno': 10, 'roic_excelente': 10, 'roic_bueno': 7, 'margen_excelente': 10, 'margen_bueno': 7, 'margen_neto_excelente': 8, 'margen_neto_bueno': 5, 'bpa_growth_excelente': 8, 'bpa_growth_bueno': 0, 'fcf_growth_excelente': 8, 'fcf_growth_bueno': 0, 'per_barato': 15, 'per_justo': 20, 'pb_barato': 1.5, 'pb_justo': 2.5, 'payout_bueno': 60, 'payout_aceptable': 80, 'deuda_ebitda_bueno': 2, 'deuda_ebitda_aceptable': 3, 'int_coverage_excelente': 8, 'int_coverage_bueno': 5},
+    'Materials': {'roe_excelente': 15, 'roe_bueno': 12, 'roic_excelente': 12, 'roic_bueno': 9, 'margen_excelente': 12, 'margen_bueno': 8, 'margen_neto_excelente': 7, 'margen_neto_bueno': 5, 'bpa_growth_excelente': 10, 'bpa_growth_bueno': 5, 'fcf_growth_excelente': 10, 'fcf_growth_bueno': 5, 'per_barato': 18, 'per_justo': 25, 'pb_barato': 2, 'pb_justo': 3, 'payout_bueno': 60, 'payout_aceptable': 80, 'deuda_ebitda_bueno': 2.5, 'deuda_ebitda_aceptable': 4, 'int_coverage_excelente': 6, 'int_coverage_bueno': 3.5},
+    'Real Estate': {'roe_excelente': 8, 'roe_bueno': 6, 'roic_excelente': 6, 'roic_bueno': 4, 'margen_excelente': 20, 'margen_bueno': 15, 'margen_neto_excelente': 15, 'margen_neto_bueno': 10, 'bpa_growth_excelente': 8, 'bpa_growth_bueno': 4, 'fcf_growth_excelente': 8, 'fcf_growth_bueno': 4, 'per_barato': 25, 'per_justo': 35, 'pb_barato': 2, 'pb_justo': 3, 'payout_bueno': 85, 'payout_aceptable': 95, 'deuda_ebitda_bueno': 5, 'deuda_ebitda_aceptable': 7, 'int_coverage_excelente': 3, 'int_coverage_bueno': 2},
+    'Communication Services': {'roe_excelente': 15, 'roe_bueno': 12, 'roic_excelente': 15, 'roic_bueno': 12, 'margen_excelente': 18, 'margen_bueno': 12, 'margen_neto_excelente': 12, 'margen_neto_bueno': 9, 'bpa_growth_excelente': 12, 'bpa_growth_bueno': 7, 'fcf_growth_excelente': 12, 'fcf_growth_bueno': 7, 'per_barato': 22, 'per_justo': 30, 'pb_barato': 3, 'pb_justo': 5, 'payout_bueno': 60, 'payout_aceptable': 80, 'deuda_ebitda_bueno': 3, 'deuda_ebitda_aceptable': 4.5, 'int_coverage_excelente': 6, 'int_coverage_bueno': 3.5},
+    'Default': {'roe_excelente': 15, 'roe_bueno': 12, 'roic_excelente': 12, 'roic_bueno': 9, 'margen_excelente': 15, 'margen_bueno': 10, 'margen_neto_excelente': 8, 'margen_neto_bueno': 5, 'bpa_growth_excelente': 10, 'bpa_growth_bueno': 5, 'fcf_growth_excelente': 10, 'fcf_growth_bueno': 5, 'per_barato': 20, 'per_justo': 25, 'pb_barato': 2, 'pb_justo': 4, 'payout_bueno': 60, 'payout_aceptable': 80, 'deuda_ebitda_bueno': 3, 'deuda_ebitda_aceptable': 5, 'int_coverage_excelente': 5, 'int_coverage_bueno': 3}
+}
+
+# --- Clasificación Geopolítica ---
+PAISES_SEGUROS = ['United States', 'Canada', 'Germany', 'Switzerland', 'Netherlands', 'United Kingdom', 'France', 'Denmark', 'Sweden', 'Norway', 'Finland', 'Australia', 'New Zealand', 'Japan', 'Ireland', 'Austria', 'Belgium', 'Luxembourg', 'Singapore']
+PAISES_PRECAUCION = ['Spain', 'Italy', 'South Korea', 'Taiwan', 'India', 'Chile', 'Poland', 'Czech Republic', 'Portugal', 'Israel', 'United Arab Emirates', 'Qatar', 'Malaysia', 'Thailand', 'Saudi Arabia', 'Kuwait', 'Hong Kong']
+PAISES_ALTO_RIESGO = ['China', 'Brazil', 'Russia', 'Argentina', 'Turkey', 'Mexico', 'South Africa', 'Indonesia', 'Vietnam', 'Nigeria', 'Egypt', 'Pakistan', 'Colombia', 'Peru', 'Philippines']
+
+SECTORES_PB_RELEVANTES = ['Financials', 'Industrials', 'Materials', 'Energy', 'Utilities', 'Real Estate']
+
+# --- Ponderación de la Nota Final ---
+PESOS = {'calidad': 0.4, 'valoracion': 0.3, 'salud': 0.2, 'dividendos': 0.1}
+# Puntos que se restan a la nota final según la jurisdicción (las seguras no penalizan).
+PENALIZACIONES_GEO = {'precaucion': 1.5, 'alto_riesgo': 3.0, 'no_clasificado': 2.0}
+# Cortes del veredicto: ALTA CALIDAD desde 6, EXCEPCIONAL desde 7.5.
+UMBRALES_VEREDICTO = [6.0, 7.5]
+
+# --- PUNTUACIÓN INDIVIDUAL ---
+def _puntuar_geopolitico(pais, puntuaciones, justificaciones):
+    nota_geo, justificacion_geo, penalizador_geo = 10, "Jurisdicción estable y predecible.", 0
+    if pais in PAISES_PRECAUCION: nota_geo, justificacion_geo, penalizador_geo = 6, "PRECAUCIÓN: Jurisdicción con cierta volatilidad.", PENALIZACIONES_GEO['precaucion']
+    elif pais in PAISES_ALTO_RIESGO: nota_geo, justificacion_geo, penalizador_geo = 2, "ALTO RIESGO: Jurisdicción con alta inestabilidad.", PENALIZACIONES_GEO['alto_riesgo']
+    elif pais not in PAISES_SEGUROS and pais != 'N/A': nota_geo, justificacion_geo, penalizador_geo = 5, "PRECAUCIÓN: Jurisdicción no clasificada.", PENALIZACIONES_GEO['no_clasificado']
+    puntuaciones['geopolitico'], justificaciones['geopolitico'], puntuaciones['penalizador_geo'] = nota_geo, justificacion_geo, penalizador_geo
+
+def _puntuar_calidad(datos, hist_data, sector_bench, puntuaciones, justificaciones):
+    puntos_obtenidos_calidad, puntos_posibles_calidad = 0, 0
+    
+    if datos.get('roe') is not None:
+        puntos_posibles_calidad += 2.5
+        if datos['roe'] > sector_bench['roe_excelente']: puntos_obtenidos_calidad += 2.5
+        elif datos['roe'] > sector_bench['roe_bueno']: puntos_obtenidos_calidad += 1.5
+
+    if datos.get('roic') is not None:
+        puntos_posibles_calidad += 2.5
+        if datos['roic'] > sector_bench['roic_excelente']: puntos_obtenidos_calidad += 2.5
+        elif datos['roic'] > sector_bench['roic_bueno']: puntos_obtenidos_calidad += 1.5
+
+    if datos.get('margen_operativo') is not None:
+        puntos_posibles_calidad += 2.5
+        if datos['margen_operativo'] > sector_bench['margen_excelente']: puntos_obtenidos_calidad += 2.5
+        elif datos['margen_operativo'] > sector_bench['margen_bueno']: puntos_obtenidos_calidad += 1.5
+
+    if datos.get('margen_beneficio') is not None:
+        puntos_posibles_calidad += 2
+        if datos['margen_beneficio'] > sector_bench.get('margen_neto_excelente', 8): puntos_obtenidos_calidad += 2
+        elif datos['margen_beneficio'] > sector_bench.get('margen_neto_bueno', 5): puntos_obtenidos_calidad += 1
+
+    bpa_cagr = hist_data.get('bpa_cagr')
+    if bpa_cagr is not None and not np.isnan(bpa_cagr):
+        puntos_posibles_calidad += 2
+        if bpa_cagr > sector_bench['bpa_growth_excelente']: puntos_obtenidos_calidad += 2
+        elif bpa_cagr > sector_bench['bpa_growth_bueno']: puntos_obtenidos_calidad += 1
+    
+    bpa_yoy = datos.get('bpa_growth_yoy')
+    if bpa_yoy is not None:
+        puntos_posibles_calidad += 1
+        if bpa_yoy * 100 > sector_bench['bpa_growth_excelente']: puntos_obtenidos_calidad += 1
+    
+    puntuaciones['calidad'] = (puntos_obtenidos_calidad / puntos_posibles_calidad) * 10 if puntos_posibles_calidad > 0 else 0
+    justificaciones['calidad'] = "Rentabilidad, márgenes y crecimiento de élite." if puntuaciones['calidad'] >= 8 else "Negocio de buena calidad."
+
+def _puntuar_salud(datos, hist_data, sector_bench, puntuaciones, justificaciones):
+    puntos_obtenidos_salud, puntos_posibles_salud = 0, 0
+    
+    if datos['sector'] != 'Financials' and datos.get('deuda_ebitda') is not None and not np.isnan(datos.get('deuda_ebitda')):
+        puntos_posibles_salud += 2.5
+        deuda_ebitda = datos.get('deuda_ebitda')
+        if deuda_ebitda < 0: puntos_obtenidos_salud += 2.5
+        elif deuda_ebitda < sector_bench['deuda_ebitda_bueno']: puntos_obtenidos_salud += 2.5
+        elif deuda_ebitda < sector_bench['deuda_ebitda_aceptable']: puntos_obtenidos_salud += 1.5
+
+    if datos.get('interest_coverage') is not None:
+        puntos_posibles_salud += 2.5
+        interest_coverage = datos.get('interest_coverage')
+        if interest_coverage > sector_bench['int_coverage_excelente']: puntos_obtenidos_salud += 2.5
+        elif interest_coverage > sector_bench['int_coverage_bueno']: puntos_obtenidos_salud += 1.5
+        
+    if datos.get('ratio_corriente') is not None:
+        puntos_posibles_salud += 2.5
+        if datos.get('ratio_corriente') > 1.5: puntos_obtenidos_salud += 2.5
+        
+    cagr_fcf = hist_data.get('cagr_fcf')
+    if cagr_fcf is not None and not np.isnan(cagr_fcf):
+        puntos_posibles_salud += 2
+        if cagr_fcf > sector_bench['fcf_growth_excelente']: puntos_obtenidos_salud += 2
+        elif cagr_fcf > sector_bench['fcf_growth_bueno']: puntos_obtenidos_salud += 1
+
+    nota_salud_base = (puntos_obtenidos_salud / puntos_posibles_salud) * 10 if puntos_posibles_salud > 0 else 0
+    
+    if datos.get('raw_fcf') is not None and datos.get('raw_fcf') < 0:
+        nota_salud_base -= 4
+
+    puntuaciones['salud'] = max(0, nota_salud_base)
+    justificaciones['salud'] = "Balance muy sólido y solvente." if puntuaciones['salud'] >= 8 else "Salud financiera aceptable."
+
+def _puntuar_valoracion(datos, hist_data, sector_bench, puntuaciones, justificaciones):
+    sector = datos['sector']
+    puntos_obtenidos_multiplos, puntos_posibles_multiplos = 0, 0
+
+    if sector == 'Real Estate':
+        if datos.get('p_fcf') is not None and datos.get('p_fcf') > 0:
+            puntos_posibles_multiplos += 8
+            if datos['p_fcf'] < 16: puntos_obtenidos_multiplos += 8
+            elif datos['p_fcf'] < 22: puntos_obtenidos_multiplos += 5
+    else:
+        if datos.get('per') is not None and datos.get('per') > 0:
+            puntos_posibles_multiplos += 4
+            if datos['per'] < sector_bench['per_barato']: puntos_obtenidos_multiplos += 4
+            elif datos['per'] < sector_bench['per_justo']: puntos_obtenidos_multiplos += 2
+        
+        if datos.get('p_fcf') is not None and datos.get('p_fcf') > 0:
+            puntos_posibles_multiplos += 4
+            if datos['p_fcf'] < 20: puntos_obtenidos_multiplos += 4
+            elif datos['p_fcf'] < 30: puntos_obtenidos_multiplos += 2
+
+    if sector in SECTORES_PB_RELEVANTES and datos.get('p_b') is not None and datos.get('p_b') > 0:
+        puntos_posibles_multiplos += 2
+        if datos['p_b'] < sector_bench['pb_barato']: puntos_obtenidos_multiplos += 2
+    
+    nota_multiplos = (puntos_obtenidos_multiplos / puntos_posibles_multiplos) * 10 if puntos_posibles_multiplos > 0 else 0
+
+    nota_analistas, margen_seguridad = 0, 0
+    if datos.get('precio_actual') is not None and datos.get('precio_objetivo') is not None:
+        margen_seguridad = ((datos['precio_objetivo'] - datos['precio_actual']) / datos['precio_actual']) * 100
+        if margen_seguridad > 25: nota_analistas = 10
+        elif margen_seguridad > 15: nota_analistas = 8
+        elif margen_seguridad > 5: nota_analistas = 5
+    puntuaciones['margen_seguridad_analistas'] = margen_seguridad
+
+    potencial_per, potencial_yield = 0, 0
+    per_historico = hist_data.get('per_hist')
+    if per_historico is not None and datos.get('per') is not None and datos['per'] > 0 and per_historico > 0:
+        potencial_per = ((per_historico / datos['per']) - 1) * 100
+    puntuaciones['margen_seguridad_per'] = potencial_per
+
+    yield_historico = hist_data.get('yield_hist')
+    if yield_historico is not None and datos.get('yield_dividendo') is not None and datos['yield_dividendo'] > 0 and yield_historico > 0:
+        potencial_yield = ((datos['yield_dividendo'] - yield_historico) / yield_historico) * 100
+    else:
+        potencial_yield = None
+    puntuaciones['margen_seguridad_yield'] = potencial_yield
+    
+    nota_historica = 0
+    if potencial_per > 15: nota_historica += 5
+    if potencial_yield is not None and potencial_yield > 15: nota_historica += 5
+    nota_historica = min(10, nota_historica)
+
+    nota_valoracion_base = (nota_multiplos * 0.4) + (nota_analistas * 0.3) + (nota_historica * 0.3)
+    
+    per_actual = datos.get('per')
+    per_adelantado = datos.get('per_adelantado')
+    if per_actual is not None and per_adelantado is not None and per_actual > 0 and per_adelantado > 0:
+        if per_adelantado < per_actual * 0.9: nota_valoracion_base += 1
+        elif per_adelantado > per_actual: nota_valoracion_base -= 1
+
+    if puntuaciones['calidad'] < 3: nota_valoracion_base *= 0.5
+    elif puntuaciones['calidad'] < 5: nota_valoracion_base *= 0.75
+
+    puntuaciones['valoracion'] = max(0, min(10, nota_valoracion_base))
+    if puntuaciones['valoracion'] >= 8: justificaciones['valoracion'] = "Valoración muy atractiva."
+    else: justificaciones['valoracion'] = "Valoración razonable o exigente."
+
+def _puntuar_dividendos(datos, hist_data, sector_bench, puntuaciones, justificaciones):
+    yield_historico = hist_data.get('yield_hist')
+    puntos_obtenidos_dividendos, puntos_posibles_dividendos = 0, 0
+    
+    if datos.get('yield_dividendo') is not None and datos.get('yield_dividendo') > 0:
+        puntos_posibles_dividendos += 5
+        if datos['yield_dividendo'] > 3.5: puntos_obtenidos_dividendos += 5
+        elif datos['yield_dividendo'] > 2: puntos_obtenidos_dividendos += 3
+    
+    if datos.get('payout_ratio') is not None and datos.get('payout_ratio') > 0:
+        puntos_posibles_dividendos += 5
+        if datos['payout_ratio'] < sector_bench['payout_bueno']: puntos_obtenidos_dividendos += 5
+        elif datos['payout_ratio'] < sector_bench['payout_aceptable']: puntos_obtenidos_dividendos += 3
+
+    if datos.get('net_buybacks_pct') is not None:
+        puntos_posibles_dividendos += 2
+        if datos['net_buybacks_pct'] > 1: puntos_obtenidos_dividendos += 2
+        elif datos['net_buybacks_pct'] < -1: puntos_obtenidos_dividendos += 0
+    
+    nota_dividendos = (puntos_obtenidos_dividendos / puntos_posibles_dividendos) * 10 if puntos_posibles_dividendos > 0 else 0
+    
+    if yield_historico is not None and datos.get('yield_dividendo') is not None and datos.get('yield_dividendo') < yield_historico:
+        nota_dividendos -= 2
+
+    puntuaciones['dividendos'] = max(0, nota_dividendos)
+    justificaciones['dividendos'] = "Dividendo excelente y sostenible." if puntuaciones['dividendos'] >= 8 else "Dividendo sólido."
+
+def _puntuar_peg(datos, puntuaciones):
+    per = datos.get('per')
+    crecimiento_yoy = datos.get('bpa_growth_yoy')
+    puntuaciones['peg_lynch'] = None
+    if per is not None and per > 0 and crecimiento_yoy is not None and crecimiento_yoy > 0:
+        puntuaciones['peg_lynch'] = per / (crecimiento_yoy * 100)
+
+def calcular_puntuaciones_y_justificaciones(datos, hist_data):
+    puntuaciones, justificaciones = {}, {}
+    sector, pais = datos['sector'], datos['pais']
+    sector_bench = SECTOR_BENCHMARKS.get(sector, SECTOR_BENCHMARKS['Default'])
+
+    _puntuar_geopolitico(pais, puntuaciones, justificaciones)
+
+    # --- NUEVO: Lógica de Puntuación Proporcional ---
+    _puntuar_calidad(datos, hist_data, sector_bench, puntuaciones, justificaciones)
+    _puntuar_salud(datos, hist_data, sector_bench, puntuaciones, justificaciones)
+    _puntuar_valoracion(datos, hist_data, sector_bench, puntuaciones, justificaciones)
+    _puntuar_dividendos(datos, hist_data, sector_bench, puntuaciones, justificaciones)
+    _puntuar_peg(datos, puntuaciones)
+
+    return puntuaciones, justificaciones, SECTOR_BENCHMARKS
+
+def recalcular_por_precio(datos, hist_data, puntuaciones, justificaciones):
+    """
+    Capa de precio: vuelve a puntuar solo los bloques que dependen de `precio_actual`
+    (valoración, dividendos y PEG), reutilizando calidad, salud y geopolítico.
+    `datos` debe venir ya revalorizado con adquisicion.aplicar_precio.
+    """
+    puntuaciones, justificaciones = dict(puntuaciones), dict(justificaciones)
+    sector_bench = SECTOR_BENCHMARKS.get(datos['sector'], SECTOR_BENCHMARKS['Default'])
+    _puntuar_valoracion(datos, hist_data, sector_bench, puntuaciones, justificaciones)
+    _puntuar_dividendos(datos, hist_data, sector_bench, puntuaciones, justificaciones)
+    _puntuar_peg(datos, puntuaciones)
+    return puntuaciones, justificaciones
+
+def calcular_nota_final(puntuaciones, pesos=PESOS):
+    nota_ponderada = (puntuaciones.get('calidad', 0) * pesos['calidad'] +
+                      puntuaciones.get('valoracion', 0) * pesos['valoracion'] +
+                      puntuaciones.get('salud', 0) * pesos['salud'] +
+                      puntuaciones.get('dividendos', 0) * pesos['dividendos'])
+    return max(0, nota_ponderada - puntuaciones['penalizador_geo'])
+
+# --- BANDERAS DE ALERTA ---
+def analizar_banderas_rojas(datos, financials):
+    """(banderas, avisos): las banderas son alertas rojas; los avisos, matices en amarillo que no cuentan como bandera."""
+    banderas, avisos = [], []
+    payout_ratio = datos.get('payout_ratio')
+    payout_fcf_ratio = datos.get('payout_fcf_ratio')
+    
+    if datos.get('sector') != 'Real Estate' and payout_ratio is not None and payout_ratio > 100:
+        if payout_fcf_ratio is not None and payout_fcf_ratio < 90:
+            avisos.append(f"🟡 **Payout Elevado pero Sostenible por FCF:** El Payout sobre beneficios es del {payout_ratio:.0f}%, pero el Payout sobre Flujo de Caja Libre es de solo un {payout_fcf_ratio:.0f}%. El dividendo parece cubierto por la caja real.")
+        else:
+            banderas.append("🔴 **Payout Peligroso:** El ratio de reparto es superior al 100% y no está cubierto por el FCF. El dividendo podría no ser sostenible.")
+
+    if financials is not None and not financials.empty:
+        if 'Operating Margin' in financials.columns and len(financials) >= 3 and (financials['Operating Margin'].iloc[-3:].diff().iloc[1:] < 0).all():
+            banderas.append("🔴 **Márgenes Decrecientes:** Los márgenes de beneficio llevan 3 años seguidos bajando.")
+        if 'Total Debt' in financials.columns and len(financials) >= 3 and financials['Total Debt'].iloc[-1] > financials['Total Debt'].iloc[-3] * 1.5:
+            banderas.append("🔴 **Deuda Creciente:** La deuda total ha aumentado significativamente.")
+    if datos.get('raw_fcf') is not None and datos.get('raw_fcf') < 0:
+        banderas.append("🔴 **Flujo de Caja Libre Negativo:** La empresa está quemando más dinero del que genera.")
+    if datos.get('interest_coverage') is not None and datos.get('interest_coverage') < 2:
+        banderas.append("🔴 **Cobertura de Intereses Baja:** El beneficio operativo apenas cubre el pago de intereses.")
+    if datos.get('ratio_corriente') is not None and datos.get('ratio_corriente') < 1.0:
+        banderas.append("🔴 **Ratio Corriente (Liquidez) Baja:** Podría tener problemas para cubrir obligaciones a corto plazo.")
+    if datos.get('market_cap') is not None and datos.get('market_cap') < 250000000:
+        banderas.append("🔴 **Baja Capitalización de Mercado:** Inferior a $250M, puede implicar mayor volatilidad.")
+    if datos.get('roic') is not None and datos.get('roe') is not None and datos.get('roic') > datos.get('roe'):
+        avisos.append("🟡 **Apalancamiento Negativo:** El ROIC es superior al ROE. Esto sugiere que el coste de la deuda podría ser mayor que la rentabilidad que genera, destruyendo valor para el accionista.")
+    avisos.extend(datos.get('avisos_divisas') or [])
+    return banderas, avisos
+
+# --- PUNTUACIÓN VECTORIZADA (UNIVERSO COMPLETO) ---
+# Réplica exacta de calcular_puntuaciones_y_justificaciones sobre columnas NumPy.
+# Un NaN equivale a un dato ausente (None) en la versión escalar.
+
+def _columna(columnas, campo, n):
+    valores = columnas.get(campo)
+    if valores is None:
+        return np.full(n, np.nan)
+    return np.asarray(valores, dtype=float)
+
+def _tabla_benchmarks(sectores):
+    claves = SECTOR_BENCHMARKS['Default'].keys()
+    benchs = [SECTOR_BENCHMARKS.get(s, SECTOR_BENCHMARKS['Default']) for s in sectores]
+    return {clave: np.array([b[clave] for b in benchs], dtype=float) for clave in claves}
+
+def _proporcion(obtenidos, posibles):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(posibles > 0, obtenidos / posibles * 10, 0.0)
+
+def clasificar_paises(paises):
+    """{clase de PENALIZACIONES_GEO: máscara booleana}, con la misma precedencia que _puntuar_geopolitico."""
+    paises = np.asarray(paises, dtype=object)
+    precaucion = np.isin(paises, PAISES_PRECAUCION)
+    alto_riesgo = np.isin(paises, PAISES_ALTO_RIESGO) & ~precaucion
+    no_clasificado = ~np.isin(paises, PAISES_SEGUROS) & (paises != 'N/A') & ~precaucion & ~alto_riesgo
+    return {'precaucion': precaucion, 'alto_riesgo': alto_riesgo, 'no_clasificado': no_clasificado}
+
+def calcular_puntuaciones_vectorizado(columnas, sectores, paises, pesos=PESOS):
+    """
+    Puntúa N empresas a la vez. `columnas` mapea cada campo de datos/hist_data
+    a un array de longitud N; devuelve un dict de arrays con las mismas claves
+    que `puntuaciones` más 'nota_final'.
+    """
+    sectores = np.asarray(sectores, dtype=object)
+    paises = np.asarray(paises, dtype=object)
+    n = len(sectores)
+    col = lambda campo: _columna(columnas, campo, n)
+    b = _tabla_benchmarks(sectores)
+    res = {}
+
+    # Geopolítico
+    clases = clasificar_paises(paises)
+    mascaras = [clases['precaucion'], clases['alto_riesgo'], clases['no_clasificado']]
+    res['geopolitico'] = np.select(mascaras, [6.0, 2.0, 5.0], 10.0)
+    res['penalizador_geo'] = np.select(mascaras, [PENALIZACIONES_GEO[c] for c in ('precaucion', 'alto_riesgo', 'no_clasificado')], 0.0)
+
+    # 1. Calidad
+    obtenidos, posibles = np.zeros(n), np.zeros(n)
+    for campo, exc, bueno, pts_exc, pts_bueno in [
+        ('roe', 'roe_excelente', 'roe_bueno', 2.5, 1.5),
+        ('roic', 'roic_excelente', 'roic_bueno', 2.5, 1.5),
+        ('margen_operativo', 'margen_excelente', 'margen_bueno', 2.5, 1.5),
+        ('margen_beneficio', 'margen_neto_excelente', 'margen_neto_bueno', 2, 1),
+        ('bpa_cagr', 'bpa_growth_excelente', 'bpa_growth_bueno', 2, 1),
+    ]:
+        v = col(campo)
+        presente = ~np.isnan(v)
+        posibles += np.where(presente, pts_exc, 0)
+        obtenidos += np.select([presente & (v > b[exc]), presente & (v > b[bueno])], [pts_exc, pts_bueno], 0)
+    bpa_yoy = col('bpa_growth_yoy')
+    posibles += np.where(~np.isnan(bpa_yoy), 1, 0)
+    obtenidos += np.where(bpa_yoy * 100 > b['bpa_growth_excelente'], 1, 0)
+    calidad = _proporcion(obtenidos, posibles)
+    res['calidad'] = calidad
+
+    # 2. Salud Financiera
+    obtenidos, posibles = np.zeros(n), np.zeros(n)
+    deuda_ebitda = col('deuda_ebitda')
+    aplica_deuda = (sectores != 'Financials') & ~np.isnan(deuda_ebitda)
+    posibles += np.where(aplica_deuda, 2.5, 0)
+    obtenidos += np.select([aplica_deuda & (deuda_ebitda < b['deuda_ebitda_bueno']), aplica_deuda & (deuda_ebitda < b['deuda_ebitda_aceptable'])], [2.5, 1.5], 0)
+    cobertura = col('interest_coverage')
+    posibles += np.where(~np.isnan(cobertura), 2.5, 0)
+    obtenidos += np.select([cobertura > b['int_coverage_excelente'], cobertura > b['int_coverage_bueno']], [2.5, 1.5], 0)
+    ratio_corriente = col('ratio_corriente')
+    posibles += np.where(~np.isnan(ratio_corriente), 2.5, 0)
+    obtenidos += np.where(ratio_corriente > 1.5, 2.5, 0)
+    cagr_fcf = col('cagr_fcf')
+    posibles += np.where(~np.isnan(cagr_fcf), 2, 0)
+    obtenidos += np.select([cagr_fcf > b['fcf_growth_excelente'], cagr_fcf > b['fcf_growth_bueno']], [2, 1], 0)
+    nota_salud = _proporcion(obtenidos, posibles) - np.where(col('raw_fcf') < 0, 4, 0)
+    res['salud'] = np.maximum(0, nota_salud)
+
+    # 3. Valoración
+    obtenidos, posibles = np.zeros(n), np.zeros(n)
+    reit = sectores == 'Real Estate'
+    per, p_fcf, p_b = col('per'), col('p_fcf'), col('p_b')
+    con_p_fcf = p_fcf > 0
+    posibles += np.where(reit & con_p_fcf, 8, 0)
+    obtenidos += np.select([reit & (p_fcf > 0) & (p_fcf < 16), reit & (p_fcf > 0) & (p_fcf < 22)], [8, 5], 0)
+    con_per = ~reit & (per > 0)
+    posibles += np.where(con_per, 4, 0)
+    obtenidos += np.select([con_per & (per < b['per_barato']), con_per & (per < b['per_justo'])], [4, 2], 0)
+    no_reit_p_fcf = ~reit & con_p_fcf
+    posibles += np.where(no_reit_p_fcf, 4, 0)
+    obtenidos += np.select([no_reit_p_fcf & (p_fcf < 20), no_reit_p_fcf & (p_fcf < 30)], [4, 2], 0)
+    con_pb = np.isin(sectores, SECTORES_PB_RELEVANTES) & (p_b > 0)
+    posibles += np.where(con_pb, 2, 0)
+    obtenidos += np.where(con_pb & (p_b < b['pb_barato']), 2, 0)
+    nota_multiplos = _proporcion(obtenidos, posibles)
+
+    precio, objetivo = col('precio_actual'), col('precio_objetivo')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margen_seguridad = np.where(~np.isnan(precio) & ~np.isnan(objetivo), (objetivo - precio) / precio * 100, 0.0)
+    nota_analistas = np.select([margen_seguridad > 25, margen_seguridad > 15, margen_seguridad > 5], [10, 8, 5], 0)
+    res['margen_seguridad_analistas'] = margen_seguridad
+
+    per_hist = col('per_hist')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        potencial_per = np.where((per_hist > 0) & (per > 0), (per_hist / per - 1) * 100, 0.0)
+    res['margen_seguridad_per'] = potencial_per
+
+    yield_div, yield_hist = col('yield_dividendo'), col('yield_hist')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        potencial_yield = np.where((yield_hist > 0) & (yield_div > 0), (yield_div - yield_hist) / yield_hist * 100, np.nan)
+    res['margen_seguridad_yield'] = potencial_yield
+
+    nota_historica = np.minimum(10, np.where(potencial_per > 15, 5, 0) + np.where(potencial_yield > 15, 5, 0))
+    nota_valoracion = nota_multiplos * 0.4 + nota_analistas * 0.3 + nota_historica * 0.3
+    per_adelantado = col('per_adelantado')
+    con_ambos = (per > 0) & (per_adelantado > 0)
+    nota_valoracion += np.select([con_ambos & (per_adelantado < per * 0.9), con_ambos & (per_adelantado > per)], [1, -1], 0)
+    nota_valoracion *= np.select([calidad < 3, calidad < 5], [0.5, 0.75], 1)
+    res['valoracion'] = np.clip(nota_valoracion, 0, 10)
+
+    # 4. Dividendos
+    obtenidos, posibles = np.zeros(n), np.zeros(n)
+    posibles += np.where(yield_div > 0, 5, 0)
+    obtenidos += np.select([yield_div > 3.5, yield_div > 2], [5, 3], 0)
+    payout = col('payout_ratio')
+    con_payout = payout > 0
+    posibles += np.where(con_payout, 5, 0)
+    obtenidos += np.select([con_payout & (payout < b['payout_bueno']), con_payout & (payout < b['payout_aceptable'])], [5, 3], 0)
+    recompras = col('net_buybacks_pct')
+    posibles += np.where(~np.isnan(recompras), 2, 0)
+    obtenidos += np.where(recompras > 1, 2, 0)
+    nota_dividendos = _proporcion(obtenidos, posibles) - np.where(yield_div < yield_hist, 2, 0)
+    res['dividendos'] = np.maximum(0, nota_dividendos)
+
+    # 5. PEG
+    bpa_yoy_pct = bpa_yoy * 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        res['peg_lynch'] = np.where((per > 0) & (bpa_yoy > 0), per / bpa_yoy_pct, np.nan)
+
+    nota_ponderada = (res['calidad'] * pesos['calidad'] + res['valoracion'] * pesos['valoracion'] +
+                      res['salud'] * pesos['salud'] + res['dividendos'] * pesos['dividendos'])
+    res['nota_final'] = np.maximum(0, nota_ponderada - res['penalizador_geo'])
+    return res
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# --- REJILLA DE RESULTADOS PAGINADA EN EL SERVIDOR ---
+# Un cribado puede devolver miles de filas. Al navegador solo se manda la página
+# visible; ordenar y filtrar se hace aquí sobre las columnas NumPy de
+# TablaPuntuaciones (solo se mueven posiciones, nunca filas). Los colores por
+# umbral sectorial se calculan una vez, vectorizados, para todo el resultado
+# (misma regla que mostrar_metrica_con_color) y cada página recorta su trozo.
+
+TAMANOS_PAGINA = [25, 50, 100, 250]
+
+VERDE, NARANJA, ROJO, SIN_COLOR = 1, 0, -1, 2
+ESTILOS = {VERDE: 'color: #28a745', NARANJA: 'color: #fd7e14', ROJO: 'color: #dc3545', SIN_COLOR: ''}
+
+# campo: (umbral bueno, umbral malo, menor es mejor). Un texto es una clave de SECTOR_BENCHMARKS.
+REGLAS_COLOR = {
+    'roe': ('roe_excelente', 'roe_bueno', False),
+    'roic': ('roic_excelente', 'roic_bueno', False),
+    'margen_operativo': ('margen_excelente', 'margen_bueno', False),
+    'margen_beneficio': ('margen_neto_excelente', 'margen_neto_bueno', False),
+    'bpa_cagr': ('bpa_growth_excelente', 'bpa_growth_bueno', False),
+    'cagr_fcf': ('fcf_growth_excelente', 'fcf_growth_bueno', False),
+    'deuda_ebitda': ('deuda_ebitda_bueno', 'deuda_ebitda_aceptable', True),
+    'interest_coverage': ('int_coverage_excelente', 'int_coverage_bueno', False),
+    'ratio_corriente': (1.5, 1.0, False),
+    'raw_fcf': (0, -1, False),
+    'per': ('per_barato', 'per_justo', True),
+    'p_fcf': (20, 30, True),
+    'p_b': ('pb_barato', 'pb_justo', True),
+    'yield_dividendo': (3.5, 2.0, False),
+    'payout_ratio': ('payout_bueno', 'payout_aceptable', True),
+    'calidad': (7.5, 5, False),
+    'valoracion': (7.5, 5, False),
+    'salud': (7.5, 5, False),
+    'dividendos': (7.5, 5, False),
+    'nota_final': (7.5, 6, False),
+}
+
+def _umbral(tabla, umbral, filas):
+    return tabla.benchmark(umbral)[filas] if isinstance(umbral, str) else umbral
+
+def mascara_colores(tabla, filas, campos):
+    """{campo: array int8 con VERDE/NARANJA/ROJO/SIN_COLOR} para las filas dadas, en una pasada por columna."""
+    mascara = {}
+    for campo in campos:
+        regla = REGLAS_COLOR.get(campo)
+        if regla is None:
+            continue
+        bueno, malo, menor_es_mejor = regla
+        valores = tabla.columna(campo)[filas]
+        bueno, malo = _umbral(tabla, bueno, filas), _umbral(tabla, malo, filas)
+        with np.errstate(invalid='ignore'):
+            if menor_es_mejor:
+                colores = np.select([valores < bueno, valores > malo], [VERDE, ROJO], NARANJA)
+            else:
+                colores = np.select([valores > bueno, valores < malo], [VERDE, ROJO], NARANJA)
+        mascara[campo] = np.where(np.isnan(valores), SIN_COLOR, colores).astype(np.int8)
+    return mascara
+
+class RejillaResultados:
+    def __init__(self, tabla, filas, columnas):
+        self.tabla = tabla
+        self.filas = np.asarray(filas, dtype=np.int64)
+        self.columnas = [c for c in columnas if c != 'ticker']
+        self._mascara = mascara_colores(tabla, self.filas, self.columnas)
+        # `_vista` son índices sobre self.filas: ordenar y filtrar solo reescribe este array.
+        self._vista = np.arange(len(self.filas))
+
+    def __len__(self):
+        return len(self._vista)
+
+    def ordenar(self, campo, descendente=False):
+        valores = self.tabla.columna(campo)[self.filas[self._vista]]
+        if valores.dtype == object:
+            claves = valores.astype(str)
+            orden = np.argsort(claves, kind='stable')
+            if descendente:
+                orden = orden[::-1]
+        else:
+            # Los NaN siempre al final, en ambos sentidos.
+            orden = np.argsort(-valores if descendente else valores, kind='stable')
+        self._vista = self._vista[orden]
+        return self
+
+    def filtrar(self, texto_ticker=None, sector=None):
+        vista = np.arange(len(self.filas))
+        if sector:
+            vista = vista[self.tabla.sectores[self.filas] == sector]
+        if texto_ticker:
+            tickers = self.tabla.tickers[self.filas[vista]].astype(str)
+            vista = vista[np.char.find(np.char.upper(tickers), texto_ticker.strip().upper()) >= 0]
+        self._vista = vista
+        return self
+
+    def n_paginas(self, tamano):
+        return max(1, int(np.ceil(len(self._vista) / tamano)))
+
+    def pagina(self, numero, tamano):
+        """(DataFrame de la página, DataFrame de estilos CSS alineado)."""
+        numero = min(max(1, numero), self.n_paginas(tamano))
+        trozo = self._vista[(numero - 1) * tamano:numero * tamano]
+        filas = self.filas[trozo]
+        indice = pd.Index(self.tabla.tickers[filas], name='ticker')
+        datos = pd.DataFrame({c: self.tabla.columna(c)[filas] for c in self.columnas}, index=indice)
+        estilos = pd.DataFrame({c: [ESTILOS[v] for v in self._mascara[c][trozo]] if c in self._mascara else [''] * len(trozo)
+                                for c in self.columnas}, index=indice)
+        return datos, estilos
+
+    def pagina_con_estilo(self, numero, tamano, precision=2):
+        datos, estilos = self.pagina(numero, tamano)
+        return datos.style.apply(lambda _: estilos, axis=None).format(precision=precision, na_rep='-')
@@ -0,0 +1,128 @@
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from puntuacion import PENALIZACIONES_GEO, PESOS, UMBRALES_VEREDICTO, clasificar_paises
+
+# --- SENSIBILIDAD DE LOS PESOS DE LA NOTA FINAL ---
+# Las notas por bloque no dependen de los pesos ni de las penalizaciones
+# geopolíticas, así que se calculan una vez para todo el universo (el cubo).
+# Con A = [bloques | −clase geopolítica] (N × 7) y cada escenario como una
+# columna de E = [pesos ; penalizaciones] (7 × M), todas las notas finales de
+# todos los escenarios salen de un único producto de matrices:
+#     notas = max(0, A @ E)        (N × M)
+# Sobre esa matriz se mide la estabilidad del ranking (Spearman frente al
+# escenario base) y cuántos tickers cruzan los umbrales del veredicto.
+
+BLOQUES = list(PESOS)
+CLASES_GEO = list(PENALIZACIONES_GEO)
+CONCENTRACION = 40.0      # Dirichlet alrededor de PESOS: más alto, escenarios más cercanos al base
+VARIACION_PENALIZACION = 0.5
+
+def escenario_base():
+    return np.array([PESOS[b] for b in BLOQUES] + [PENALIZACIONES_GEO[c] for c in CLASES_GEO])
+
+def matriz_universo(puntuaciones, paises):
+    """A (N × 7): notas por bloque y, con signo negativo, la pertenencia a cada clase geopolítica."""
+    clases = clasificar_paises(paises)
+    return np.column_stack([puntuaciones[b].to_numpy(dtype=float) for b in BLOQUES] +
+                           [-clases[c].astype(float) for c in CLASES_GEO])
+
+# --- Escenarios (columnas de E) ---
+def muestrear_escenarios(n, semilla=None, concentracion=CONCENTRACION, variacion=VARIACION_PENALIZACION):
+    """n escenarios aleatorios: pesos ~ Dirichlet centrada en PESOS y penalizaciones ±variacion alrededor de las actuales."""
+    rng = np.random.default_rng(semilla)
+    pesos = rng.dirichlet([PESOS[b] * concentracion for b in BLOQUES], n)
+    base = np.array([PENALIZACIONES_GEO[c] for c in CLASES_GEO])
+    penalizaciones = base * rng.uniform(1 - variacion, 1 + variacion, (n, len(CLASES_GEO)))
+    return np.column_stack([escenario_base(), np.hstack([pesos, penalizaciones]).T])
+
+def rejilla_escenarios(paso=0.1, factores_penalizacion=(0.5, 1.0, 1.5)):
+    """Todos los vectores de pesos del símplex con el paso dado × escalas comunes de las penalizaciones."""
+    k = int(round(1 / paso))
+    pesos = [np.array(c) / k for c in itertools.product(range(k + 1), repeat=len(BLOQUES) - 1) if sum(c) <= k]
+    pesos = [np.append(p, 1 - p.sum()) for p in pesos]
+    base = np.array([PENALIZACIONES_GEO[c] for c in CLASES_GEO])
+    columnas = [np.concatenate([p, base * f]) for p in pesos for f in factores_penalizacion]
+    return np.column_stack([escenario_base()] + columnas)
+
+# --- Evaluación ---
+def notas_escenarios(universo, escenarios):
+    return np.maximum(0, universo @ escenarios)
+
+def rangos(notas):
+    """Rango de cada ticker (0 = mejor nota) en cada columna."""
+    # Se ordena por filas sobre la traspuesta contigua: mucho más rápido que argsort por columnas.
+    orden = np.argsort(-np.ascontiguousarray(notas.T), axis=1)
+    rango = np.empty_like(orden)
+    np.put_along_axis(rango, orden, np.arange(notas.shape[0])[None, :], axis=1)
+    return rango.T
+
+def spearman_frente_a_base(rango):
+    """Correlación de Spearman entre la columna 0 (escenario base) y cada escenario."""
+    n = rango.shape[0]
+    if n < 2:
+        return np.ones(rango.shape[1])
+    d2 = ((rango - rango[:, :1]) ** 2).sum(axis=0)
+    return 1 - 6 * d2 / (n * (n ** 2 - 1))
+
+def analizar(puntuaciones, paises, escenarios):
+    """
+    puntuaciones: DataFrame por ticker con las notas por bloque (CuboFundamentales.puntuar()).
+    Devuelve (resumen por escenario, resumen por ticker).
+    """
+    notas = notas_escenarios(matriz_universo(puntuaciones, paises), escenarios)
+    rango = rangos(notas)
+    base = notas[:, :1]
+
+    por_escenario = pd.DataFrame(escenarios.T, columns=[f'peso_{b}' for b in BLOQUES] + [f'pen_{c}' for c in CLASES_GEO])
+    por_escenario['spearman'] = spearman_frente_a_base(rango)
+    for umbral in UMBRALES_VEREDICTO:
+        por_escenario[f'suben_{umbral:g}'] = ((base < umbral) & (notas >= umbral)).sum(axis=0)
+        por_escenario[f'bajan_{umbral:g}'] = ((base >= umbral) & (notas < umbral)).sum(axis=0)
+    por_escenario.index.name = 'escenario'
+
+    por_ticker = pd.DataFrame({'nota_base': notas[:, 0], 'nota_min': notas.min(axis=1), 'nota_max': notas.max(axis=1),
+                               'rango_base': rango[:, 0] + 1,
+                               'rango_p5': np.percentile(rango, 5, axis=1) + 1, 'rango_p95': np.percentile(rango, 95, axis=1) + 1},
+                              index=puntuaciones.index)
+    for umbral in UMBRALES_VEREDICTO:
+        # Fracción de escenarios en la que el ticker queda en un lado distinto del umbral que en el base.
+        por_ticker[f'cruza_{umbral:g}'] = ((notas >= umbral) != (base >= umbral)).mean(axis=1)
+    return por_escenario, por_ticker
+
+def resumen(por_escenario, por_ticker):
+    spearman = por_escenario['spearman'].iloc[1:]
+    lineas = [f"{len(por_ticker)} tickers × {len(spearman)} escenarios",
+              f"Spearman frente al base: media {spearman.mean():.3f}, p5 {spearman.quantile(0.05):.3f}, mínimo {spearman.min():.3f}"]
+    for umbral in UMBRALES_VEREDICTO:
+        cruces = (por_escenario[f'suben_{umbral:g}'] + por_escenario[f'bajan_{umbral:g}']).iloc[1:]
+        sensibles = int((por_ticker[f'cruza_{umbral:g}'] > 0).sum())
+        lineas.append(f"Umbral {umbral:g}: {cruces.mean():.1f} cruces por escenario (máx. {int(cruces.max())}); "
+                      f"{sensibles} tickers lo cruzan en algún escenario")
+    return "\n".join(lineas)
+
+# python sensibilidad.py --escenarios 10000
+# python sensibilidad.py --rejilla 0.05
+if __name__ == '__main__':
+    from cubo import CuboFundamentales
+
+    parser = argparse.ArgumentParser(description="Sensibilidad de la nota final a los pesos y penalizaciones.")
+    parser.add_argument('--escenarios', type=int, default=5000, help="Escenarios aleatorios alrededor de los pesos actuales.")
+    parser.add_argument('--rejilla', type=float, default=None, help="Paso de una rejilla exhaustiva de pesos (en lugar de muestreo).")
+    parser.add_argument('--periodo', default=None)
+    parser.add_argument('--semilla', type=int, default=None)
+    parser.add_argument('--top', type=int, default=15, help="Tickers más inestables a mostrar.")
+    args = parser.parse_args()
+
+    cubo = CuboFundamentales()
+    if not len(cubo) or not cubo.periodos:
+        raise SystemExit("El cubo de fundamentales está vacío.")
+    puntuaciones = cubo.puntuar(args.periodo)
+    escenarios = rejilla_escenarios(args.rejilla) if args.rejilla else muestrear_escenarios(args.escenarios, args.semilla)
+    por_escenario, por_ticker = analizar(puntuaciones, cubo.paises, escenarios)
+    print(resumen(por_escenario, por_ticker))
+    inestables = por_ticker.assign(amplitud=por_ticker['rango_p95'] - por_ticker['rango_p5']).sort_values('amplitud', ascending=False)
+    print(inestables.head(args.top).round(2).to_string())
@@ -0,0 +1,233 @@
+import argparse
+import difflib
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from cache import CacheSWR
+
+# --- ÍNDICE LOCAL DE SÍMBOLOS ---
+# Tabla ticker / nombre / bolsa / sector / país en un CSV local, indexada en
+# arrays ordenados: la búsqueda por prefijo son dos searchsorted (sobre los
+# tickers y sobre las palabras del nombre) y no hay que preguntar a Yahoo para
+# saber si un símbolo existe. La tabla se importa de los listados de Nasdaq
+# (`python simbolos.py actualizar`) y se completa con cada análisis correcto.
+# Solo se rechaza sin preguntar a Yahoo lo que Yahoo ya rechazó: los tickers
+# que confirma como inexistentes van a una caché negativa de TTL corto. Un
+# símbolo que falta en un mercado cubierto por un listado completo importado
+# (sufijo '.L', '.MC'...) queda como DESCONOCIDO: se intenta igualmente y, si
+# no existe, entra en esa caché. Los símbolos sin sufijo nunca están cubiertos:
+# el listado de Nasdaq no incluye OTC (TCEHY, NSRGY), índices (^GSPC) ni
+# criptomonedas (BTC-USD), que Yahoo también escribe sin sufijo.
+
+RUTA_SIMBOLOS = os.environ.get('ANALIZADOR_SIMBOLOS', 'simbolos.csv')
+URL_NASDAQ = 'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqtraded.txt'
+COLUMNAS_SIMBOLOS = ['ticker', 'nombre', 'bolsa', 'sector', 'pais', 'listado']  # listado: origen si vino de un listado completo
+BOLSAS_NASDAQ = {'Q': 'NASDAQ', 'N': 'NYSE', 'A': 'NYSE American', 'P': 'NYSE Arca', 'Z': 'Cboe BZX', 'V': 'IEX'}
+MAX_SUGERENCIAS = 8
+CORTE_DIFUSO = 0.6
+TTL_INVALIDOS = 900
+
+VALIDO, DESCONOCIDO, INVALIDO, SIN_COBERTURA = 'valido', 'desconocido', 'invalido', 'sin_cobertura'
+
+# Valor cacheado: True para un ticker que Yahoo no reconoce.
+CACHE_INVALIDOS = CacheSWR('simbolos_invalidos', ttl=TTL_INVALIDOS, ttl_vacio=0)
+
+def _normalizar_texto(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return texto.lower()
+
+def _palabras(nombre):
+    return [p for p in re.split(r'[^a-z0-9]+', _normalizar_texto(nombre)) if p]
+
+def mercado(ticker):
+    """Sufijo de mercado de Yahoo ('.L', '.MC'...) o '' para EE. UU."""
+    punto = ticker.rfind('.')
+    return ticker[punto:] if punto > 0 else ''
+
+def _rango_prefijo(claves, prefijo):
+    # Todo lo que empieza por el prefijo queda entre prefijo y prefijo + el carácter más alto.
+    return claves.searchsorted(prefijo, 'left'), claves.searchsorted(prefijo + '\U0010ffff', 'left')
+
+# --- Caché negativa ---
+def marcar_invalido(ticker):
+    CACHE_INVALIDOS.guardar(ticker.upper(), True)
+
+def es_invalido(ticker):
+    return CACHE_INVALIDOS.es_fresca(ticker.upper())
+
+class IndiceSimbolos:
+    def __init__(self, tabla=None, ruta=None):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._tabla = pd.DataFrame(columns=COLUMNAS_SIMBOLOS)
+        self._indexar(tabla if tabla is not None else self._tabla)
+
+    def __len__(self):
+        return len(self._tabla)
+
+    def __contains__(self, ticker):
+        i = self._tickers.searchsorted(ticker)
+        return i < len(self._tickers) and self._tickers[i] == ticker
+
+    # --- Construcción ---
+    @classmethod
+    def cargar(cls, ruta=RUTA_SIMBOLOS, cubo=None):
+        """Índice desde el CSV local, completado con los tickers del cubo (sector y país)."""
+        tabla = pd.read_csv(ruta, dtype=str, keep_default_na=False) if os.path.exists(ruta) else pd.DataFrame(columns=COLUMNAS_SIMBOLOS)
+        if cubo is not None and len(cubo):
+            del_cubo = pd.DataFrame({'ticker': cubo.tickers, 'nombre': '', 'bolsa': '', 'sector': cubo.sectores, 'pais': cubo.paises})
+            tabla = _combinar(tabla, del_cubo)
+        return cls(tabla, ruta)
+
+    def _indexar(self, tabla):
+        tabla = tabla.reindex(columns=COLUMNAS_SIMBOLOS).fillna('').astype(str)
+        tabla['ticker'] = tabla['ticker'].str.upper().str.strip()
+        tabla = tabla[tabla['ticker'] != ''].drop_duplicates('ticker', keep='last').sort_values('ticker').reset_index(drop=True)
+        palabras = [(p, i) for i, nombre in enumerate(tabla['nombre']) for p in _palabras(nombre)]
+        orden_palabras = sorted(palabras)
+        with self._lock:
+            self._tabla = tabla
+            self._tickers = tabla['ticker'].to_numpy(dtype=str)
+            self._palabras = np.array([p for p, _ in orden_palabras], dtype=str)
+            self._filas_palabras = np.array([i for _, i in orden_palabras], dtype=int)
+            self._longitudes = np.char.str_len(self._tickers) if len(self._tickers) else np.empty(0, dtype=int)
+            self._mercados = {mercado(t) for t in tabla.loc[tabla['listado'] != '', 'ticker']} - {''}
+
+    def agregar(self, ticker, nombre='', bolsa='', sector='', pais=''):
+        """Añade o actualiza un símbolo (p. ej. tras un análisis correcto) y lo guarda en el CSV."""
+        fila = pd.DataFrame([{'ticker': ticker, 'nombre': nombre or '', 'bolsa': bolsa or '', 'sector': sector or '', 'pais': pais or ''}])
+        self._indexar(_combinar(self._tabla, fila))
+        if self.ruta:
+            self.guardar(self.ruta)
+
+    def importar(self, listado, origen):
+        """Añade un listado completo de un mercado; sus mercados pasan a estar cubiertos."""
+        listado = listado.reindex(columns=COLUMNAS_SIMBOLOS).fillna('')
+        listado['listado'] = listado['listado'].where(listado['listado'] != '', origen)
+        self._indexar(_combinar(self._tabla, listado))
+
+    def guardar(self, ruta=None):
+        ruta = ruta or self.ruta
+        tmp = f'{ruta}.{os.getpid()}.tmp'
+        self._tabla.to_csv(tmp, index=False)
+        os.replace(tmp, ruta)
+
+    # --- Consultas ---
+    def fila(self, ticker):
+        i = self._tickers.searchsorted(ticker)
+        return self._tabla.iloc[i].to_dict() if ticker in self else None
+
+    def buscar_prefijo(self, texto, limite=MAX_SUGERENCIAS):
+        """Tickers que empiezan por `texto` (los más cortos primero) y después nombres con alguna palabra que empiece por él."""
+        texto = texto.strip()
+        if not texto:
+            return []
+        inicio, fin = _rango_prefijo(self._tickers, texto.upper())
+        por_ticker = np.arange(inicio, fin)
+        por_ticker = por_ticker[np.argsort(self._longitudes[por_ticker], kind='stable')][:limite]
+        filas = list(por_ticker)
+        palabras = _palabras(texto)
+        if palabras and len(filas) < limite:
+            # Cada palabra del texto acota por prefijo; una fila debe casar con todas.
+            candidatas = None
+            for palabra in palabras:
+                inicio, fin = _rango_prefijo(self._palabras, palabra)
+                encontradas = set(self._filas_palabras[inicio:fin])
+                candidatas = encontradas if candidatas is None else candidatas & encontradas
+            vistos = set(filas)
+            filas += [i for i in sorted(candidatas, key=lambda i: self._longitudes[i]) if i not in vistos][:limite - len(filas)]
+        return [str(t) for t in self._tickers[filas]]
+
+    def buscar_difuso(self, texto, limite=MAX_SUGERENCIAS, corte=CORTE_DIFUSO):
+        """Tickers parecidos (erratas): difflib solo sobre los de longitud parecida."""
+        texto = texto.strip().upper()
+        if not texto or not len(self._tickers):
+            return []
+        cerca = self._tickers[np.abs(self._longitudes - len(texto)) <= 1]
+        return difflib.get_close_matches(texto, [str(t) for t in cerca], n=limite, cutoff=corte)
+
+    def sugerencias(self, texto, limite=MAX_SUGERENCIAS):
+        resultado = self.buscar_prefijo(texto, limite)
+        if len(resultado) < limite:
+            resultado += [t for t in self.buscar_difuso(texto, limite) if t not in resultado][:limite - len(resultado)]
+        return resultado
+
+    def cubre(self, ticker):
+        """Si algún listado completo importado abarca el mercado del ticker (nunca para los que no llevan sufijo)."""
+        return mercado(ticker) in self._mercados
+
+    def validar(self, ticker):
+        """
+        Estado del ticker sin tocar la red: VALIDO, INVALIDO (caché negativa), DESCONOCIDO (falta en un mercado
+        cubierto) o SIN_COBERTURA. Solo INVALIDO justifica rechazarlo sin preguntar a Yahoo.
+        """
+        ticker = ticker.strip().upper()
+        if ticker in self:
+            return VALIDO
+        if es_invalido(ticker):
+            return INVALIDO
+        return DESCONOCIDO if self.cubre(ticker) else SIN_COBERTURA
+
+    def etiqueta(self, ticker):
+        fila = self.fila(ticker)
+        if not fila:
+            return ticker
+        detalles = ' · '.join(v for v in (fila['bolsa'], fila['sector'], fila['pais']) if v)
+        return f"{ticker} — {fila['nombre'] or 'sin nombre'}" + (f" ({detalles})" if detalles else '')
+
+def _combinar(tabla, nuevas):
+    """Une dos tablas de símbolos; los campos vacíos de las nuevas no pisan los existentes."""
+    tabla = tabla.reindex(columns=COLUMNAS_SIMBOLOS).fillna('').astype(str).set_index('ticker')
+    nuevas = nuevas.reindex(columns=COLUMNAS_SIMBOLOS).fillna('').astype(str)
+    nuevas['ticker'] = nuevas['ticker'].str.upper().str.strip()
+    nuevas = nuevas.drop_duplicates('ticker', keep='last').set_index('ticker')
+    tabla = tabla[~tabla.index.duplicated(keep='last')]
+    comunes = nuevas.index.intersection(tabla.index)
+    nuevas.loc[comunes] = nuevas.loc[comunes].where(nuevas.loc[comunes] != '', tabla.loc[comunes])
+    return pd.concat([tabla.drop(index=comunes), nuevas]).reset_index()
+
+# --- Importación ---
+def leer_listado_nasdaq(origen=URL_NASDAQ):
+    """Listado de valores negociados en EE. UU. (nasdaqtraded.txt) con los símbolos al estilo de Yahoo."""
+    listado = pd.read_csv(origen, sep='|', dtype=str, keep_default_na=False)
+    listado = listado[(listado['Test Issue'] == 'N') & ~listado['Symbol'].str.contains(r'\$', regex=True)]
+    return pd.DataFrame({
+        # Yahoo escribe las clases de acciones con guion (BRK-B), Nasdaq con punto (BRK.B).
+        'ticker': listado['Symbol'].str.replace('.', '-', regex=False),
+        'nombre': listado['Security Name'],
+        'bolsa': listado['Listing Exchange'].map(BOLSAS_NASDAQ).fillna(''),
+        'sector': '', 'pais': '', 'listado': 'nasdaq',
+    })
+
+# python simbolos.py actualizar
+# python simbolos.py importar otros_mercados.csv
+# python simbolos.py buscar "banco sant"
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Índice local de símbolos.")
+    parser.add_argument('--ruta', default=RUTA_SIMBOLOS)
+    sub = parser.add_subparsers(dest='orden', required=True)
+    p_actualizar = sub.add_parser('actualizar', help="Importa el listado de Nasdaq (EE. UU.).")
+    p_actualizar.add_argument('--origen', default=URL_NASDAQ)
+    p_importar = sub.add_parser('importar', help=f"Importa un CSV con columnas {', '.join(COLUMNAS_SIMBOLOS)}.")
+    p_importar.add_argument('fichero')
+    p_buscar = sub.add_parser('buscar')
+    p_buscar.add_argument('texto')
+    args = parser.parse_args()
+
+    indice = IndiceSimbolos.cargar(args.ruta)
+    if args.orden == 'buscar':
+        for ticker in indice.sugerencias(args.texto):
+            print(indice.etiqueta(ticker))
+    else:
+        antes = len(indice)
+        if args.orden == 'actualizar':
+            indice.importar(leer_listado_nasdaq(args.origen), 'nasdaq')
+        else:
+            indice.importar(pd.read_csv(args.fichero, dtype=str, keep_default_na=False), os.path.basename(args.fichero))
+        indice.guardar()
+        print(f"{len(indice)} símbolos ({len(indice) - antes:+d}) en {args.ruta}")
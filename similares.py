@@ -0,0 +1,139 @@
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # sin scipy se usa siempre la búsqueda por fuerza bruta vectorizada
+    cKDTree = None
+
+# --- BÚSQUEDA DE EMPRESAS SIMILARES (k vecinos más cercanos) ---
+# Cada empresa del universo (el cubo de fundamentales) es un vector de métricas
+# estandarizadas (z-score, recortado a ±LIMITE_Z para que un dato extremo no
+# domine la distancia). Un dato ausente cuenta como la media del universo (z = 0).
+# La consulta es una distancia euclídea vectorizada sobre toda la matriz; con
+# universos grandes y scipy disponible se usa un KD-tree.
+# Las actualizaciones tras un análisis nuevo sustituyen o añaden una fila sin
+# reconstruir nada; la normalización se reajusta solo cuando ha cambiado una
+# fracción apreciable del universo.
+
+METRICAS_SIMILITUD = ['roe', 'roic', 'margen_operativo', 'margen_beneficio', 'bpa_cagr', 'cagr_fcf',
+                      'deuda_ebitda', 'per', 'p_fcf', 'p_b', 'yield_dividendo']
+LIMITE_Z = 3.0
+UMBRAL_ARBOL = 2000
+FRACCION_REAJUSTE = 0.2
+
+class IndiceSimilares:
+    def __init__(self, metricas=METRICAS_SIMILITUD):
+        self.metricas = list(metricas)
+        self._lock = threading.Lock()
+        self._tickers = []
+        self._posicion = {}
+        self._crudos = np.empty((0, len(self.metricas)))
+        self._matriz = np.empty((0, len(self.metricas)))
+        self._media = np.zeros(len(self.metricas))
+        self._escala = np.ones(len(self.metricas))
+        self._arbol = None
+        self._cambios_desde_ajuste = 0
+
+    def __len__(self):
+        return len(self._tickers)
+
+    # --- Construcción ---
+    @classmethod
+    def desde_cubo(cls, cubo, periodo=None, metricas=METRICAS_SIMILITUD):
+        indice = cls(metricas)
+        if cubo is None or not len(cubo) or not cubo.periodos:
+            return indice
+        columnas = cubo.columnas([m for m in metricas if m in cubo.campos], periodo)
+        crudos = np.column_stack([np.asarray(columnas[m], dtype=float) if m in columnas else np.full(len(cubo), np.nan) for m in metricas])
+        indice.construir(cubo.tickers, crudos)
+        return indice
+
+    def construir(self, tickers, crudos):
+        with self._lock:
+            self._tickers = list(tickers)
+            self._posicion = {t: i for i, t in enumerate(self._tickers)}
+            self._crudos = np.array(crudos, dtype=float).reshape(len(self._tickers), len(self.metricas))
+            self._ajustar()
+
+    def _ajustar(self):
+        with warnings.catch_warnings():
+            # Columnas sin ningún dato: nanmean/nanstd avisan y devuelven NaN (se tratan abajo).
+            warnings.simplefilter('ignore', RuntimeWarning)
+            media = np.nanmean(self._crudos, axis=0) if len(self._crudos) else np.zeros(len(self.metricas))
+            escala = np.nanstd(self._crudos, axis=0) if len(self._crudos) else np.ones(len(self.metricas))
+        self._media = np.nan_to_num(media)
+        self._escala = np.where(np.isfinite(escala) & (escala > 0), escala, 1.0)
+        self._matriz = self._normalizar(self._crudos)
+        self._cambios_desde_ajuste = 0
+        self._arbol = None
+
+    def _normalizar(self, crudos):
+        z = (crudos - self._media) / self._escala
+        return np.clip(np.nan_to_num(z, nan=0.0, posinf=LIMITE_Z, neginf=-LIMITE_Z), -LIMITE_Z, LIMITE_Z)
+
+    def _vector(self, valores):
+        return np.array([np.nan if valores.get(m) is None or isinstance(valores.get(m), str) else float(valores.get(m))
+                         for m in self.metricas], dtype=float)
+
+    # --- Actualización incremental ---
+    def actualizar(self, ticker, valores):
+        """Sustituye (o añade) la fila de un ticker a partir de un dict de métricas (datos + hist_data)."""
+        crudo = self._vector(valores)
+        with self._lock:
+            posicion = self._posicion.get(ticker)
+            if posicion is None:
+                self._posicion[ticker] = len(self._tickers)
+                self._tickers.append(ticker)
+                self._crudos = np.vstack([self._crudos, crudo])
+                self._matriz = np.vstack([self._matriz, self._normalizar(crudo[None, :])])
+            else:
+                self._crudos[posicion] = crudo
+                self._matriz[posicion] = self._normalizar(crudo[None, :])[0]
+            self._cambios_desde_ajuste += 1
+            self._arbol = None
+            if self._cambios_desde_ajuste > max(10, FRACCION_REAJUSTE * len(self._tickers)):
+                self._ajustar()
+
+    # --- Consulta ---
+    def _usar_arbol(self):
+        if cKDTree is None or len(self._tickers) < UMBRAL_ARBOL:
+            return None
+        if self._arbol is None:
+            self._arbol = cKDTree(self._matriz)
+        return self._arbol
+
+    def vecinos(self, consulta, k=5):
+        """Top-k tickers más parecidos a `consulta` (un ticker del índice o un dict de métricas).
+        Devuelve una lista de (ticker, distancia) ordenada de más a menos parecido."""
+        with self._lock:
+            if not self._tickers:
+                return []
+            if isinstance(consulta, str):
+                excluir = self._posicion.get(consulta)
+                if excluir is None:
+                    raise KeyError(f"'{consulta}' no está en el índice de similitud.")
+                q = self._matriz[excluir]
+            else:
+                excluir = None
+                q = self._normalizar(self._vector(consulta)[None, :])[0]
+            n_pedidos = min(k + (excluir is not None), len(self._tickers))
+            arbol = self._usar_arbol()
+            if arbol is not None:
+                distancias, posiciones = arbol.query(q, k=n_pedidos)
+                distancias, posiciones = np.atleast_1d(distancias), np.atleast_1d(posiciones)
+            else:
+                d2 = np.einsum('ij,ij->i', self._matriz - q, self._matriz - q)
+                posiciones = np.argpartition(d2, n_pedidos - 1)[:n_pedidos]
+                posiciones = posiciones[np.argsort(d2[posiciones], kind='stable')]
+                distancias = np.sqrt(d2[posiciones])
+            return [(self._tickers[p], float(d)) for p, d in zip(posiciones, distancias) if p != excluir][:k]
+
+    def tabla_vecinos(self, consulta, k=5):
+        vecinos = self.vecinos(consulta, k)
+        with self._lock:
+            filas = [{'Ticker': t, 'Distancia': d, **dict(zip(self.metricas, self._crudos[self._posicion[t]]))} for t, d in vecinos]
+        return pd.DataFrame(filas).set_index('Ticker') if filas else pd.DataFrame()
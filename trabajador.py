@@ -0,0 +1,146 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cola import INTERVALO_LATIDO, PRIORIDAD_INTERACTIVA, PRIORIDAD_LOTE, ColaTrabajos
+
+# --- POOL DE TRABAJADORES DE DESCARGA ---
+# Procesos independientes de la UI que consumen la cola SQLite y rellenan la
+# caché compartida en disco. Se escalan aparte de las réplicas de Streamlit:
+#   ANALIZADOR_COLA=cola.sqlite python trabajador.py trabajar --procesos 4
+#   ANALIZADOR_COLA=cola.sqlite python trabajador.py encolar AAPL MSFT KO --lote
+#   python trabajador.py precargar $(cat universo.txt)
+#   python trabajador.py poblar $(cat universo.txt)
+
+DATASETS_POR_DEFECTO = ['fundamentales', 'precio', 'historicos']
+
+_parar = False
+
+def _senal_parada(signum, frame):
+    global _parar
+    _parar = True
+
+def bucle_trabajador(ruta_cola, nombre, espera_maxima=2.0):
+    # La importación va aquí: cada proceso crea sus propias cachés y conexiones.
+    from adquisicion import refrescar_dataset
+
+    signal.signal(signal.SIGTERM, _senal_parada)
+    signal.signal(signal.SIGINT, _senal_parada)
+    cola = ColaTrabajos(ruta_cola)
+    espera = 0.1
+    ultimo_latido = 0.0
+    try:
+        while not _parar:
+            if time.time() - ultimo_latido >= INTERVALO_LATIDO:
+                cola.latir(nombre)
+                ultimo_latido = time.time()
+            trabajo = cola.reclamar(nombre)
+            if trabajo is None:
+                time.sleep(espera)
+                espera = min(espera * 2, espera_maxima)
+                continue
+            espera = 0.1
+            try:
+                refrescar_dataset(trabajo['ticker'], trabajo['dataset'])
+                cola.completar(trabajo['id'])
+            except Exception as e:
+                cola.fallar(trabajo['id'], e)
+    finally:
+        cola.despedir(nombre)
+
+def trabajar(ruta_cola, procesos):
+    base = f"{socket.gethostname()}-{os.getpid()}"
+    trabajadores = {}
+    signal.signal(signal.SIGTERM, _senal_parada)
+    signal.signal(signal.SIGINT, _senal_parada)
+    cola = ColaTrabajos(ruta_cola)
+    try:
+        while not _parar:
+            cola.recuperar_huerfanos()
+            # Se relanza cualquier trabajador que haya muerto.
+            for i in range(procesos):
+                proceso = trabajadores.get(i)
+                if proceso is None or not proceso.is_alive():
+                    proceso = multiprocessing.Process(target=bucle_trabajador, args=(ruta_cola, f"{base}-{i}"), daemon=True)
+                    proceso.start()
+                    trabajadores[i] = proceso
+            time.sleep(5)
+    finally:
+        for proceso in trabajadores.values():
+            proceso.terminate()
+        for proceso in trabajadores.values():
+            proceso.join(timeout=10)
+
+def poblar_cubo(tickers, hilos=4, informar=print):
+    """Registra en el cubo el análisis de cada ticker: así los cribados cubren todo un universo y no solo lo abierto en la UI."""
+    from adquisicion import obtener_datos_completos_swr, obtener_historicos_swr
+    from cubo import CuboFundamentales
+
+    cubo = CuboFundamentales()
+
+    def registrar(ticker):
+        try:
+            datos, _ = obtener_datos_completos_swr(ticker)
+            if not datos:
+                return ticker, "no encontrado"
+            hist_data, _ = obtener_historicos_swr(ticker)
+            cubo.registrar_analisis(ticker, datos, hist_data)
+            return ticker, "ok"
+        except Exception as e:
+            return ticker, f"error: {e}"
+
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for ticker, resultado in pool.map(registrar, tickers):
+            resultados[ticker] = resultado
+            informar(ticker, resultado)
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Trabajadores de descarga en segundo plano.")
+    parser.add_argument('--cola', default=os.environ.get('ANALIZADOR_COLA') or 'cola_trabajos.sqlite', help="Ruta de la base SQLite de la cola.")
+    sub = parser.add_subparsers(dest='orden', required=True)
+    p_trabajar = sub.add_parser('trabajar', help="Arranca el pool de procesos.")
+    p_trabajar.add_argument('--procesos', type=int, default=max(2, (os.cpu_count() or 2)))
+    p_encolar = sub.add_parser('encolar', help="Encola refrescos de tickers.")
+    p_encolar.add_argument('tickers', nargs='+')
+    p_encolar.add_argument('--dataset', action='append', choices=DATASETS_POR_DEFECTO)
+    p_encolar.add_argument('--lote', action='store_true', help="Prioridad de lote (por defecto, interactiva).")
+    p_precargar = sub.add_parser('precargar', help="Descarga en bloque el historial de precios de muchos tickers.")
+    p_precargar.add_argument('tickers', nargs='+')
+    p_precargar.add_argument('--tamano-lote', type=int, default=50)
+    p_precargar.add_argument('--forzar', action='store_true')
+    p_precargar.add_argument('--divisas', nargs='*', default=[], help="Monedas cuyos tipos contra el dólar se precargan también (EUR GBp JPY...).")
+    p_poblar = sub.add_parser('poblar', help="Analiza una lista de tickers y los registra en el cubo de fundamentales.")
+    p_poblar.add_argument('tickers', nargs='+')
+    p_poblar.add_argument('--hilos', type=int, default=4)
+    sub.add_parser('estado', help="Resumen de la cola.")
+    args = parser.parse_args()
+
+    if args.orden == 'trabajar':
+        trabajar(args.cola, args.procesos)
+    elif args.orden == 'encolar':
+        cola = ColaTrabajos(args.cola)
+        prioridad = PRIORIDAD_LOTE if args.lote else PRIORIDAD_INTERACTIVA
+        for ticker in args.tickers:
+            for dataset in args.dataset or DATASETS_POR_DEFECTO:
+                print(ticker.upper(), dataset, cola.encolar(ticker.upper(), dataset, prioridad))
+    elif args.orden == 'precargar':
+        from precios import precargar_historiales
+        print(precargar_historiales(args.tickers, tamano_lote=args.tamano_lote, forzar=args.forzar))
+        if args.divisas:
+            from divisas import cargar_divisas
+            print(cargar_divisas(args.divisas))
+    elif args.orden == 'poblar':
+        resultados = poblar_cubo(args.tickers, args.hilos)
+        print(f"{sum(r == 'ok' for r in resultados.values())}/{len(resultados)} tickers registrados en el cubo.")
+    else:
+        print(ColaTrabajos(args.cola).resumen())
+
+if __name__ == '__main__':
+    main()